@@ -9,4 +9,16 @@ def resource_path(relative_path):
     except Exception:
         base_path = os.path.abspath(".")
 
-    return os.path.join(base_path, relative_path)
\ No newline at end of file
+    return os.path.join(base_path, relative_path)
+
+def cache_path(relative_path):
+    """ Ruta escribible para archivos generados (caché de mallas, shaders...).
+    En PyInstaller _MEIPASS es temporal, así que usamos la carpeta del ejecutable """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+
+    path = os.path.join(base_path, ".cache", relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
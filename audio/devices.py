@@ -0,0 +1,122 @@
+# audio/devices.py
+# ============================================================================
+# Descubrimiento de Dispositivos en Segundo Plano
+# ============================================================================
+# Enumera los dispositivos de audio de cada backend en un hilo propio y
+# publica una instantánea inmutable que la UI lee sin bloquearse.
+# Cada refresco calcula el diff (altas/bajas) respecto al anterior y mide
+# cuánto tarda cada backend en responder.
+#
+# Los backends son simples callables que devuelven una lista de
+# AudioDeviceWrapper, por lo que se pueden sustituir por stubs en pruebas.
+# ============================================================================
+
+import threading
+import time
+
+class DeviceSnapshot:
+    """
+    Instantánea inmutable del último enumerado de dispositivos.
+    La UI compara 'version' para saber si hay cambios sin tomar locks.
+    """
+    def __init__(self, version, devices, added, removed, timings):
+        self.version = version
+        self.devices = tuple(devices)  # Lista completa y ordenada
+        self.added = tuple(added)      # Dispositivos nuevos respecto al anterior
+        self.removed = tuple(removed)  # Dispositivos que desaparecieron
+        self.timings = dict(timings)   # Backend -> milisegundos de enumeración
+
+    def __repr__(self):
+        return f"<DeviceSnapshot v{self.version}: {len(self.devices)} dispositivos>"
+
+class DeviceMonitor:
+    """
+    Hilo de descubrimiento con caché.
+    - backends: lista de tuplas (nombre, callable) que devuelven dispositivos.
+    - intervalo: segundos entre refrescos mientras alguien observa la lista.
+    """
+    def __init__(self, backends, profiler=None, intervalo=3.0):
+        self.backends = list(backends)
+        self.profiler = profiler
+        self.intervalo = intervalo
+
+        # Versión 0 = todavía no se enumeró nada (la UI muestra la lista vacía)
+        self._snapshot = DeviceSnapshot(0, [], [], [], {})
+        self._despertar = threading.Event()
+        self._observando = False
+        self._detenido = False
+        self.thread = None
+
+    def start(self):
+        """Inicia el hilo de descubrimiento (el primer enumerado es inmediato)."""
+        if self.thread is None or not self.thread.is_alive():
+            self._detenido = False
+            self._despertar.set()
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self._detenido = True
+        self._despertar.set()
+
+    def snapshot(self):
+        """Devuelve la última instantánea publicada. Nunca bloquea."""
+        return self._snapshot
+
+    def refrescar(self):
+        """Solicita un enumerado lo antes posible (no bloquea)."""
+        self._despertar.set()
+
+    def observar(self, activo):
+        """
+        Activa o desactiva el refresco periódico. Solo tiene sentido refrescar
+        mientras el menú de selección está visible.
+        """
+        self._observando = activo
+        if activo:
+            self._despertar.set()
+
+    def _loop(self):
+        while not self._detenido:
+            # Sin observadores solo despertamos por petición explícita
+            timeout = self.intervalo if self._observando else None
+            self._despertar.wait(timeout)
+            self._despertar.clear()
+            if self._detenido:
+                break
+            self.enumerar()
+
+    def enumerar(self):
+        """
+        Consulta todos los backends y publica una nueva instantánea si cambió
+        el conjunto de dispositivos. Se puede llamar directamente (sin hilo).
+        """
+        devices = []
+        timings = {}
+        for nombre, backend in self.backends:
+            inicio = time.perf_counter()
+            try:
+                devices.extend(backend())
+            except Exception as e:
+                print(f"⚠️ Error enumerando dispositivos ({nombre}): {e}")
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            timings[nombre] = duracion_ms
+            if self.profiler:
+                self.profiler.records[f"devices_{nombre}"] = duracion_ms
+
+        anterior = self._snapshot
+        claves_previas = {d.key for d in anterior.devices}
+        claves_nuevas = {d.key for d in devices}
+        added = [d for d in devices if d.key not in claves_previas]
+        removed = [d for d in anterior.devices if d.key not in claves_nuevas]
+
+        # El primer enumerado siempre se publica (aunque esté vacío)
+        if added or removed or anterior.version == 0:
+            self._snapshot = DeviceSnapshot(anterior.version + 1, devices, added, removed, timings)
+            if anterior.version > 0:
+                for d in added: print(f"🔌 Dispositivo conectado: {d.name}")
+                for d in removed: print(f"🔌 Dispositivo desconectado: {d.name}")
+        else:
+            # Mismo conjunto: refrescamos referencias (índices de PortAudio) sin cambiar versión
+            self._snapshot = DeviceSnapshot(anterior.version, devices, [], [], timings)
+        return self._snapshot
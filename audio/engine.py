@@ -5,22 +5,37 @@
 # Gestiona la captura de audio unificando dos backends:
 # 1. SoundDevice (PortAudio): Para micrófonos físicos (baja latencia).
 # 2. SoundCard (WASAPI/CoreAudio): Para Loopback/Desktop Audio.
+# 3. Remote: Frames ya analizados por un servidor de análisis local.
 #
-# Mantiene la arquitectura de hilo único y buffer circular.
+# La apertura/cierre de streams la gestiona StreamManager (audio/streams.py);
+# este módulo mantiene el hilo de análisis y el buffer circular.
 # ============================================================================
 
 import threading
-import time
 import warnings
-import queue
 import numpy as np
 import sounddevice as sd
-import soundcard as sc
 from .fft import FFTProcessor
+from .devices import DeviceMonitor
+from .streams import StreamManager, SDMicrophoneStream
+from .servidor import servidor_disponible
+from .shared import aplicar_frame
 
-# Ignoramos las advertencias de Soundcard para mantener la consola limpia
-# y poder leer las métricas del Profiler sin interferencias.
-warnings.filterwarnings("ignore", category=sc.SoundcardRuntimeWarning)
+_sc = None
+
+def _soundcard():
+    """
+    Importa SoundCard la primera vez que se necesita (su importación inicializa
+    WASAPI/CoreAudio y es lenta). Normalmente ocurre en el hilo del DeviceMonitor.
+    """
+    global _sc
+    if _sc is None:
+        import soundcard
+        # Ignoramos las advertencias de Soundcard para mantener la consola limpia
+        # y poder leer las métricas del Profiler sin interferencias.
+        warnings.filterwarnings("ignore", category=soundcard.SoundcardRuntimeWarning)
+        _sc = soundcard
+    return _sc
 
 class AudioDeviceWrapper:
     """
@@ -34,59 +49,90 @@ class AudioDeviceWrapper:
         self.ref = ref          # Objeto original (SoundCard) o Info Dict (SoundDevice)
         self.sd_index = sd_index # Índice numérico para SoundDevice
 
+    @property
+    def key(self):
+        """Identidad estable del dispositivo (sobrevive a re-enumeraciones)."""
+        return (self.backend, self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, AudioDeviceWrapper) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
     def __repr__(self):
         return f"<AudioDeviceWrapper: {self.name} ({self.backend})>"
 
-class SDMicrophoneStream:
+def enumerar_sd(reiniciar=False):
     """
-    Sistema de captura dedicado para micrófonos usando Callbacks (estilo Visualizador.py).
-    Aísla la captura del hilo principal para evitar 'glitches' y ruidos por latencia.
+    Micrófonos físicos vía SoundDevice (PortAudio).
+    Args:
+        reiniciar (bool): Reinicia PortAudio para refrescar la lista de dispositivos.
     """
-    def __init__(self, device_index, samplerate, blocksize, noise_gate_threshold=0.015):
-        self.device_index = device_index
-        self.samplerate = samplerate
-        self.blocksize = blocksize
-        self.noise_gate_threshold = noise_gate_threshold
-        self.q = queue.Queue()
-        self.stream = sd.InputStream(
-            device=device_index,
-            channels=1,
-            samplerate=samplerate,
-            blocksize=blocksize,
-            callback=self._callback
-        )
+    devices = []
+    if reiniciar:
+        try:
+            sd._terminate()
+            sd._initialize()
+        except Exception: pass
 
-    def _callback(self, indata, frames, time, status):
-        # El callback corre en un hilo de audio de alta prioridad.
-        # Copiamos los datos y los pasamos a la cola inmediatamente.
-        if status:
-            pass # Ignoramos errores menores de buffer para evitar spam
-        
-        data = indata.copy()
-        
-        # Noise Gate: Si la señal es muy débil (ruido de fondo), la silenciamos completamente.
-        if np.max(np.abs(data)) < self.noise_gate_threshold:
-            data[:] = 0.0
-            
-        self.q.put(data)
+    # Intentamos filtrar por WASAPI en Windows para reducir duplicados y latencia
+    preferred_api_index = -1
+    try:
+        hostapis = sd.query_hostapis()
+        for i, api in enumerate(hostapis):
+            if 'WASAPI' in api['name']:
+                preferred_api_index = i
+                break
+    except: pass
 
-    def start(self):
-        self.stream.start()
+    try:
+        sd_devs = sd.query_devices()
+        for i, dev in enumerate(sd_devs):
+            # Filtramos inputs que tengan canales de entrada
+            if dev['max_input_channels'] > 0:
+                # Si detectamos WASAPI, ignoramos dispositivos de otras APIs (MME, DS)
+                if preferred_api_index != -1 and dev['hostapi'] != preferred_api_index:
+                    continue
 
-    def stop(self):
-        self.stream.stop()
-        self.stream.close()
-
-    def read(self):
-        # Gestión de latencia: si se acumulan demasiados paquetes, descartamos los viejos
-        if self.q.qsize() > 4:
-            while self.q.qsize() > 1:
-                self.q.get_nowait()
-        
-        try:
-            return self.q.get(timeout=0.05)
-        except queue.Empty:
-            return np.zeros((self.blocksize, 1), dtype=np.float32)
+                devices.append(AudioDeviceWrapper(
+                    name=f"[Mic] {dev['name']}",
+                    is_loopback=False,
+                    backend='sd',
+                    ref=dev,
+                    sd_index=i
+                ))
+    except Exception as e:
+        print(f"⚠️ Error inicializando SoundDevice: {e}")
+    return devices
+
+def enumerar_sc():
+    """Loopback / Parlantes vía SoundCard (WASAPI/CoreAudio)."""
+    devices = []
+    try:
+        sc_devs = _soundcard().all_microphones(include_loopback=True)
+        for dev in sc_devs:
+            if dev.isloopback:
+                devices.append(AudioDeviceWrapper(
+                    name=f"[PC] {dev.name}",
+                    is_loopback=True,
+                    backend='sc',
+                    ref=dev
+                ))
+    except Exception as e:
+        print(f"⚠️ Error inicializando SoundCard: {e}")
+    return devices
+
+def enumerar_remoto():
+    """Servidor de análisis local (ver audio/servidor.py), si hay uno publicando."""
+    if not servidor_disponible():
+        return []
+    return [AudioDeviceWrapper(
+        name="[Red] Servidor de análisis",
+        is_loopback=False,
+        backend='remote',
+        ref=None
+    )]
 
 class AudioEngine:
     def __init__(self, ctx):
@@ -103,158 +149,128 @@ class AudioEngine:
         # Configuración de audio global
         self.samplerate = 48000
 
+        # Ganancias fijadas desde fuera (proceso de audio sin UI). Si es None
+        # se leen de la configuración de la UI.
+        self.ganancias = None
+
+        # Callbacks invocados tras cada frame de análisis con el contexto
+        # (ej. publicación en memoria compartida). Corren en el hilo de audio.
+        self.listeners = []
+
+        # Apertura/cierre de streams orientada a comandos (pool tibio)
+        self._pa_lock = threading.Lock() # Serializa reinicios de PortAudio y aperturas
+        self.streams = StreamManager(
+            self.samplerate, self.hop_size,
+            profiler=ctx.profiler, pa_lock=self._pa_lock
+        )
+
+        # Descubrimiento de dispositivos en segundo plano (la UI lee la instantánea)
+        self.devices = DeviceMonitor(
+            [("sd", self._enumerar_sd), ("sc", enumerar_sc), ("remote", enumerar_remoto)],
+            profiler=ctx.profiler
+        )
+        self.devices.start()
+
     def get_devices(self):
         """
-        Devuelve una lista unificada de dispositivos disponibles.
-        Filtra Micrófonos físicos vía SoundDevice y Loopbacks vía SoundCard.
+        Devuelve una lista unificada de dispositivos disponibles (bloqueante).
+        La UI no debe llamar a este método: usa la instantánea de 'self.devices'.
         """
         devices = []
-        
-        # --- 1. SoundDevice (Micrófonos) ---
-        # Intentamos filtrar por WASAPI en Windows para reducir duplicados y latencia
-        preferred_api_index = -1
-        try:
-            hostapis = sd.query_hostapis()
-            for i, api in enumerate(hostapis):
-                if 'WASAPI' in api['name']:
-                    preferred_api_index = i
-                    break
-        except: pass
-
-        try:
-            sd_devs = sd.query_devices()
-            for i, dev in enumerate(sd_devs):
-                # Filtramos inputs que tengan canales de entrada
-                if dev['max_input_channels'] > 0:
-                    # Si detectamos WASAPI, ignoramos dispositivos de otras APIs (MME, DS)
-                    if preferred_api_index != -1 and dev['hostapi'] != preferred_api_index:
-                        continue
-
-                    devices.append(AudioDeviceWrapper(
-                        name=f"[Mic] {dev['name']}",
-                        is_loopback=False,
-                        backend='sd',
-                        ref=dev,
-                        sd_index=i
-                    ))
-        except Exception as e:
-            print(f"⚠️ Error inicializando SoundDevice: {e}")
-
-        # --- 2. SoundCard (Loopback / Parlantes) ---
-        try:
-            sc_devs = sc.all_microphones(include_loopback=True)
-            for dev in sc_devs:
-                if dev.isloopback:
-                    devices.append(AudioDeviceWrapper(
-                        name=f"[PC] {dev.name}",
-                        is_loopback=True,
-                        backend='sc',
-                        ref=dev
-                    ))
-        except Exception as e:
-            print(f"⚠️ Error inicializando SoundCard: {e}")
-            
+        for _, backend in self.devices.backends:
+            devices.extend(backend())
         return devices
 
+    def _enumerar_sd(self):
+        """
+        Enumera SoundDevice. PortAudio cachea la lista de dispositivos al
+        inicializarse, así que la reiniciamos para detectar conexiones en
+        caliente, pero solo si no hay streams de SoundDevice abiertos.
+        """
+        with self._pa_lock:
+            return enumerar_sd(reiniciar=self.streams.sd_abiertos() == 0)
+
     def set_devices(self, devices):
         """Establece los dispositivos activos para captura."""
-        self.selected_mics = devices
+        self.selected_mics = list(devices)
+        self.streams.seleccionar(self.selected_mics)
+
+    def agregar_dispositivo(self, device):
+        """Suma un dispositivo a la mezcla actual (Shift + Click)."""
+        if device not in self.selected_mics:
+            self.selected_mics.append(device)
+            self.streams.agregar(device)
+
+    def pausar(self):
+        """El visualizador dejó de estar activo: los streams quedan tibios."""
+        self.streams.pausar()
+
+    def reanudar(self):
+        self.streams.reanudar()
+
+    def poll(self):
+        """En modo en-proceso el análisis escribe directo en 'ctx': nada que hacer."""
+        pass
 
     def start(self):
         """Inicia el hilo de captura de audio."""
+        self.streams.start()
         if self.thread is None or not self.thread.is_alive():
             self.thread = threading.Thread(target=self._loop, daemon=True)
             self.thread.start()
 
+    def stop(self):
+        """Cierra todos los streams y detiene los hilos auxiliares."""
+        self.streams.detener()
+        self.devices.stop()
+
     def _loop(self):
-        """Loop principal de captura de audio (corre en hilo secundario)."""
+        """Loop principal de análisis de audio (corre en hilo secundario)."""
         while self.ctx.running:
-            # Si no hay visualizador activo o no hay micros, esperar
-            if not self.ctx.activo or not self.selected_mics:
-                time.sleep(0.1)
+            # Esperamos (sin polling) a que el gestor publique fuentes activas
+            fuentes = self.streams.esperar_activos(timeout=0.5)
+            if not fuentes:
                 continue
 
-            # Listas para gestionar los streams activos
-            active_sd_streams = []
-            active_sc_recorders = []
-            
-            # --- FASE DE INICIALIZACIÓN DE STREAMS ---
-            for mic in self.selected_mics:
+            # Un servidor remoto ya entrega el espectro analizado: tiene prioridad
+            # sobre la mezcla local y no pasa por la FFT.
+            remota = next((f for f in fuentes if getattr(f, "espectral", False)), None)
+            if remota is not None:
                 try:
-                    if mic.backend == 'sd':
-                        # Usamos el nuevo sistema de captura con callback
-                        stream = SDMicrophoneStream(
-                            device_index=mic.sd_index,
-                            samplerate=self.samplerate,
-                            blocksize=self.hop_size
-                        )
-                        stream.start()
-                        active_sd_streams.append(stream)
-                        
-                    elif mic.backend == 'sc':
-                        # Inicializar SoundCard Recorder
-                        # SoundCard usa context managers
-                        rec = mic.ref.recorder(
-                            samplerate=self.samplerate, 
-                            channels=1, 
-                            blocksize=self.hop_size
-                        )
-                        rec.__enter__()
-                        active_sc_recorders.append(rec)
-                        
-                except Exception as e:
-                    print(f"⚠️ Error al abrir dispositivo {mic.name}: {e}")
-
-            if not active_sd_streams and not active_sc_recorders:
-                time.sleep(0.5)
+                    frame = remota.read()
+                except Exception:
+                    self.streams.descartar(remota)
+                    continue
+                if frame is not None:
+                    aplicar_frame(self.ctx, frame)
+                    for listener in self.listeners:
+                        listener(self.ctx)
                 continue
 
-            try:
-                # --- BUCLE DE LECTURA EN TIEMPO REAL ---
-                while self.ctx.running and self.ctx.activo:
-                    audios = []
-                    
-                    # 1. Leer de SoundDevice (Queue/Callback)
-                    for stream in active_sd_streams:
-                        # read() ahora gestiona la cola y devuelve (blocksize, 1)
-                        data = stream.read()
-                        audios.append(data.flatten())
-                    
-                    # 2. Leer de SoundCard (Bloqueante)
-                    # Si SD ya esperó, el buffer de SC debería estar lleno y retornar rápido.
-                    for rec in active_sc_recorders:
-                        try:
-                            data = rec.record(numframes=self.hop_size)
-                            # data shape: (hop_size, 1)
-                            audios.append(data.flatten())
-                        except Exception:
-                            break
-
-                    if audios:
-                        # Mezclar y procesar
-                        # Promediamos todas las fuentes activas
-                        audio_combined = np.mean(audios, axis=0)
-                        
-                        # Actualizar Buffer Circular (Overlap)
-                        self.audio_buffer = np.roll(self.audio_buffer, -self.hop_size)
-                        self.audio_buffer[-self.hop_size:] = audio_combined
-                        
-                        self._actualizar_espectro(self.audio_buffer)
-                    
-                    # No usamos sleep aquí porque las lecturas de audio ya bloquean 
-                    # el tiempo exacto necesario (hop_size / samplerate).
-            finally:
-                # --- LIMPIEZA DE RECURSOS ---
-                for stream in active_sd_streams:
-                    try:
-                        stream.stop()
-                        stream.close()
-                    except: pass
+            audios = []
+            for stream in fuentes:
+                try:
+                    # SoundDevice: read() gestiona la cola y devuelve (blocksize, 1)
+                    # SoundCard: bloqueante; si SD ya esperó, retorna rápido
+                    data = stream.read()
+                    audios.append(data.flatten())
+                except Exception:
+                    # Dispositivo perdido: el gestor lo cierra y lo retira
+                    self.streams.descartar(stream)
+
+            if audios:
+                # Mezclar y procesar
+                # Promediamos todas las fuentes activas
+                audio_combined = np.mean(audios, axis=0)
+                
+                # Actualizar Buffer Circular (Overlap)
+                self.audio_buffer = np.roll(self.audio_buffer, -self.hop_size)
+                self.audio_buffer[-self.hop_size:] = audio_combined
                 
-                for rec in active_sc_recorders:
-                    try:
-                        rec.__exit__(None, None, None)
-                    except: pass
+                self._actualizar_espectro(self.audio_buffer)
+            
+            # No usamos sleep aquí porque las lecturas de audio ya bloquean 
+            # el tiempo exacto necesario (hop_size / samplerate).
 
     def _actualizar_espectro(self, mono_buffer):
         """Procesa FFT y actualiza el estado en el contexto."""
@@ -262,7 +278,9 @@ class AudioEngine:
             # Acceso a configuración a través de UI (si existe) o valores por defecto
             gain_min = 0.3
             gain_max = 2.0
-            if self.ctx.ui:
+            if self.ganancias:
+                gain_min, gain_max = self.ganancias
+            elif self.ctx.ui:
                 gain_min = self.ctx.ui.config["gain_min"]
                 gain_max = self.ctx.ui.config["gain_max"]
 
@@ -323,3 +341,6 @@ class AudioEngine:
             np.copyto(self.ctx.eco, self.ctx.espectro)
             self.ctx.espectro *= 0.85
             self.ctx.espectro += 0.15 * norm
+
+        for listener in self.listeners:
+            listener(self.ctx)
@@ -0,0 +1,210 @@
+# audio/proceso.py
+# ============================================================================
+# Motor de Audio en Proceso Separado (Opcional)
+# ============================================================================
+# Ejecuta AudioEngine (captura + FFT) en un proceso hijo para que no compita
+# por el GIL con el loop de pygame/OpenGL. El hijo publica cada frame de
+# análisis en memoria compartida (SharedSpectrum, seqlock) y el proceso
+# principal lo copia a 'ctx' una vez por frame, sin locks.
+#
+# AudioProcess expone la misma interfaz que AudioEngine para la UI
+# (devices, selected_mics, set_devices, pausar, reanudar...). Los comandos
+# viajan al hijo por una cola; los dispositivos se identifican por su 'key'
+# porque los objetos de SoundCard no se pueden serializar.
+#
+# La difusión UDP/OSC (--udp/--osc) también corre en el hijo, junto a la
+# publicación en memoria compartida: sale un paquete por frame de análisis,
+# sin depender de los FPS del render. Al hijo solo viajan sus argumentos.
+#
+# Métricas (profiler): audio_proc_arranque, audio_proc_reinicio,
+# audio_ipc_latencia (ms desde que el hijo publicó hasta que se leyó).
+# ============================================================================
+
+import multiprocessing as mp
+import queue
+import time
+from .devices import DeviceMonitor
+from .shared import SharedSpectrum, SpectrumFrame, aplicar_frame
+
+class AudioProcess:
+    def __init__(self, ctx, max_reinicios=5, difusion=None):
+        from .engine import enumerar_sd, enumerar_sc, enumerar_remoto
+        self.ctx = ctx
+        self.difusion = difusion # kwargs de SpectrumBroadcaster (se crea en el hijo) o None
+        self.selected_mics = []
+        self.max_reinicios = max_reinicios
+        self.reinicios = 0
+
+        # El proceso principal solo enumera (no abre streams), por lo que
+        # siempre puede reiniciar PortAudio para detectar conexiones. Mismos
+        # backends que AudioEngine: el hijo resuelve las claves contra los suyos.
+        self.devices = DeviceMonitor(
+            [("sd", lambda: enumerar_sd(reiniciar=True)), ("sc", enumerar_sc), ("remote", enumerar_remoto)],
+            profiler=ctx.profiler
+        )
+        self.devices.start()
+
+        self.shared = SharedSpectrum()
+        self.frame = SpectrumFrame()
+        self._ultimo_seq = 0
+        self._pausado = True
+        self._ganancias = None
+
+        # Mismo contrato que AudioEngine.listeners, pero invocados en el hilo
+        # principal cada vez que llega un frame nuevo del proceso hijo.
+        self.listeners = []
+
+        self._mp = mp.get_context("spawn")
+        self.proceso = None
+        self.comandos = None
+        self.listo = None
+        self._t_lanzado = 0.0
+        self._arranque_medido = False
+        self._es_reinicio = False
+
+    # --- Interfaz compatible con AudioEngine ---
+    def get_devices(self):
+        devices = []
+        for _, backend in self.devices.backends:
+            devices.extend(backend())
+        return devices
+
+    def set_devices(self, devices):
+        self.selected_mics = list(devices)
+        self._enviar("seleccionar", [d.key for d in self.selected_mics])
+
+    def agregar_dispositivo(self, device):
+        if device not in self.selected_mics:
+            self.selected_mics.append(device)
+            self._enviar("seleccionar", [d.key for d in self.selected_mics])
+
+    def pausar(self):
+        self._pausado = True
+        self._enviar("pausar")
+
+    def reanudar(self):
+        self._pausado = False
+        self._enviar("reanudar")
+
+    def start(self):
+        """Lanza el proceso hijo (no espera a que termine de arrancar)."""
+        self.comandos = self._mp.Queue()
+        self.listo = self._mp.Event()
+        self._t_lanzado = time.perf_counter()
+        self._arranque_medido = False
+        self.proceso = self._mp.Process(
+            target=_main_proceso_audio,
+            args=(self.shared.nombre, self.comandos, self.listo, self.difusion),
+            daemon=True
+        )
+        self.proceso.start()
+        # Reenviamos el estado actual (necesario tras un reinicio)
+        if self.selected_mics:
+            self._enviar("seleccionar", [d.key for d in self.selected_mics])
+        self._ganancias = None
+        self._enviar("pausar" if self._pausado else "reanudar")
+
+    def stop(self):
+        self.devices.stop()
+        if self.proceso is not None:
+            self._enviar("detener")
+            self.proceso.join(timeout=1.0)
+            if self.proceso.is_alive():
+                self.proceso.terminate()
+            self.proceso = None
+        self.shared.close()
+
+    def poll(self):
+        """
+        Llamado una vez por frame desde el hilo principal: vigila el proceso
+        hijo y copia el último frame publicado a 'ctx'.
+        """
+        if self.proceso is None:
+            return
+        with self.ctx.profiler.region("audio_poll"):
+            self._vigilar()
+            self._sincronizar_ganancias()
+
+            if not self.shared.leer(self.frame) or self.frame.seq == self._ultimo_seq:
+                return
+            self._ultimo_seq = self.frame.seq
+
+            aplicar_frame(self.ctx, self.frame)
+            self.ctx.profiler.records["audio_ipc_latencia"] = (time.perf_counter() - self.frame.timestamp) * 1000
+            for listener in self.listeners:
+                listener(self.ctx)
+
+    # --- Internos ---
+    def _enviar(self, comando, arg=None):
+        if self.comandos is not None:
+            self.comandos.put((comando, arg))
+
+    def _vigilar(self):
+        """Mide el arranque y reinicia el hijo si murió inesperadamente."""
+        if not self._arranque_medido and self.listo.is_set():
+            duracion_ms = (time.perf_counter() - self._t_lanzado) * 1000
+            clave = "audio_proc_reinicio" if self._es_reinicio else "audio_proc_arranque"
+            self.ctx.profiler.records[clave] = duracion_ms
+            print(f"🔊 Proceso de audio listo en {duracion_ms:.0f}ms (pid {self.proceso.pid})")
+            self._arranque_medido = True
+
+        if self.proceso.is_alive() or not self.ctx.running:
+            return
+        if self.reinicios >= self.max_reinicios:
+            print(f"❌ El proceso de audio falló {self.reinicios} veces. Se desactiva la captura.")
+            self.proceso = None
+            return
+        self.reinicios += 1
+        print(f"⚠️ Proceso de audio terminó (código {self.proceso.exitcode}). Reinicio #{self.reinicios}...")
+        self._es_reinicio = True
+        self.start()
+
+    def _sincronizar_ganancias(self):
+        if not self.ctx.ui:
+            return
+        cfg = self.ctx.ui.config
+        ganancias = (cfg["gain_min"], cfg["gain_max"])
+        if ganancias != self._ganancias:
+            self._ganancias = ganancias
+            self._enviar("ganancias", ganancias)
+
+def _main_proceso_audio(nombre_shm, comandos, listo, difusion=None):
+    """Punto de entrada del proceso hijo (headless, sin pygame)."""
+    from core.context import Context
+    from .engine import AudioEngine
+
+    ctx = Context()
+    engine = AudioEngine(ctx)
+    shared = SharedSpectrum(nombre_shm)
+    engine.listeners.append(shared.publicar)
+    emisor = None
+    if difusion:
+        from .red import SpectrumBroadcaster
+        emisor = SpectrumBroadcaster(**difusion)
+        engine.listeners.append(emisor.publicar)
+    engine.start()
+    listo.set()
+
+    try:
+        while ctx.running:
+            try:
+                comando, arg = comandos.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if comando == "seleccionar":
+                # Resolvemos las claves contra la enumeración local del hijo
+                por_clave = {d.key: d for d in engine.get_devices()}
+                engine.set_devices([por_clave[k] for k in arg if k in por_clave])
+            elif comando == "pausar":
+                engine.pausar()
+            elif comando == "reanudar":
+                engine.reanudar()
+            elif comando == "ganancias":
+                engine.ganancias = arg
+            elif comando == "detener":
+                ctx.running = False
+    finally:
+        engine.stop()
+        shared.close()
+        if emisor is not None:
+            emisor.close()
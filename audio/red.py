@@ -0,0 +1,341 @@
+# audio/red.py
+# ============================================================================
+# Difusión del Espectro por Red (UDP / OSC)
+# ============================================================================
+# Envía bass_energy, high_energy y el espectro reducido a N bandas a equipos
+# externos (ej. mesas de luces) al ritmo del análisis de audio.
+#
+# Paquete UDP (little-endian):
+#   cabecera: magic 'RHLS', tipo (0=clave, 1=delta), bits (8/16), n_bandas,
+#             seq (uint32), timestamp (float64), bass/high (uint16)
+#   clave  : bandas cuantizadas (uint8 o uint16)
+#   delta  : diferencia con el estado del receptor, saturada
+#            (int4 empaquetado de a 2 por byte para 8 bits, int8 para 16 bits)
+# Cada 'intervalo_clave' paquetes se envía uno clave. El emisor replica el
+# estado que reconstruye el receptor, así el error de saturación nunca se
+# acumula.
+#
+# OSC: un bundle con /rhl/bass (f), /rhl/high (f) y /rhl/bandas (blob uint8).
+#
+# Todos los buffers se reservan al crear el emisor: empaquetar no asigna
+# memoria y los sockets son no bloqueantes (si el envío no cabe, el paquete
+# se descarta y se cuenta). Los nombres de host se resuelven una sola vez al
+# crear el emisor: sendto con un nombre haría una consulta DNS por paquete.
+#
+# UDP puede perder paquetes: el receptor comprueba que los deltas lleguen
+# seguidos (seq) y, tras un hueco, los ignora hasta el siguiente clave.
+# ============================================================================
+
+import ipaddress
+import socket
+import struct
+import time
+import numpy as np
+
+MAGIC = b"RHLS"
+TIPO_CLAVE = 0
+TIPO_DELTA = 1
+_CABECERA = struct.Struct("<4sBBHIdHH")
+
+def parse_destino(texto):
+    """Convierte 'host:puerto' en una tupla (host, puerto)."""
+    host, _, puerto = texto.rpartition(":")
+    return host or "127.0.0.1", int(puerto)
+
+def resolver_destino(destino):
+    """
+    Convierte (host, puerto) en (ip, puerto) IPv4.
+    Raises:
+        ValueError: Si el nombre no se puede resolver.
+    """
+    try:
+        info = socket.getaddrinfo(destino[0], destino[1], socket.AF_INET, socket.SOCK_DGRAM)
+    except socket.gaierror as e:
+        raise ValueError(f"No se pudo resolver el destino {destino[0]}:{destino[1]} ({e})") from e
+    return info[0][4]
+
+def _abrir_socket_udp(destino):
+    """Socket no bloqueante hacia 'destino' (ip, puerto) ya resuelto."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    if ipaddress.ip_address(destino[0]).is_multicast:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    return sock
+
+class SpectrumPacker:
+    """Reduce, cuantiza y empaqueta el espectro en un buffer preasignado."""
+    def __init__(self, n_bandas=32, bits=8, intervalo_clave=30, spectrum_size=1024):
+        if bits not in (8, 16):
+            raise ValueError("bits debe ser 8 o 16")
+        self.n_bandas = n_bandas
+        self.bits = bits
+        self.intervalo_clave = intervalo_clave
+        self.max_q = (1 << bits) - 1
+        self.seq = 0
+
+        # Reducción 1024 -> N: promedio de grupos contiguos (reduceat)
+        self._inicios = np.linspace(0, spectrum_size, n_bandas, endpoint=False).astype(np.intp)
+        cuentas = np.diff(np.append(self._inicios, spectrum_size))
+        self._inv_cuentas = (1.0 / cuentas).astype(np.float64)
+        self._bandas = np.zeros(n_bandas, dtype=np.float64)
+
+        # Estado del receptor (lo que reconstruye con los paquetes enviados)
+        pares = n_bandas + (n_bandas & 1) # Par para empaquetar nibbles
+        self._q = np.zeros(pares, dtype=np.int32)
+        self._estado = np.zeros(pares, dtype=np.int32)
+        self._delta = np.zeros(pares, dtype=np.int32)
+        self._nib_alto = self._delta[0::2]
+        self._nib_bajo = self._delta[1::2]
+        self._nib = np.zeros(pares // 2, dtype=np.int32)
+        self._nib_aux = np.zeros(pares // 2, dtype=np.int32)
+        self._rango_delta = (-8, 7) if bits == 8 else (-128, 127)
+
+        # Buffers de salida (tamaño máximo: paquete clave)
+        bytes_banda = bits // 8
+        self.buf = bytearray(_CABECERA.size + n_bandas * bytes_banda)
+        self._vista = memoryview(self.buf)
+        payload = _CABECERA.size
+        self._clave = np.ndarray((n_bandas,), dtype=np.uint8 if bits == 8 else np.uint16,
+                                 buffer=self.buf, offset=payload)
+        self._delta_i8 = np.ndarray((n_bandas,), dtype=np.int8, buffer=self.buf, offset=payload)
+        self._delta_nib = np.ndarray((pares // 2,), dtype=np.uint8, buffer=self.buf, offset=payload)
+        self._bytes_clave = _CABECERA.size + n_bandas * bytes_banda
+        self._bytes_delta = _CABECERA.size + (pares // 2 if bits == 8 else n_bandas)
+
+    def reducir(self, espectro):
+        """Promedia el espectro en N bandas y las cuantiza (resultado en self._q)."""
+        np.add.reduceat(espectro, self._inicios, out=self._bandas)
+        np.multiply(self._bandas, self._inv_cuentas, out=self._bandas)
+        np.clip(self._bandas, 0.0, 1.0, out=self._bandas)
+        np.multiply(self._bandas, self.max_q, out=self._bandas)
+        np.rint(self._bandas, out=self._bandas)
+        np.copyto(self._q[:self.n_bandas], self._bandas, casting="unsafe")
+        return self._q[:self.n_bandas]
+
+    def empaquetar(self, espectro, bass, high, timestamp):
+        """Devuelve un memoryview con el paquete listo para enviar."""
+        self.reducir(espectro)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        clave = self.seq % self.intervalo_clave == 1 or self.intervalo_clave <= 1
+
+        if clave:
+            np.copyto(self._estado, self._q)
+            np.copyto(self._clave, self._q[:self.n_bandas], casting="unsafe")
+            tipo, n = TIPO_CLAVE, self._bytes_clave
+        else:
+            np.subtract(self._q, self._estado, out=self._delta)
+            np.clip(self._delta, *self._rango_delta, out=self._delta)
+            np.add(self._estado, self._delta, out=self._estado)
+            if self.bits == 8:
+                # Dos deltas int4 por byte: alto = banda par, bajo = banda impar
+                np.left_shift(self._nib_alto, 4, out=self._nib)
+                np.bitwise_and(self._nib, 0xF0, out=self._nib)
+                np.bitwise_and(self._nib_bajo, 0x0F, out=self._nib_aux)
+                np.bitwise_or(self._nib, self._nib_aux, out=self._nib)
+                np.copyto(self._delta_nib, self._nib, casting="unsafe")
+            else:
+                np.copyto(self._delta_i8, self._delta[:self.n_bandas], casting="unsafe")
+            tipo, n = TIPO_DELTA, self._bytes_delta
+
+        _CABECERA.pack_into(self.buf, 0, MAGIC, tipo, self.bits, self.n_bandas, self.seq, timestamp,
+                            int(min(max(bass, 0.0), 1.0) * 65535), int(min(max(high, 0.0), 1.0) * 65535))
+        return self._vista[:n]
+
+class OSCEncoder:
+    """
+    Bundle OSC de tamaño fijo:
+    /rhl/bass ,f | /rhl/high ,f | /rhl/bandas ,b (uint8 por banda)
+    """
+    def __init__(self, n_bandas):
+        def mensaje(direccion, tags, args_bytes):
+            cab = _osc_str(direccion) + _osc_str(tags)
+            return cab, len(cab) + args_bytes
+
+        blob = n_bandas + (-n_bandas % 4)
+        self._partes = [
+            mensaje("/rhl/bass", ",f", 4),
+            mensaje("/rhl/high", ",f", 4),
+            mensaje("/rhl/bandas", ",b", 4 + blob),
+        ]
+        tam = 16 + sum(4 + largo for _, largo in self._partes)
+        self.buf = bytearray(tam)
+        self.buf[0:8] = b"#bundle\0"
+        struct.pack_into(">Q", self.buf, 8, 1) # Timetag 1 = inmediato
+
+        offset = 16
+        self._offsets = []
+        for cab, largo in self._partes:
+            struct.pack_into(">i", self.buf, offset, largo)
+            self.buf[offset + 4: offset + 4 + len(cab)] = cab
+            self._offsets.append(offset + 4 + len(cab))
+            offset += 4 + largo
+        struct.pack_into(">i", self.buf, self._offsets[2], n_bandas)
+        self._bandas = np.ndarray((n_bandas,), dtype=np.uint8, buffer=self.buf, offset=self._offsets[2] + 4)
+        self._vista = memoryview(self.buf)
+
+    def empaquetar(self, bass, high, bandas_q, escala):
+        struct.pack_into(">f", self.buf, self._offsets[0], bass)
+        struct.pack_into(">f", self.buf, self._offsets[1], high)
+        # Las bandas OSC siempre van en 8 bits
+        if escala == 1:
+            np.copyto(self._bandas, bandas_q, casting="unsafe")
+        else:
+            np.right_shift(bandas_q, 8, out=bandas_q)
+            np.copyto(self._bandas, bandas_q, casting="unsafe")
+        return self._vista
+
+def _osc_str(texto):
+    datos = texto.encode("ascii") + b"\0"
+    return datos + b"\0" * (-len(datos) % 4)
+
+class SpectrumBroadcaster:
+    """
+    Listener del motor de audio que difunde cada frame de análisis.
+        engine.listeners.append(broadcaster.publicar)
+    """
+    def __init__(self, udp=None, osc=None, n_bandas=32, bits=8, intervalo_clave=30):
+        self.packer = SpectrumPacker(n_bandas, bits, intervalo_clave)
+        # (ip, puerto) ya resueltos, o None
+        self.udp = resolver_destino(udp) if udp else None
+        self.osc = resolver_destino(osc) if osc else None
+        self._sock_udp = _abrir_socket_udp(self.udp) if udp else None
+        self._sock_osc = _abrir_socket_udp(self.osc) if osc else None
+        self._osc = OSCEncoder(n_bandas) if osc else None
+        self._bandas_osc = np.zeros(n_bandas, dtype=np.int32)
+
+        # Estadísticas
+        self.paquetes = 0
+        self.bytes = 0
+        self.descartados = 0
+
+    def publicar(self, ctx):
+        paquete = self.packer.empaquetar(ctx.espectro, ctx.bass_energy, ctx.high_energy, time.time())
+        if self._sock_udp:
+            self._enviar(self._sock_udp, paquete, self.udp)
+        if self._sock_osc:
+            np.copyto(self._bandas_osc, self.packer._q[:self.packer.n_bandas])
+            escala = 1 if self.packer.bits == 8 else 256
+            bundle = self._osc.empaquetar(ctx.bass_energy, ctx.high_energy, self._bandas_osc, escala)
+            self._enviar(self._sock_osc, bundle, self.osc)
+
+    def _enviar(self, sock, datos, destino):
+        try:
+            sock.sendto(datos, destino)
+            self.paquetes += 1
+            self.bytes += len(datos)
+        except (BlockingIOError, OSError):
+            # Nunca bloqueamos el hilo de análisis: el paquete se pierde
+            self.descartados += 1
+
+    def close(self):
+        for sock in (self._sock_udp, self._sock_osc):
+            if sock: sock.close()
+
+class SpectrumReceiver:
+    """
+    Receptor de referencia (loopback) para pruebas y benchmarks.
+    Reconstruye las bandas a partir de paquetes clave y delta.
+    """
+    def __init__(self, host="127.0.0.1", puerto=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, puerto))
+        self.direccion = self.sock.getsockname()
+        self.buf = bytearray(65536)
+        self.estado = None
+        self.valido = False # Hay un clave y desde entonces no se perdió ningún paquete
+        self.seq = 0
+        self.bass = 0.0
+        self.high = 0.0
+        self.leidos = 0     # Datagramas leídos (válidos o no)
+        self.recibidos = 0  # Paquetes aplicados al estado
+        self.huecos = 0     # Saltos de seq detectados
+        self.perdidos = 0   # Paquetes que faltaron en esos saltos
+        self.ignorados = 0  # Deltas descartados esperando un clave
+
+    def recibir(self, timeout=0.1):
+        """Procesa un paquete. Devuelve las bandas normalizadas (0..1) o None."""
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.recv_into(self.buf)
+        except (socket.timeout, BlockingIOError):
+            return None
+        self.leidos += 1
+        magic, tipo, bits, n_bandas, seq, _, bass, high = _CABECERA.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            return None
+        payload = _CABECERA.size
+        if self.estado is None or len(self.estado) != n_bandas:
+            self.estado = np.zeros(n_bandas, dtype=np.int32)
+            self.valido = False
+
+        if self.leidos > 1 and seq != (self.seq + 1) & 0xFFFFFFFF:
+            # Se perdieron paquetes: los deltas siguientes parten de un estado que no tenemos
+            self.huecos += 1
+            self.perdidos += (seq - self.seq - 1) & 0xFFFFFFFF
+            self.valido = False
+        self.seq = seq
+
+        if tipo == TIPO_CLAVE:
+            dtype = np.uint8 if bits == 8 else np.uint16
+            self.estado[:] = np.frombuffer(self.buf, dtype=dtype, count=n_bandas, offset=payload)
+            self.valido = True
+        elif not self.valido:
+            self.ignorados += 1
+            return None # Sin clave desde el último hueco no se puede reconstruir
+        elif bits == 8:
+            datos = np.frombuffer(self.buf, dtype=np.uint8, count=(n_bandas + 1) // 2, offset=payload).astype(np.int32)
+            nibs = np.empty(len(datos) * 2, dtype=np.int32)
+            nibs[0::2] = datos >> 4
+            nibs[1::2] = datos & 0x0F
+            nibs[nibs >= 8] -= 16
+            self.estado += nibs[:n_bandas]
+        else:
+            self.estado += np.frombuffer(self.buf, dtype=np.int8, count=n_bandas, offset=payload)
+        self.bass = bass / 65535.0
+        self.high = high / 65535.0
+        self.recibidos += 1
+        return self.estado / float((1 << bits) - 1)
+
+    def vaciar(self, timeout=0.0):
+        """Procesa los paquetes pendientes (recibir() devuelve None también por los deltas ignorados)."""
+        leidos = -1
+        while leidos != self.leidos:
+            leidos = self.leidos
+            self.recibir(timeout)
+
+    def close(self):
+        self.sock.close()
+
+def benchmark(paquetes=20000, n_bandas=32, bits=8):
+    """Mide el costo de empaquetar/enviar y el ancho de banda a la tasa de análisis."""
+    import types
+    receptor = SpectrumReceiver()
+    emisor = SpectrumBroadcaster(udp=receptor.direccion, n_bandas=n_bandas, bits=bits)
+    rng = np.random.default_rng(0)
+    espectros = rng.random((64, 1024)) ** 2
+    ctx = types.SimpleNamespace(espectro=espectros[0], bass_energy=0.5, high_energy=0.2)
+
+    inicio = time.perf_counter()
+    for i in range(paquetes):
+        # Variación suave entre frames, como el espectro suavizado real
+        ctx.espectro = espectros[i % 64]
+        emisor.publicar(ctx)
+        if i % 64 == 63:
+            receptor.vaciar()
+    duracion = time.perf_counter() - inicio
+    receptor.vaciar(timeout=0.05)
+
+    tasa = 48000 / 512 # Frames de análisis por segundo (hop 512 @ 48 kHz)
+    por_paquete = emisor.bytes / max(1, emisor.paquetes)
+    print(f"Bandas: {n_bandas} x {bits} bits | {paquetes} paquetes en {duracion*1000:.1f}ms "
+          f"({duracion/paquetes*1e6:.2f}us/paquete)")
+    print(f"Tamaño medio: {por_paquete:.1f} bytes | Ancho de banda a {tasa:.1f} Hz: {por_paquete*tasa/1024:.2f} KB/s")
+    print(f"Recibidos: {receptor.recibidos} | Descartados (emisor): {emisor.descartados} | "
+          f"Perdidos: {receptor.perdidos} en {receptor.huecos} huecos | Deltas ignorados: {receptor.ignorados}")
+    emisor.close()
+    receptor.close()
+
+if __name__ == "__main__":
+    for bits in (8, 16):
+        benchmark(bits=bits)
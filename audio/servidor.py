@@ -0,0 +1,417 @@
+# audio/servidor.py
+# ============================================================================
+# Servidor de Análisis de Espectro (Un Audio -> Muchas Pantallas)
+# ============================================================================
+# Ejecuta el pipeline AudioEngine/FFTProcessor una sola vez (sin ventana) y
+# publica cada frame para cualquier número de visualizadores locales.
+#
+# Transporte principal: ring buffer en memoria compartida.
+#   [cabecera][tabla de clientes][ranura 0]...[ranura N-1]
+#   Publicar un frame es escribir UNA ranura (seqlock) y avanzar 'head': el
+#   costo no depende de cuántos clientes haya. Cada cliente anota en su fila
+#   de la tabla el último frame leído, y el servidor calcula el retraso.
+#   Las filas las asigna el servidor: el cliente deja su pid como solicitud
+#   y solo el servidor escribe la columna 'pid' (dos clientes que arrancan a
+#   la vez no pueden quedarse con la misma fila).
+#
+# Transporte alternativo: socket Unix (si el cliente no puede adjuntar la
+# memoria compartida). Un hilo aparte reenvía los frames a esos clientes
+# para no cargar el hilo de análisis.
+#
+# En el cliente, el servidor aparece como un dispositivo del backend
+# 'remote' y se lee con RemoteSpectrumStream.
+# ============================================================================
+
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from .shared import SPECTRUM_SIZE, SeqlockSlot, SpectrumFrame, abrir_shared_memory
+
+NOMBRE_SHM = "rhl_espectro"
+RUTA_SOCKET = os.path.join(tempfile.gettempdir(), "rhl_espectro.sock")
+
+NUM_RANURAS = 8
+MAX_CLIENTES = 16
+
+# Cabecera del ring: [head (int64), num_ranuras (int64), max_clientes (int64)]
+_CABECERA_BYTES = 3 * 8
+# Fila de cliente: [pid (int64), último seq leído (int64), latido (float64), solicitud (int64)]
+_FILA_BYTES = 4 * 8
+_TABLA_OFFSET = _CABECERA_BYTES
+_RANURAS_OFFSET = _TABLA_OFFSET + MAX_CLIENTES * _FILA_BYTES
+TAMANO_SHM = _RANURAS_OFFSET + NUM_RANURAS * SeqlockSlot.BYTES
+
+# Mensaje por socket: cabecera (seq, timestamp, bass, high, energy) + espectro float32
+_MSG_CABECERA = struct.Struct("<qdddd")
+MSG_BYTES = _MSG_CABECERA.size + SPECTRUM_SIZE * 4
+_ACK = struct.Struct("<q")
+
+# Un cliente que no anota lecturas en este tiempo se considera desconectado
+LATIDO_MAX = 5.0
+# Lo que espera un cliente a que el servidor confirme su fila
+ESPERA_FILA = 0.25
+
+class SpectrumRing:
+    """Vista numpy del ring buffer compartido (usada por servidor y clientes)."""
+    def __init__(self, shm):
+        self.shm = shm
+        buf = shm.buf
+        self.cabecera = np.ndarray((3,), dtype=np.int64, buffer=buf, offset=0)
+        self.clientes = np.ndarray((MAX_CLIENTES, 4), dtype=np.int64, buffer=buf, offset=_TABLA_OFFSET)
+        # Misma memoria que 'clientes', reinterpretada para el latido (columna 2)
+        self.latidos = np.ndarray((MAX_CLIENTES, 4), dtype=np.float64, buffer=buf, offset=_TABLA_OFFSET)
+        self.ranuras = [
+            SeqlockSlot(buf, _RANURAS_OFFSET + i * SeqlockSlot.BYTES)
+            for i in range(NUM_RANURAS)
+        ]
+
+    @property
+    def head(self):
+        return int(self.cabecera[0])
+
+    def liberar(self):
+        self.cabecera = self.clientes = self.latidos = None
+        self.ranuras = []
+
+class AnalysisServer:
+    """
+    Publica los frames de un AudioEngine. Se registra como listener:
+        engine.listeners.append(servidor.publicar)
+    """
+    def __init__(self, ctx, usar_socket=True):
+        self.ctx = ctx
+        try:
+            self.shm = abrir_shared_memory(NOMBRE_SHM, 0)
+            # Quedó un bloque de una ejecución anterior que terminó mal
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(name=NOMBRE_SHM, create=True, size=TAMANO_SHM)
+        self.ring = SpectrumRing(self.shm)
+        self.ring.cabecera[:] = (0, NUM_RANURAS, MAX_CLIENTES)
+        self.ring.clientes[:] = 0
+        self.seq = 0
+
+        # Fallback por socket (hilo propio)
+        self._sock = None
+        self._clientes_sock = {} # socket -> [último seq enviado, último ack, bytes pendientes]
+        self._evento = threading.Event()
+        self._activo = True
+        if usar_socket and hasattr(socket, "AF_UNIX"):
+            self._iniciar_socket()
+
+    def publicar(self, ctx):
+        """Escribe el frame actual en la siguiente ranura. Costo O(1)."""
+        if self.ring.cabecera is None:
+            return
+        self.seq += 1
+        ranura = self.ring.ranuras[self.seq % NUM_RANURAS]
+        ranura.escribir(self.seq * 2, ctx.espectro, ctx.bass_energy, ctx.high_energy, float(np.mean(ctx.espectro)))
+        self.ring.cabecera[0] = self.seq
+        self._asignar_filas()
+        self._evento.set()
+
+    def _asignar_filas(self):
+        """Confirma las solicitudes en filas libres (el servidor es el único que escribe 'pid')."""
+        clientes = self.ring.clientes
+        for fila in np.flatnonzero((clientes[:, 0] == 0) & (clientes[:, 3] != 0)):
+            pid = int(clientes[fila, 3]) # Si dos la pidieron, gana la última escritura
+            clientes[fila, 3] = 0
+            clientes[fila, 1] = self.seq
+            self.ring.latidos[fila, 2] = time.perf_counter()
+            clientes[fila, 0] = pid
+
+    def retrasos(self):
+        """
+        Devuelve {cliente: frames de retraso} para clientes vivos.
+        Clientes de memoria compartida: 'pid'; de socket: 'sock:N'.
+        """
+        ahora = time.perf_counter()
+        resultado = {}
+        for fila in range(MAX_CLIENTES):
+            pid = int(self.ring.clientes[fila, 0])
+            if pid == 0:
+                continue
+            if ahora - float(self.ring.latidos[fila, 2]) > LATIDO_MAX:
+                self.ring.clientes[fila, 0] = 0 # Libera la fila
+                continue
+            resultado[pid] = self.seq - int(self.ring.clientes[fila, 1])
+        for i, (_, ack, _) in enumerate(list(self._clientes_sock.values())):
+            resultado[f"sock:{i}"] = self.seq - ack
+        return resultado
+
+    def close(self):
+        self._activo = False
+        self._evento.set()
+        if self._sock:
+            self._sock.close()
+            try: os.unlink(RUTA_SOCKET)
+            except OSError: pass
+        self.ring.liberar()
+        self.shm.close()
+        self.shm.unlink()
+
+    # --- Fallback por socket Unix ---
+    def _iniciar_socket(self):
+        try:
+            os.unlink(RUTA_SOCKET)
+        except OSError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(RUTA_SOCKET)
+        self._sock.listen()
+        self._sock.setblocking(False)
+        threading.Thread(target=self._loop_socket, daemon=True).start()
+
+    def _loop_socket(self):
+        """Reenvía el último frame a los clientes de socket (lee el ring como uno más)."""
+        frame = SpectrumFrame()
+        mensaje = bytearray(MSG_BYTES)
+        espectro = np.ndarray((SPECTRUM_SIZE,), dtype=np.float32, buffer=mensaje, offset=_MSG_CABECERA.size)
+        ack = bytearray(_ACK.size)
+        while self._activo:
+            self._evento.wait(0.5)
+            self._evento.clear()
+            try:
+                while True:
+                    conn, _ = self._sock.accept()
+                    conn.setblocking(False)
+                    self._clientes_sock[conn] = [0, self.seq, b""]
+            except (BlockingIOError, OSError):
+                pass
+            if not self._clientes_sock:
+                continue
+            head = self.ring.head
+            if not self.ring.ranuras or not self.ring.ranuras[head % NUM_RANURAS].leer(frame):
+                continue
+            _MSG_CABECERA.pack_into(mensaje, 0, frame.seq, frame.timestamp,
+                                    frame.bass_energy, frame.high_energy, frame.energy)
+            espectro[:] = frame.espectro
+            for conn, estado in list(self._clientes_sock.items()):
+                try:
+                    # Acks pendientes: el último confirma hasta dónde leyó el cliente
+                    while conn.recv_into(ack) == _ACK.size:
+                        estado[1] = _ACK.unpack(ack)[0]
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    self._cerrar_cliente(conn)
+                    continue
+                try:
+                    # Primero terminamos un mensaje que quedó a medias (el stream
+                    # no preserva límites); si el cliente no vacía su buffer se
+                    # salta el frame: nunca bloqueamos.
+                    if estado[2]:
+                        estado[2] = estado[2][conn.send(estado[2]):]
+                        if estado[2]:
+                            continue
+                    enviados = conn.send(mensaje)
+                    if enviados < MSG_BYTES:
+                        estado[2] = bytes(mensaje[enviados:])
+                    estado[0] = frame.seq
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    self._cerrar_cliente(conn)
+
+    def _cerrar_cliente(self, conn):
+        self._clientes_sock.pop(conn, None)
+        try: conn.close()
+        except OSError: pass
+
+def servidor_disponible():
+    """Indica si hay un servidor de análisis publicando en esta máquina."""
+    try:
+        shm = abrir_shared_memory(NOMBRE_SHM, 0)
+        shm.close()
+        return True
+    except (FileNotFoundError, OSError, ValueError):
+        return hasattr(socket, "AF_UNIX") and os.path.exists(RUTA_SOCKET)
+
+class RemoteSpectrumStream:
+    """
+    Fuente del backend 'remote': entrega frames ya analizados por el servidor
+    (no muestras de audio). Misma interfaz de ciclo de vida que los streams
+    locales; 'espectral' indica al motor que no debe pasar por la FFT.
+    """
+    backend = 'remote'
+    espectral = True
+
+    def __init__(self, timeout=0.05):
+        self.timeout = timeout
+        self.frame = SpectrumFrame()
+        self.ring = None
+        self.sock = None
+        self.fila = None
+        self._ultimo = 0
+        self._msg = bytearray(MSG_BYTES)
+
+    def start(self):
+        try:
+            shm = abrir_shared_memory(NOMBRE_SHM, 0)
+            self.ring = SpectrumRing(shm)
+            self._registrar()
+            self._ultimo = self.ring.head
+        except (FileNotFoundError, OSError, ValueError):
+            # Fallback: socket Unix
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(RUTA_SOCKET)
+            self.sock.settimeout(self.timeout)
+
+    def stop(self):
+        if self.ring is not None:
+            if self.fila is not None and self.ring.cabecera is not None:
+                self.ring.clientes[self.fila, 0] = 0
+            shm = self.ring.shm
+            self.ring.liberar()
+            shm.close()
+            self.ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def pausar(self):
+        pass
+
+    def reanudar(self):
+        # Saltamos lo publicado durante la pausa
+        if self.ring is not None:
+            self._ultimo = self.ring.head
+
+    def read(self):
+        """Devuelve el siguiente SpectrumFrame o None si no llegó ninguno a tiempo."""
+        if self.ring is not None:
+            return self._leer_ring()
+        return self._leer_socket()
+
+    def _registrar(self):
+        """
+        Pide una fila libre de la tabla de clientes y espera a que el servidor
+        la confirme (lo hace al publicar el siguiente frame). Si otro cliente
+        se la llevó, prueba con la siguiente.
+        """
+        pid = os.getpid()
+        clientes = self.ring.clientes
+        for fila in range(MAX_CLIENTES):
+            if int(clientes[fila, 0]) != 0:
+                continue
+            clientes[fila, 3] = pid
+            limite = time.perf_counter() + ESPERA_FILA
+            while time.perf_counter() < limite:
+                asignado = int(clientes[fila, 0])
+                if asignado == pid:
+                    self.fila = fila
+                    self.ring.latidos[fila, 2] = time.perf_counter()
+                    return
+                if asignado != 0:
+                    break # Otro cliente ganó esta fila
+                time.sleep(0.002)
+            else:
+                # El servidor no está publicando: sin fila (la solicitud se retira si sigue siendo nuestra)
+                if int(clientes[fila, 3]) == pid:
+                    clientes[fila, 3] = 0
+                break
+        print("⚠️ Servidor de análisis sin filas libres: el retraso de este cliente no se reportará.")
+
+    def _leer_ring(self):
+        limite = time.perf_counter() + self.timeout
+        while True:
+            head = self.ring.head
+            if head != self._ultimo:
+                # Siempre el frame más reciente: un visualizador no necesita los intermedios
+                if self.ring.ranuras[head % NUM_RANURAS].leer(self.frame) and self.frame.seq == head:
+                    self._ultimo = head
+                    if self.fila is not None:
+                        self.ring.clientes[self.fila, 1] = head
+                        self.ring.latidos[self.fila, 2] = time.perf_counter()
+                    return self.frame
+            if time.perf_counter() > limite:
+                return None
+            time.sleep(0.002)
+
+    def _recibir(self, vista, recibido):
+        """Lee en 'vista' hasta completar el mensaje; devuelve los bytes acumulados."""
+        while recibido < MSG_BYTES:
+            try:
+                n = self.sock.recv_into(vista[recibido:])
+            except socket.timeout:
+                self._recibido = recibido
+                raise
+            if n == 0:
+                raise ConnectionError("El servidor de análisis cerró la conexión")
+            recibido += n
+        return recibido
+
+    def _leer_socket(self):
+        vista = memoryview(self._msg)
+        self._recibido = 0
+        try:
+            self._recibir(vista, 0)
+        except socket.timeout:
+            if self._recibido == 0:
+                return None
+            # Mensaje a medias: terminamos de leerlo sin timeout
+            self.sock.settimeout(None)
+            try:
+                self._recibir(vista, self._recibido)
+            finally:
+                self.sock.settimeout(self.timeout)
+        seq, ts, bass, high, energy = _MSG_CABECERA.unpack_from(self._msg, 0)
+        f = self.frame
+        f.seq, f.timestamp, f.bass_energy, f.high_energy, f.energy = seq, ts, bass, high, energy
+        f.espectro[:] = np.frombuffer(self._msg, dtype=np.float32, offset=_MSG_CABECERA.size)
+        self.sock.send(_ACK.pack(seq))
+        return f
+
+def run_servidor(dispositivo=None, listeners=()):
+    """
+    Modo servidor headless (sin pygame): captura, analiza y publica hasta Ctrl+C.
+    Args:
+        dispositivo (str): Parte del nombre del dispositivo a capturar.
+            Por defecto se usa el primer loopback (audio del escritorio).
+        listeners: Callbacks extra por frame (ej. difusión UDP/OSC).
+    """
+    from core.context import Context
+    from .engine import AudioEngine
+
+    ctx = Context()
+    engine = AudioEngine(ctx)
+    devices = [d for d in engine.get_devices() if d.backend != 'remote']
+    if dispositivo:
+        elegidos = [d for d in devices if dispositivo.lower() in d.name.lower()]
+    else:
+        elegidos = [d for d in devices if d.isloopback] or devices
+    if not elegidos:
+        print("❌ No hay dispositivos de audio disponibles para el servidor.")
+        return
+
+    servidor = AnalysisServer(ctx)
+    engine.listeners.append(servidor.publicar)
+    engine.listeners.extend(listeners)
+    engine.set_devices(elegidos[:1])
+    engine.reanudar()
+    engine.start()
+    print(f"📡 Servidor de análisis publicando '{elegidos[0].name}' en '{NOMBRE_SHM}' (Ctrl+C para salir)")
+
+    try:
+        ultimo_seq = 0
+        while True:
+            time.sleep(1.0)
+            fps = servidor.seq - ultimo_seq
+            ultimo_seq = servidor.seq
+            retrasos = servidor.retrasos()
+            detalle = ", ".join(f"{c}: {r}" for c, r in retrasos.items()) or "sin clientes"
+            print(f"Frames/s: {fps:<4} | FFT: {ctx.profiler.records.get('audio_fft', 0):<5.2f}ms | Retraso (frames) -> {detalle}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ctx.running = False
+        engine.stop()
+        servidor.close()
+        print("🛑 Servidor de análisis finalizado.")
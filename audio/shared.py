@@ -0,0 +1,141 @@
+# audio/shared.py
+# ============================================================================
+# Espectro en Memoria Compartida (Seqlock)
+# ============================================================================
+# Publica el resultado del análisis (espectro + energías) en un bloque de
+# multiprocessing.shared_memory para que otro proceso lo lea sin locks.
+#
+# Protocolo seqlock (un único escritor):
+# 1. El escritor incrementa 'seq' (queda impar = escritura en curso).
+# 2. Escribe los datos.
+# 3. Incrementa 'seq' otra vez (queda par = frame consistente).
+# El lector copia los datos y repite si 'seq' era impar o cambió entre la
+# lectura inicial y la final.
+# ============================================================================
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+SPECTRUM_SIZE = 1024
+
+# Cabecera: [seq (int64), timestamp, bass, high, energy (float64)]
+_HEADER_INTS = 1
+_HEADER_FLOATS = 4
+HEADER_BYTES = 8 * (_HEADER_INTS + _HEADER_FLOATS)
+
+def abrir_shared_memory(nombre=None, size=0):
+    """
+    Crea (nombre=None) o adjunta un bloque de memoria compartida.
+    Al adjuntar desactivamos el resource_tracker (Python 3.13+) para que el
+    proceso que solo lee no destruya el bloque al salir.
+    """
+    if nombre is None:
+        return shared_memory.SharedMemory(create=True, size=size)
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=nombre)
+
+class SpectrumFrame:
+    """Instantánea de un frame de análisis (reutilizable, sin asignaciones)."""
+    __slots__ = ("seq", "timestamp", "bass_energy", "high_energy", "energy", "espectro")
+
+    def __init__(self, size=SPECTRUM_SIZE):
+        self.seq = 0
+        self.timestamp = 0.0
+        self.bass_energy = 0.0
+        self.high_energy = 0.0
+        self.energy = 0.0
+        self.espectro = np.zeros(size, dtype=np.float32)
+
+def aplicar_frame(ctx, frame):
+    """Copia un frame ya analizado (de otro proceso) al contexto de render."""
+    if len(ctx.espectro) != len(frame.espectro):
+        ctx.espectro = np.zeros(len(frame.espectro), dtype=float)
+        ctx.eco = np.zeros(len(frame.espectro), dtype=float)
+    np.copyto(ctx.eco, ctx.espectro)
+    ctx.espectro[:] = frame.espectro
+    ctx.bass_energy = frame.bass_energy
+    ctx.high_energy = frame.high_energy
+
+class SeqlockSlot:
+    """
+    Vista numpy de un frame dentro de un buffer compartido.
+    Se usa tanto para el bloque único (SharedSpectrum) como para cada ranura
+    del ring buffer del servidor de análisis.
+    """
+    BYTES = HEADER_BYTES + SPECTRUM_SIZE * 4
+
+    def __init__(self, buf, offset=0, size=SPECTRUM_SIZE):
+        self._seq = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=offset)
+        self._vals = np.ndarray((_HEADER_FLOATS,), dtype=np.float64, buffer=buf, offset=offset + 8)
+        self._espectro = np.ndarray((size,), dtype=np.float32, buffer=buf, offset=offset + HEADER_BYTES)
+
+    @property
+    def seq(self):
+        return int(self._seq[0])
+
+    def escribir(self, seq, espectro, bass, high, energy, timestamp=None):
+        """Escribe un frame completo. 'seq' (par) identifica al frame publicado."""
+        self._seq[0] = seq - 1 # Impar: escritura en curso
+        self._vals[0] = time.perf_counter() if timestamp is None else timestamp
+        self._vals[1] = bass
+        self._vals[2] = high
+        self._vals[3] = energy
+        self._espectro[:] = espectro
+        self._seq[0] = seq
+
+    def leer(self, frame, intentos=8):
+        """
+        Copia el frame a 'frame' (SpectrumFrame). Devuelve False si el
+        escritor no dejó un frame consistente tras varios intentos.
+        """
+        for _ in range(intentos):
+            s1 = int(self._seq[0])
+            if s1 & 1:
+                continue
+            frame.timestamp = float(self._vals[0])
+            frame.bass_energy = float(self._vals[1])
+            frame.high_energy = float(self._vals[2])
+            frame.energy = float(self._vals[3])
+            frame.espectro[:] = self._espectro
+            if int(self._seq[0]) == s1:
+                frame.seq = s1 // 2
+                return True
+        return False
+
+class SharedSpectrum:
+    """
+    Bloque de memoria compartida con un único frame protegido por seqlock.
+    - nombre=None: crea el bloque (proceso dueño, típicamente el principal).
+    - nombre=str: adjunta un bloque existente (proceso de audio).
+    """
+    def __init__(self, nombre=None):
+        self.propietario = nombre is None
+        self.shm = abrir_shared_memory(nombre, SeqlockSlot.BYTES)
+        self.nombre = self.shm.name
+        self.slot = SeqlockSlot(self.shm.buf)
+        # Continuamos la secuencia existente (tras un reinicio del escritor),
+        # redondeando a par por si el anterior murió a mitad de una escritura.
+        self._seq = (self.slot.seq + 1) & ~1
+
+    def publicar(self, ctx):
+        """Escribe el estado de análisis actual de 'ctx' (lado escritor)."""
+        if self.slot is None:
+            return
+        espectro = ctx.espectro
+        self._seq += 2
+        self.slot.escribir(self._seq, espectro, ctx.bass_energy, ctx.high_energy, float(np.mean(espectro)))
+
+    def leer(self, frame):
+        """Lado lector, sin locks. Devuelve True si 'frame' quedó actualizado."""
+        return self.slot.leer(frame)
+
+    def close(self):
+        # Las vistas numpy mantienen referencias al buffer; hay que soltarlas antes
+        self.slot = None
+        self.shm.close()
+        if self.propietario:
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
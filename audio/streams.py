@@ -0,0 +1,368 @@
+# audio/streams.py
+# ============================================================================
+# Gestor de Streams de Captura (Orientado a Eventos)
+# ============================================================================
+# Centraliza la apertura y cierre de streams de SoundDevice y SoundCard.
+# Funciona con comandos (seleccionar, agregar, quitar, pausar, reanudar) que
+# un hilo propio aplica de forma incremental:
+# - Las fuentes que siguen seleccionadas nunca se detienen.
+# - Las fuentes que dejan de usarse quedan "tibias" durante un periodo de
+#   gracia, así volver a elegirlas (tecla M) es instantáneo.
+# - El hilo de análisis espera en una variable de condición en lugar de
+#   hacer polling con sleeps.
+# - Un dispositivo que falla (al abrir o al leer) sigue seleccionado, pero
+#   se reintenta con espera exponencial en lugar de reabrirlo enseguida.
+# ============================================================================
+
+import threading
+import time
+import queue
+from collections import deque
+import numpy as np
+import sounddevice as sd
+
+REINTENTO_MIN = 0.5  # Segundos hasta el primer reintento de un dispositivo que falló
+REINTENTO_MAX = 30.0 # Tope de la espera (se duplica en cada fallo seguido)
+
+class SDMicrophoneStream:
+    """
+    Sistema de captura dedicado para micrófonos usando Callbacks (estilo Visualizador.py).
+    Aísla la captura del hilo principal para evitar 'glitches' y ruidos por latencia.
+    """
+    backend = 'sd'
+
+    def __init__(self, device_index, samplerate, blocksize, noise_gate_threshold=0.015):
+        self.device_index = device_index
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.noise_gate_threshold = noise_gate_threshold
+        self.activo = True # Si es False (stream tibio) el callback descarta los datos
+        self.q = queue.Queue()
+        self.stream = sd.InputStream(
+            device=device_index,
+            channels=1,
+            samplerate=samplerate,
+            blocksize=blocksize,
+            callback=self._callback
+        )
+
+    def _callback(self, indata, frames, time, status):
+        # El callback corre en un hilo de audio de alta prioridad.
+        # Copiamos los datos y los pasamos a la cola inmediatamente.
+        if status:
+            pass # Ignoramos errores menores de buffer para evitar spam
+        if not self.activo:
+            return
+
+        data = indata.copy()
+
+        # Noise Gate: Si la señal es muy débil (ruido de fondo), la silenciamos completamente.
+        if np.max(np.abs(data)) < self.noise_gate_threshold:
+            data[:] = 0.0
+
+        self.q.put(data)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+
+    def pausar(self):
+        self.activo = False
+
+    def reanudar(self):
+        # Descartamos lo acumulado antes de la pausa para no introducir latencia
+        while not self.q.empty():
+            try: self.q.get_nowait()
+            except queue.Empty: break
+        self.activo = True
+
+    def read(self):
+        # Gestión de latencia: si se acumulan demasiados paquetes, descartamos los viejos
+        if self.q.qsize() > 4:
+            while self.q.qsize() > 1:
+                self.q.get_nowait()
+
+        try:
+            return self.q.get(timeout=0.05)
+        except queue.Empty:
+            return np.zeros((self.blocksize, 1), dtype=np.float32)
+
+class SCLoopbackStream:
+    """
+    Envoltorio del Recorder de SoundCard con la misma interfaz que
+    SDMicrophoneStream (start/stop/pausar/reanudar/read).
+    """
+    backend = 'sc'
+
+    def __init__(self, device, samplerate, blocksize):
+        self.blocksize = blocksize
+        # SoundCard usa context managers
+        self.rec = device.recorder(samplerate=samplerate, channels=1, blocksize=blocksize)
+
+    def start(self):
+        self.rec.__enter__()
+
+    def stop(self):
+        self.rec.__exit__(None, None, None)
+
+    def pausar(self):
+        # WASAPI sigue capturando; lo que se acumule se descarta al reanudar
+        pass
+
+    def reanudar(self):
+        flush = getattr(self.rec, "flush", None)
+        if flush:
+            try: flush()
+            except Exception: pass
+
+    def read(self):
+        # Bloqueante: retorna cuando hay 'blocksize' muestras disponibles
+        return self.rec.record(numframes=self.blocksize)
+
+class StreamManager:
+    """
+    Mantiene el conjunto de streams abiertos sincronizado con la selección.
+    Todos los métodos públicos son no bloqueantes (encolan un comando), salvo
+    'esperar_activos', que usa el hilo de análisis.
+    """
+    def __init__(self, samplerate, blocksize, profiler=None, gracia=15.0, pa_lock=None):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.profiler = profiler
+        self.gracia = gracia # Segundos que un stream sin uso permanece abierto
+        self.pa_lock = pa_lock or threading.Lock()
+
+        self._cond = threading.Condition()
+        self._comandos = deque()
+        self._seleccion = []  # Dispositivos deseados (orden de mezcla)
+        self._pausado = True  # Arranca en el menú de selección
+        self._detenido = False
+
+        # Estado propiedad del hilo gestor
+        self._abiertos = {}   # key -> stream en uso
+        self._tibios = {}     # key -> (stream, instante de expiración)
+        self._reintentos = {} # key -> (instante del próximo intento, espera actual)
+        self._activos = ()    # Tupla publicada al lector (reemplazo atómico)
+
+        # Latencia de apertura/cierre por backend (ms, último valor)
+        self.latencias = {}
+        self.thread = None
+
+    # --- API de comandos ---
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def seleccionar(self, devices):
+        self._encolar(("seleccionar", list(devices)))
+
+    def agregar(self, device):
+        self._encolar(("agregar", device))
+
+    def quitar(self, device):
+        self._encolar(("quitar", device))
+
+    def descartar(self, stream):
+        """
+        Cierra un stream que falló (ej. dispositivo desconectado). Sale de la
+        tupla publicada en el acto: el lector no vuelve a recibirlo mientras
+        el hilo gestor procesa el comando.
+        """
+        with self._cond:
+            self._activos = tuple(s for s in self._activos if s is not stream)
+            self._comandos.append(("descartar", stream))
+            self._cond.notify_all()
+
+    def pausar(self):
+        self._encolar(("pausar", None))
+
+    def reanudar(self):
+        self._encolar(("reanudar", None))
+
+    def detener(self):
+        self._encolar(("detener", None))
+
+    def _encolar(self, comando):
+        with self._cond:
+            self._comandos.append(comando)
+            self._cond.notify_all()
+
+    def sd_abiertos(self):
+        """Cantidad de streams de SoundDevice abiertos (en uso o tibios)."""
+        streams = list(self._abiertos.values()) + [s for s, _ in self._tibios.values()]
+        return sum(1 for s in streams if s.backend == 'sd')
+
+    def esperar_activos(self, timeout=None):
+        """
+        Bloquea hasta que haya fuentes activas (no pausado y selección no vacía).
+        Devuelve la tupla de streams o () si venció el timeout / se detuvo.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._detenido or self._activos, timeout)
+            return self._activos
+
+    # --- Hilo gestor ---
+    def _loop(self):
+        while True:
+            with self._cond:
+                timeout = self._proxima_expiracion()
+                self._cond.wait_for(lambda: self._comandos, timeout)
+                comandos = list(self._comandos)
+                self._comandos.clear()
+
+            # Aplicamos los comandos fuera del lock: abrir un stream puede tardar
+            for tipo, arg in comandos:
+                if tipo == "seleccionar":
+                    self._seleccion = list(arg)
+                    for device in arg: # Elegido a mano: se intenta ya
+                        self._reintentos.pop(device.key, None)
+                elif tipo == "agregar":
+                    if arg not in self._seleccion:
+                        self._seleccion.append(arg)
+                    self._reintentos.pop(arg.key, None)
+                elif tipo == "quitar":
+                    if arg in self._seleccion:
+                        self._seleccion.remove(arg)
+                elif tipo == "descartar":
+                    for key, stream in list(self._abiertos.items()):
+                        if stream is arg:
+                            del self._abiertos[key]
+                            self._cerrar(stream)
+                            self._programar_reintento(key)
+                elif tipo == "pausar":
+                    self._pausado = True
+                elif tipo == "reanudar":
+                    self._pausado = False
+                elif tipo == "detener":
+                    self._detenido = True
+
+            if self._detenido:
+                self._cerrar_todo()
+                return
+            if comandos or self._reintentos_vencidos():
+                self._reconciliar()
+            self._expirar_tibios()
+            self._expirar_reintentos()
+
+    def _proxima_expiracion(self):
+        limites = [exp for _, exp in self._tibios.values()]
+        limites += [t for key, (t, _) in self._reintentos.items() if self._pendiente(key)]
+        if not limites:
+            return None
+        return max(0.0, min(limites) - time.monotonic())
+
+    # --- Reintentos (backoff por dispositivo) ---
+    def _programar_reintento(self, key):
+        ahora = time.monotonic()
+        t, espera = self._reintentos.get(key, (0.0, 0.0))
+        # Si anduvo un buen rato desde el último intento, la espera vuelve al mínimo
+        espera = REINTENTO_MIN if ahora - t > REINTENTO_MAX else min(espera * 2, REINTENTO_MAX)
+        self._reintentos[key] = (ahora + espera, espera)
+
+    def _pendiente(self, key):
+        """El dispositivo está seleccionado, sin abrir y esperando su reintento."""
+        return (not self._pausado and key not in self._abiertos
+                and any(d.key == key for d in self._seleccion))
+
+    def _reintentos_vencidos(self):
+        ahora = time.monotonic()
+        return any(t <= ahora and self._pendiente(key) for key, (t, _) in self._reintentos.items())
+
+    def _expirar_reintentos(self):
+        """Olvida el backoff de lo que ya no está seleccionado."""
+        seleccion = {d.key for d in self._seleccion}
+        for key in [k for k in self._reintentos if k not in seleccion]:
+            del self._reintentos[key]
+
+    def _reconciliar(self):
+        """Aplica de forma incremental la diferencia entre lo abierto y lo deseado."""
+        deseados = [] if self._pausado else self._seleccion
+        claves = [d.key for d in deseados]
+
+        # 1. Lo que ya no se usa pasa a tibio (sigue abierto)
+        for key in list(self._abiertos):
+            if key not in claves:
+                stream = self._abiertos.pop(key)
+                stream.pausar()
+                self._tibios[key] = (stream, time.monotonic() + self.gracia)
+
+        # 2. Lo nuevo se reutiliza del pool tibio o se abre
+        for device in deseados:
+            if device.key in self._abiertos:
+                continue
+            if device.key in self._tibios:
+                stream, _ = self._tibios.pop(device.key)
+                stream.reanudar()
+                self._abiertos[device.key] = stream
+                continue
+            reintento = self._reintentos.get(device.key)
+            if reintento is not None and reintento[0] > time.monotonic():
+                continue # Falló hace poco: se espera su reintento
+            stream = self._abrir(device)
+            if stream is not None:
+                self._abiertos[device.key] = stream
+            else:
+                self._programar_reintento(device.key)
+
+        # 3. Publicar la nueva tupla para el hilo de análisis
+        with self._cond:
+            self._activos = tuple(self._abiertos[k] for k in claves if k in self._abiertos)
+            self._cond.notify_all()
+
+    def _abrir(self, device):
+        inicio = time.perf_counter()
+        try:
+            with self.pa_lock:
+                if device.backend == 'sd':
+                    stream = SDMicrophoneStream(
+                        device_index=device.sd_index,
+                        samplerate=self.samplerate,
+                        blocksize=self.blocksize
+                    )
+                elif device.backend == 'remote':
+                    from .servidor import RemoteSpectrumStream
+                    stream = RemoteSpectrumStream()
+                else:
+                    stream = SCLoopbackStream(device.ref, self.samplerate, self.blocksize)
+                stream.start()
+        except Exception as e:
+            print(f"⚠️ Error al abrir dispositivo {device.name}: {e}")
+            return None
+        self._medir(device.backend, "abrir", inicio)
+        return stream
+
+    def _cerrar(self, stream):
+        inicio = time.perf_counter()
+        try:
+            stream.stop()
+        except Exception: pass
+        self._medir(stream.backend, "cerrar", inicio)
+
+    def _medir(self, backend, operacion, inicio):
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        self.latencias.setdefault(backend, {})[operacion] = duracion_ms
+        if self.profiler:
+            self.profiler.records[f"audio_{operacion}_{backend}"] = duracion_ms
+        print(f"🎙️ Stream {backend}: {operacion} en {duracion_ms:.1f}ms")
+
+    def _expirar_tibios(self):
+        ahora = time.monotonic()
+        for key, (stream, expira) in list(self._tibios.items()):
+            if expira <= ahora:
+                del self._tibios[key]
+                self._cerrar(stream)
+
+    def _cerrar_todo(self):
+        with self._cond:
+            self._activos = ()
+            self._cond.notify_all()
+        for stream in list(self._abiertos.values()):
+            self._cerrar(stream)
+        for stream, _ in list(self._tibios.values()):
+            self._cerrar(stream)
+        self._abiertos.clear()
+        self._tibios.clear()
@@ -0,0 +1,134 @@
+# core/arranque.py
+# ============================================================================
+# Perfil de Arranque
+# ============================================================================
+# Mide el costo del arranque en dos niveles:
+# - Importaciones: un finder en sys.meta_path envuelve la ejecución de cada
+#   módulo y registra su tiempo propio y acumulado (como -X importtime,
+#   pero con los datos disponibles desde Python para ordenarlos/filtrarlos).
+# - Fases: tiempo de inicialización de cada subsistema (Context, UIManager,
+#   AudioEngine, ModernRenderer...) mediante 'fase(nombre)'.
+#
+# También ofrece 'importar_diferido' para dependencias pesadas que solo se
+# necesitan en algunos caminos (el módulo se ejecuta en el primer acceso).
+# ============================================================================
+
+import sys
+import time
+import importlib.util
+from contextlib import contextmanager
+
+class _ImportTimer:
+    """Finder que no resuelve nada por sí mismo: solo envuelve los loaders."""
+    def __init__(self, perfil):
+        self.perfil = perfil
+
+    def find_spec(self, nombre, path=None, target=None):
+        # Pedimos la spec al resto de finders (nos sacamos temporalmente)
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(nombre, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if loader is None or not hasattr(loader, "exec_module"):
+            return spec
+        spec.loader = _LoaderMedido(loader, self.perfil)
+        return spec
+
+class _LoaderMedido:
+    def __init__(self, loader, perfil):
+        self.loader = loader
+        self.perfil = perfil
+
+    def __getattr__(self, nombre):
+        return getattr(self.loader, nombre)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        perfil = self.perfil
+        perfil._pila.append(0.0) # Acumulador del tiempo de los hijos
+        inicio = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - inicio
+            hijos = perfil._pila.pop()
+            if perfil._pila:
+                perfil._pila[-1] += total
+            perfil.imports[module.__name__] = (total - hijos, total)
+
+class PerfilArranque:
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.imports = {} # modulo -> (propio_s, acumulado_s)
+        self.fases = {}   # nombre -> ms
+        self._pila = []
+        self._finder = None
+
+    def instalar(self):
+        """Empieza a medir importaciones (solo afecta a módulos aún no importados)."""
+        if self._finder is None:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def desinstalar(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    @contextmanager
+    def fase(self, nombre, profiler=None):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            self.fases[nombre] = duracion_ms
+            if profiler:
+                profiler.records[f"arranque_{nombre}"] = duracion_ms
+
+    def desde_inicio_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def reporte(self, top=15):
+        """Imprime las fases y las importaciones más costosas (por tiempo acumulado)."""
+        print("⏱️ Perfil de arranque")
+        print("   Fases:")
+        for nombre, ms in self.fases.items():
+            print(f"     {nombre:<22} {ms:8.1f}ms")
+        if not self.imports:
+            return
+        # Solo módulos raíz del paquete para el total: los submódulos ya están incluidos
+        raices = {n: v for n, v in self.imports.items() if "." not in n}
+        total = sum(acum for _, acum in raices.values()) * 1000
+        print(f"   Importaciones ({len(self.imports)} módulos, {total:.0f}ms en paquetes raíz):")
+        print(f"     {'módulo':<40} {'propio':>9} {'acumulado':>10}")
+        orden = sorted(self.imports.items(), key=lambda kv: kv[1][1], reverse=True)
+        for nombre, (propio, acumulado) in orden[:top]:
+            print(f"     {nombre:<40} {propio * 1000:8.1f}ms {acumulado * 1000:9.1f}ms")
+
+# Instancia sin importaciones medidas: las fases se registran siempre (barato)
+perfil = PerfilArranque()
+
+def importar_diferido(nombre):
+    """
+    Devuelve el módulo 'nombre' sin ejecutarlo; se carga en el primer acceso
+    a un atributo. Si ya estaba importado, lo devuelve tal cual.
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.find_spec(nombre)
+    if spec is None:
+        raise ImportError(f"No se encontró el módulo '{nombre}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    loader.exec_module(modulo)
+    return modulo
@@ -31,9 +31,14 @@ class Context:
         # Estado visual global
         self.giro = 0.0 # Rotación del túnel
         
+        # Modelo 3D a cargar (.obj con TEXTURE_MAP, o .glb/.gltf)
+        self.ruta_modelo = "modelo 3d/gohan/elfa.obj"
+        
         # Referencias a los subsistemas (se asignan en main.py)
         self.audio = None
         self.renderer = None
         self.ui = None
         self.time = None
+        self.assets = None
+        self.calidad = None # Gobernador de calidad adaptativa
         self.profiler = Profiler()
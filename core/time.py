@@ -3,31 +3,74 @@
 # Sistema de Tiempo
 # ============================================================================
 # Maneja el control de FPS y el cálculo de delta_time para la aplicación.
+#
+# La simulación (giro del túnel, estrellas, paleta, modelo) avanza a paso
+# fijo (PASO_SIM), no una vez por frame: el tiempo real de cada frame se
+# suma a un acumulador y se corren tantos pasos como entren. Lo que sobra
+# (alfa = resto / paso) sirve para interpolar entre los dos últimos estados
+# al dibujar, así el movimiento es el mismo a 30, 60, 144 FPS o sin límite.
 # ============================================================================
 
 import pygame
 
+PASO_SIM = 1.0 / 60.0 # Las constantes por paso están afinadas a 60 Hz
+PASOS_MAX = 8         # Tras un tirón se recuperan hasta 8 pasos; el resto se descarta
+EPSILON = 1e-9        # Tolerancia del acumulador (sumar 1/144 144 veces no da 1.0 exacto)
+
+class PasoFijo:
+    """Acumulador de tiempo real en pasos fijos de simulación."""
+    def __init__(self, paso=PASO_SIM, pasos_max=PASOS_MAX):
+        self.paso = paso
+        self.pasos_max = pasos_max
+        self.acumulador = 0.0
+        self.pasos = 0       # Pasos a correr en este frame
+        self.alfa = 1.0      # Fracción del paso siguiente ya transcurrida (0..1)
+        self.total = 0       # Pasos desde el inicio
+        self.descartados = 0 # Pasos perdidos por tirones largos
+
+    def acumular(self, dt):
+        """
+        Suma el tiempo del frame y calcula cuántos pasos simular.
+        Returns:
+            int: Pasos de simulación para este frame (0 si el frame fue más corto que un paso).
+        """
+        self.acumulador += max(0.0, dt)
+        pasos = int((self.acumulador + EPSILON) / self.paso)
+        if pasos > self.pasos_max:
+            # Tirón (carga, ventana arrastrada): no intentar ponerse al día de golpe
+            self.descartados += pasos - self.pasos_max
+            self.acumulador -= (pasos - self.pasos_max) * self.paso
+            pasos = self.pasos_max
+        self.acumulador = max(0.0, self.acumulador - pasos * self.paso)
+        self.pasos = pasos
+        self.total += pasos
+        self.alfa = min(1.0, self.acumulador / self.paso)
+        return pasos
+
 class TimeManager:
     def __init__(self):
         self.clock = pygame.time.Clock()
         self.delta_time = 0.0
         self.start_time = pygame.time.get_ticks()
+        self.sim = PasoFijo()
 
     def tick(self, fps):
         """
         Avanza el reloj y calcula el tiempo transcurrido desde el último frame.
+        También acumula ese tiempo en el reloj de simulación (ver sim.pasos y sim.alfa).
         Args:
-            fps (int): Frames por segundo objetivo.
+            fps (int): Frames por segundo objetivo (0 = sin límite).
         Returns:
             float: Delta time en segundos.
         """
         self.delta_time = self.clock.tick(fps) / 1000.0
+        self.sim.acumular(self.delta_time)
         return self.delta_time
 
     def get_fps(self):
         """Devuelve los FPS actuales."""
         return self.clock.get_fps()
-    
+
     def get_time(self):
         """Devuelve el tiempo total de ejecución en milisegundos."""
         return pygame.time.get_ticks()
@@ -3,46 +3,139 @@
 # Punto de Entrada Principal
 # ============================================================================
 # Orquesta los módulos (Core, Audio, Render, UI) y ejecuta el loop principal.
+#
+# Las importaciones pesadas (pygame, OpenGL, audio, render) se hacen dentro
+# de main() para que --perfil-arranque pueda medirlas y para que el modo
+# servidor no cargue nada gráfico. El renderizador 3D se construye después
+# del primer frame: el selector de dispositivos aparece antes.
 # ============================================================================
 
-import pygame
-from pygame.locals import DOUBLEBUF, OPENGL, RESIZABLE, VIDEORESIZE, QUIT
+import sys
 import time
+import argparse
+import multiprocessing
+from core.arranque import perfil
 
-# Importar módulos propios
-from core.context import Context
-from core.time import TimeManager
-from audio.engine import AudioEngine
-from render.renderer import ModernRenderer
-from ui.ui import UIManager
+def parse_args():
+    parser = argparse.ArgumentParser(description="RHL - Visualizador de audio")
+    parser.add_argument("--audio-proceso", action="store_true",
+                        help="Ejecuta la captura y el análisis de audio en un proceso separado")
+    parser.add_argument("--servidor", action="store_true",
+                        help="Modo servidor de análisis sin ventana: publica el espectro para otros visualizadores")
+    parser.add_argument("--dispositivo", default=None,
+                        help="(Servidor) Parte del nombre del dispositivo a capturar")
+    parser.add_argument("--udp", default=None, metavar="HOST:PUERTO",
+                        help="Difunde el espectro cuantizado por UDP (unicast o multicast)")
+    parser.add_argument("--osc", default=None, metavar="HOST:PUERTO",
+                        help="Difunde bass/high/bandas como bundle OSC")
+    parser.add_argument("--red-bandas", type=int, default=32,
+                        help="Número de bandas enviadas por red")
+    parser.add_argument("--red-bits", type=int, choices=(8, 16), default=8,
+                        help="Resolución de cada banda enviada por red")
+    parser.add_argument("--perfil-arranque", action="store_true",
+                        help="Mide el costo de cada importación y subsistema durante el arranque")
+    parser.add_argument("--limite-ttff", type=float, default=None, metavar="MS",
+                        help="Chequeo de regresión: sale tras el primer frame con código 1 si tardó más de MS")
+    parser.add_argument("--bench-instancias", action="store_true",
+                        help="Mide el modo de modelo instanciado con 1/100/1000 copias y sale")
+    parser.add_argument("--diff-bloom", type=int, default=None, metavar="CADENCIA",
+                        help="Compara el bloom temporal (cadencia N) con el de tasa completa y sale")
+    parser.add_argument("--modelo", default=None, metavar="RUTA",
+                        help="Modelo 3D a cargar (.obj, o .glb/.gltf con el cargador nativo)")
+    return parser.parse_args()
+
+def opciones_difusion(args):
+    """
+    Argumentos del emisor UDP/OSC pedido por línea de comandos (o None).
+    Son datos simples: con --audio-proceso el emisor se crea en el hijo.
+    """
+    if not (args.udp or args.osc):
+        return None
+    from audio.red import parse_destino, resolver_destino
+    # Se resuelven acá: un nombre inválido falla al arrancar, no en el proceso hijo
+    return dict(
+        udp=resolver_destino(parse_destino(args.udp)) if args.udp else None,
+        osc=resolver_destino(parse_destino(args.osc)) if args.osc else None,
+        n_bandas=args.red_bandas,
+        bits=args.red_bits
+    )
+
+def crear_difusion(opciones):
+    """Crea el emisor UDP/OSC en este proceso."""
+    from audio.red import SpectrumBroadcaster
+    return SpectrumBroadcaster(**opciones)
 
 def main():
-    # Inicialización básica
-    pygame.init()
-    
-    # Solicitar un contexto OpenGL 3.3 Core Profile
-    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, pygame.GL_CONTEXT_PROFILE_CORE)
-    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 3)
-    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 3)
-    pygame.display.gl_set_attribute(pygame.GL_STENCIL_SIZE, 8)
-
-    # Crear contexto central
-    ctx = Context()
+    args = parse_args()
+    if args.perfil_arranque:
+        perfil.instalar()
+    difusion = opciones_difusion(args)
+    if args.servidor:
+        # Sin pygame ni OpenGL: solo captura, análisis y publicación
+        from audio.servidor import run_servidor
+        run_servidor(args.dispositivo, listeners=[crear_difusion(difusion).publicar] if difusion else [])
+        return 0
+
+    with perfil.fase("pygame"):
+        import pygame
+        from pygame.locals import DOUBLEBUF, OPENGL, RESIZABLE, VIDEORESIZE, QUIT
+
+        # Inicialización básica
+        pygame.init()
+        
+        # Solicitar un contexto OpenGL 3.3 Core Profile
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, pygame.GL_CONTEXT_PROFILE_CORE)
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 3)
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 3)
+        pygame.display.gl_set_attribute(pygame.GL_STENCIL_SIZE, 8)
+
+    with perfil.fase("Context"):
+        from core.context import Context
+        from core.time import TimeManager
+        # Crear contexto central
+        ctx = Context()
+        if args.modelo:
+            ctx.ruta_modelo = args.modelo
     
-    # Configurar ventana
-    pygame.display.set_caption("RHL")
-    pygame.display.set_mode((ctx.W, ctx.H), DOUBLEBUF | OPENGL | RESIZABLE)
+    with perfil.fase("ventana"):
+        # Configurar ventana
+        pygame.display.set_caption("RHL")
+        pygame.display.set_mode((ctx.W, ctx.H), DOUBLEBUF | OPENGL | RESIZABLE)
+        from OpenGL.GL import glClear, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+        from render.streaming import comenzar_frame, terminar_frame
+        from render.temporizador import TemporizadorGPU
+        gpu_frame = TemporizadorGPU() # Tiempo de GPU del frame (para el gobernador de calidad)
     
     # Inicializar subsistemas inyectando el contexto
     ctx.time = TimeManager()
-    ctx.ui = UIManager(ctx)
-    ctx.audio = AudioEngine(ctx)
-    
-    # El único renderizador es el moderno
-    ctx.renderer = ModernRenderer(ctx)
+    with perfil.fase("AssetLoader", ctx.profiler):
+        from render.assets import AssetLoader
+        # Carga de mallas/texturas en segundo plano con subidas a GPU por frame
+        ctx.assets = AssetLoader(ctx.profiler, inicio=perfil.inicio)
+    with perfil.fase("UIManager", ctx.profiler):
+        from ui.ui import UIManager
+        ctx.ui = UIManager(ctx)
+        from render.calidad import GobernadorCalidad
+        ctx.calidad = GobernadorCalidad(ctx.ui.config, ctx.profiler)
+    with perfil.fase("AudioEngine", ctx.profiler):
+        # Motor de audio: en este proceso (por defecto) o en un proceso hijo
+        if args.audio_proceso:
+            from audio.proceso import AudioProcess
+            # El hijo difunde junto a la memoria compartida (cada frame de análisis, no cada frame de render)
+            ctx.audio = AudioProcess(ctx, difusion=difusion)
+        else:
+            from audio.engine import AudioEngine
+            ctx.audio = AudioEngine(ctx)
+            if difusion:
+                ctx.audio.listeners.append(crear_difusion(difusion).publicar)
+        # Arrancamos en el menú de selección: refresco periódico de dispositivos
+        ctx.audio.devices.observar(ctx.ui.modo_seleccion)
+        
+        # Iniciar motor de audio
+        ctx.audio.start()
     
-    # Iniciar motor de audio
-    ctx.audio.start()
+    codigo_salida = 0
+    primer_frame = True
     
     # Variables para debug
     ultimo_print_debug = time.time()
@@ -53,28 +146,52 @@ def main():
         # Usamos FPS del menú o normal según estado
         fps_target = ctx.ui.config["FPS_MENU"] if (ctx.ui.modo_seleccion or ctx.ui.menu_config_activo) else ctx.ui.config["FPS_NORMAL"]
         dt = ctx.time.tick(fps_target)
+        inicio_trabajo = time.perf_counter() # Trabajo de CPU del frame (sin la espera del tick)
         
         # 2. Procesamiento de Eventos
+        nuevo_tam = None
         for evt in pygame.event.get():
             if evt.type == QUIT:
                 ctx.running = False
             elif evt.type == VIDEORESIZE:
-                ctx.W, ctx.H = evt.w, evt.h
-                pygame.display.set_mode((evt.w, evt.h), DOUBLEBUF | OPENGL | RESIZABLE)
-                ctx.renderer.resize(evt.w, evt.h)
+                # Arrastrar el borde genera decenas de eventos: solo cuenta el último del frame
+                nuevo_tam = (evt.w, evt.h)
             else:
                 # Delegar eventos a UI
                 ctx.ui.procesar_evento(evt)
+
+        if nuevo_tam and nuevo_tam != (ctx.W, ctx.H):
+            ctx.W, ctx.H = nuevo_tam
+            pygame.display.set_mode(nuevo_tam, DOUBLEBUF | OPENGL | RESIZABLE)
+            if ctx.renderer:
+                ctx.renderer.resize(*nuevo_tam)
         
         # Actualización continua de UI (teclas mantenidas)
         ctx.ui.actualizar_continuo()
+
+        # Traer el último frame de análisis (solo hace algo en modo proceso)
+        ctx.audio.poll()
+
+        # Subidas a GPU pendientes (presupuesto de tiempo por frame)
+        with ctx.profiler.region("assets"):
+            ctx.assets.pump()
+
+        # Las subidas hacen binds directos: el caché de estado GL arranca de cero
+        comenzar_frame(ctx.profiler)
+
+        # Simulación a paso fijo: los pasos que entraron en el tiempo de este frame
+        if not ctx.ui.modo_seleccion and ctx.renderer:
+            with ctx.profiler.region("simulacion"):
+                for _ in range(ctx.time.sim.pasos):
+                    ctx.renderer.simular()
+            ctx.profiler.records["sim_pasos"] = ctx.time.sim.pasos
         
         # 3. Renderizado
+        gpu_frame.inicio()
         # Limpiamos la pantalla una sola vez al inicio del ciclo de renderizado
-        from OpenGL.GL import glClear, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        if not ctx.ui.modo_seleccion:
+        if not ctx.ui.modo_seleccion and ctx.renderer:
             with ctx.profiler.region("render_3d"):
                 # Renderizar escena 3D. El renderer ya no limpia la pantalla.
                 ctx.renderer.render()
@@ -82,22 +199,83 @@ def main():
         with ctx.profiler.region("render_ui"):
             # Renderizar escena 3D
             ctx.ui.render()
+        gpu_frame.fin()
+
+        # Fence de las regiones de streaming usadas en este frame
+        terminar_frame(ctx.profiler)
+        trabajo_ms = (time.perf_counter() - inicio_trabajo) * 1000
         
         pygame.display.flip()
+
+        # Calidad adaptativa: solo mide frames del visualizador
+        if gpu_frame.ultimo_ms is not None:
+            ctx.profiler.records["gpu_frame_ms"] = gpu_frame.ultimo_ms
+        if ctx.renderer and not ctx.ui.modo_seleccion:
+            ctx.calidad.registrar(trabajo_ms, gpu_frame.ultimo_ms)
+            ctx.calidad.actualizar()
+        else:
+            ctx.calidad.reiniciar_ventana()
+
+        if primer_frame:
+            primer_frame = False
+            ctx.assets.primer_frame()
+            codigo_salida = chequear_ttff(ctx, args.limite_ttff)
+            if args.limite_ttff is not None:
+                ctx.running = False
+                continue
+
+            # El selector ya está en pantalla: ahora sí el renderizador 3D
+            with perfil.fase("ModernRenderer", ctx.profiler):
+                from render.renderer import ModernRenderer
+                # El único renderizador es el moderno
+                ctx.renderer = ModernRenderer(ctx)
+            if args.perfil_arranque:
+                perfil.reporte()
+                perfil.desinstalar()
+            if args.bench_instancias:
+                ctx.assets.esperar()
+                r = ctx.renderer
+                r.model.benchmark_instancias(r.projection_matrix, r.view_matrix)
+                ctx.running = False
+            if args.diff_bloom:
+                ctx.renderer.diff_bloom_temporal(args.diff_bloom)
+                ctx.running = False
         
         # 4. Profiling
         ahora = time.time()
         if ahora - ultimo_print_debug >= 1.0:
             fps = ctx.time.get_fps()
             res = ctx.profiler.get_results()
-            print(f"FPS: {fps:<5.1f} | 3D: {res.get('render_3d', 0):<5.2f}ms | UI: {res.get('render_ui', 0):<5.2f}ms | Bloom: {res.get('post_bloom', 0):<5.2f}ms")
+            print(f"FPS: {fps:<5.1f} | 3D: {res.get('render_3d', 0):<5.2f}ms | UI: {res.get('render_ui', 0):<5.2f}ms | Bloom: {res.get('cpu_bloom', 0):<5.2f}ms"
+                  f" | GL: {res.get('gl_llamadas', 0)} (+{res.get('gl_omitidas', 0)} omitidas)"
+                  f" | Stream: {res.get('stream_bytes', 0) / 1024:.0f}KB, {res.get('stream_esperas', 0)} esperas"
+                  f" | GPU: {res.get('gpu_frame_ms', 0):<5.2f}ms"
+                  f" | Post: {res.get('post_bytes', 0) / 1024 / 1024:.1f}MB")
+            if ctx.renderer and not ctx.ui.modo_seleccion:
+                print(f"   {ctx.renderer.grafo.resumen()}")
             ultimo_print_debug = ahora
 
     # Limpieza
+    ctx.audio.stop()
+    ctx.assets.shutdown()
     if hasattr(ctx.ui.renderer, 'cleanup'):
         ctx.ui.renderer.cleanup()
     pygame.quit()
     print("🛑 Sistema finalizado.")
+    return codigo_salida
+
+def chequear_ttff(ctx, limite_ms):
+    """Compara el tiempo al primer frame con el límite pedido (0 = OK, 1 = regresión)."""
+    if limite_ms is None:
+        return 0
+    ttff = ctx.profiler.records.get("arranque_ttff", float("inf"))
+    if ttff > limite_ms:
+        print(f"❌ Primer frame en {ttff:.0f}ms (límite: {limite_ms:.0f}ms)")
+        return 1
+    print(f"✅ Primer frame en {ttff:.0f}ms (límite: {limite_ms:.0f}ms)")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    # Necesario para el proceso de audio en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
+    sys.exit(main())
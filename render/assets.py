@@ -0,0 +1,150 @@
+# render/assets.py
+# ============================================================================
+# Cargador de Assets Concurrente
+# ============================================================================
+# Separa la carga de un asset en dos fases:
+# 1. preparar(): trabajo de CPU (parseo de mallas, decodificación de
+#    imágenes...) en un pool de hilos. No puede tocar OpenGL.
+# 2. subir(datos): generador que se ejecuta en el hilo de OpenGL. Cada
+#    'yield' marca un punto donde se puede ceder el frame.
+#
+# pump() se llama una vez por frame y avanza las subidas pendientes hasta
+# agotar el presupuesto de tiempo, así el loop principal nunca se congela
+# mientras se cargan texturas o mallas grandes.
+#
+# Métricas (profiler): arranque_ttff (primer frame) y arranque_total
+# (todos los assets listos), ambos en ms desde el inicio del proceso.
+# ============================================================================
+
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+class Asset:
+    """Estado de un asset en carga."""
+    __slots__ = ("nombre", "estado", "error", "t_inicio", "t_listo")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.estado = "preparando" # preparando -> subiendo -> listo | error
+        self.error = None
+        self.t_inicio = time.perf_counter()
+        self.t_listo = None
+
+    @property
+    def listo(self):
+        return self.estado == "listo"
+
+class AssetLoader:
+    def __init__(self, profiler=None, inicio=None, workers=2, presupuesto_ms=4.0):
+        self.profiler = profiler
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.presupuesto_ms = presupuesto_ms
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+
+        self._preparados = queue.Queue() # (asset, subir, datos, error) desde los workers
+        self._subidas = []               # [(asset, generador)] en el hilo de GL
+        self._pendientes = 0
+        self._total_reportado = False
+        self._ttff_reportado = False
+
+    # --- API ---
+    def cargar(self, nombre, preparar, subir):
+        """
+        Encola un asset.
+        Args:
+            preparar: callable sin argumentos (hilo de trabajo).
+            subir: callable(datos) que devuelve un generador (hilo de GL).
+        Returns:
+            Asset: para consultar su estado.
+        """
+        asset = Asset(nombre)
+        self._pendientes += 1
+        self._total_reportado = False
+
+        def tarea():
+            try:
+                self._preparados.put((asset, subir, preparar(), None))
+            except Exception as e:
+                self._preparados.put((asset, subir, None, e))
+
+        self.pool.submit(tarea)
+        return asset
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    def primer_frame(self):
+        """Llamar tras el primer flip para registrar el tiempo al primer frame."""
+        if self._ttff_reportado:
+            return
+        self._ttff_reportado = True
+        self._registrar("arranque_ttff", "🚀 Primer frame")
+
+    def pump(self, presupuesto_ms=None):
+        """
+        Avanza las subidas a GPU pendientes. Siempre da al menos un paso para
+        garantizar progreso aunque el presupuesto sea muy pequeño.
+        """
+        presupuesto = (self.presupuesto_ms if presupuesto_ms is None else presupuesto_ms) / 1000.0
+        limite = time.perf_counter() + presupuesto
+
+        # 1. Recoger lo que terminaron los workers
+        while True:
+            try:
+                asset, subir, datos, error = self._preparados.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                self._fallar(asset, error)
+                continue
+            asset.estado = "subiendo"
+            self._subidas.append((asset, subir(datos)))
+
+        # 2. Subidas en el hilo de GL con presupuesto de tiempo
+        while self._subidas:
+            asset, generador = self._subidas[0]
+            try:
+                next(generador)
+            except StopIteration:
+                self._subidas.pop(0)
+                self._completar(asset)
+            except Exception as e:
+                self._subidas.pop(0)
+                self._fallar(asset, e)
+            if time.perf_counter() >= limite:
+                break
+
+        if self._pendientes == 0 and not self._total_reportado:
+            self._total_reportado = True
+            self._registrar("arranque_total", "📦 Todos los assets cargados")
+
+    def esperar(self):
+        """Bloquea hasta cargar todo (sin presupuesto). Útil fuera del loop principal."""
+        while self._pendientes:
+            self.pump(presupuesto_ms=float("inf"))
+            if self._pendientes:
+                time.sleep(0.001)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internos ---
+    def _completar(self, asset):
+        asset.estado = "listo"
+        asset.t_listo = time.perf_counter()
+        self._pendientes -= 1
+        print(f"   📦 Asset '{asset.nombre}' listo en {(asset.t_listo - asset.t_inicio) * 1000:.0f}ms")
+
+    def _fallar(self, asset, error):
+        asset.estado = "error"
+        asset.error = error
+        self._pendientes -= 1
+        print(f"❌ Error cargando asset '{asset.nombre}': {error}")
+
+    def _registrar(self, clave, mensaje):
+        duracion_ms = (time.perf_counter() - self.inicio) * 1000
+        if self.profiler:
+            self.profiler.records[clave] = duracion_ms
+        print(f"{mensaje} en {duracion_ms:.0f}ms desde el arranque")
@@ -4,30 +4,36 @@ in vec2 v_uv;
 
 uniform sampler2D u_image;
 uniform bool u_horizontal;
+uniform bool u_extraer;    // Primera pasada: u_image es la escena y se aplica el umbral (bright pass fusionado)
+uniform float u_threshold;
+uniform vec2 u_texel;      // Tamaño de un texel del bloom en UV de la textura de entrada
+uniform vec2 u_uv_max = vec2(1.0); // Último texel válido de la región en uso (afuera hay datos viejos)
 
 // Pesos gaussianos para 5 muestras (optimizados para curva de campana)
 uniform float weight[5] = float[] (0.227027, 0.1945946, 0.1216216, 0.054054, 0.016216);
 
+vec3 muestra(vec2 uv)
+{
+    vec3 color = texture(u_image, min(uv, u_uv_max)).rgb;
+    if (u_extraer)
+    {
+        // Calcular luminancia (brillo percibido)
+        // Los ojos humanos son más sensibles al verde, de ahí los pesos.
+        float brightness = dot(color, vec3(0.2126, 0.7152, 0.0722));
+        color = brightness > u_threshold ? color : vec3(0.0);
+    }
+    return color;
+}
+
 void main()
 {             
-    vec2 tex_offset = 1.0 / textureSize(u_image, 0); // Tamaño de un texel
-    vec3 result = texture(u_image, v_uv).rgb * weight[0]; // Contribución del centro
+    vec2 paso = u_horizontal ? vec2(u_texel.x, 0.0) : vec2(0.0, u_texel.y);
+    vec3 result = muestra(v_uv) * weight[0]; // Contribución del centro
     
-    if(u_horizontal)
-    {
-        for(int i = 1; i < 5; ++i)
-        {
-            result += texture(u_image, v_uv + vec2(tex_offset.x * i, 0.0)).rgb * weight[i];
-            result += texture(u_image, v_uv - vec2(tex_offset.x * i, 0.0)).rgb * weight[i];
-        }
-    }
-    else
+    for(int i = 1; i < 5; ++i)
     {
-        for(int i = 1; i < 5; ++i)
-        {
-            result += texture(u_image, v_uv + vec2(0.0, tex_offset.y * i)).rgb * weight[i];
-            result += texture(u_image, v_uv - vec2(0.0, tex_offset.y * i)).rgb * weight[i];
-        }
+        result += muestra(v_uv + paso * i) * weight[i];
+        result += muestra(v_uv - paso * i) * weight[i];
     }
     FragColor = vec4(result, 1.0);
 }
@@ -1,20 +0,0 @@
-#version 330 core
-out vec4 FragColor;
-in vec2 v_uv;
-
-uniform sampler2D u_scene;
-uniform float u_threshold;
-
-void main()
-{
-    vec3 color = texture(u_scene, v_uv).rgb;
-    
-    // Calcular luminancia (brillo percibido)
-    // Los ojos humanos son más sensibles al verde, de ahí los pesos.
-    float brightness = dot(color, vec3(0.2126, 0.7152, 0.0722));
-
-    if (brightness > u_threshold)
-        FragColor = vec4(color, 1.0);
-    else
-        FragColor = vec4(0.0, 0.0, 0.0, 1.0);
-}
@@ -0,0 +1,252 @@
+# render/calidad.py
+# ============================================================================
+# Gobernador de Calidad Adaptativa
+# ============================================================================
+# Mantiene FPS_NORMAL ajustando una lista priorizada de "perillas" de la
+# configuración. Una vez por segundo mira el percentil 90 del tiempo de
+# trabajo de cada frame (máx. entre CPU y GPU) y lo compara con el
+# presupuesto (1000 / FPS_NORMAL):
+#
+# - Por encima del 95% del presupuesto: baja un paso la primera perilla
+#   (en orden de prioridad) que todavía pueda abaratarse; si el exceso es
+#   grande (ej. 3x el presupuesto) da varios pasos en la misma ventana.
+# - Por debajo del 70% durante varias ventanas seguidas: sube un paso la
+#   última perilla rebajada (orden inverso), sin pasar el valor del usuario.
+# - Histéresis: tras cada cambio se descarta una ventana (datos mezclados)
+#   y, si una perilla recién subida hay que volver a bajarla, se duplica la
+#   cantidad de ventanas exigidas para la próxima subida (evita oscilar).
+#
+# El valor que fija el usuario (menú o preset) es el techo de cada perilla;
+# si lo cambia mientras el gobernador actúa, se toma como techo nuevo. Al
+# desactivar "Calidad Auto" se restauran los techos.
+#
+# No usa OpenGL: los tiempos llegan por registrar(). Se puede probar con el
+# modelo de costo simulado: python -m render.calidad
+# ============================================================================
+
+import time
+import numpy as np
+
+UMBRAL_BAJAR = 0.95
+UMBRAL_SUBIR = 0.70
+VENTANAS_SUBIR = 3
+VENTANAS_SUBIR_MAX = 30
+PASOS_MAX = 4 # Pasos por ventana cuando el exceso es grande
+
+class Perilla:
+    """Un valor de configuración con su extremo barato y su paso."""
+    def __init__(self, clave, barato, paso=1, doble=False, caro_arriba=True):
+        self.clave = clave
+        self.barato = barato # Extremo de menor costo (piso o tope, según el sentido)
+        self.paso = paso
+        self.doble = doble   # Escala geométrica (x2 / /2) en vez de sumar 'paso'
+        self.caro_arriba = caro_arriba # El costo crece con el valor (False: ej. cadencia)
+
+    def _mover(self, valor, hacia):
+        if valor == hacia:
+            return valor
+        if self.doble:
+            nuevo = valor * 2 if hacia > valor else valor // 2
+        else:
+            nuevo = valor + self.paso if hacia > valor else valor - self.paso
+        # Sin pasarse del destino
+        return min(nuevo, hacia) if hacia > valor else max(nuevo, hacia)
+
+    def mas_barato(self, valor):
+        # Un valor del usuario que ya es más barato que 'barato' no se toca
+        if (valor <= self.barato) if self.caro_arriba else (valor >= self.barato):
+            return valor
+        return self._mover(valor, self.barato)
+
+    def mas_caro(self, valor, techo):
+        return self._mover(valor, techo)
+
+# Orden = prioridad para abaratar (lo primero que se sacrifica)
+PERILLAS = [
+    Perilla("bloom_iterations", barato=2, paso=2),
+    Perilla("bloom_cadencia", barato=4, paso=1, caro_arriba=False),
+    Perilla("bloom_downscale", barato=16, doble=True, caro_arriba=False),
+    Perilla("render_scale", barato=0.5, paso=0.125),
+    Perilla("NUM_PARTICULAS", barato=50, doble=True),
+    Perilla("NUM_PLATOS", barato=20, doble=True),
+    Perilla("num_dots", barato=16, paso=8),
+    Perilla("tunel_vueltas", barato=10, paso=8),
+]
+
+class GobernadorCalidad:
+    def __init__(self, config, profiler=None, perillas=None, ventana_s=1.0):
+        self.config = config
+        self.profiler = profiler
+        self.perillas = perillas if perillas is not None else PERILLAS
+        self.ventana_s = ventana_s
+
+        self.techos = {p.clave: config[p.clave] for p in self.perillas}
+        self.aplicado = dict(self.techos) # Último valor escrito por el gobernador
+        self.estaba_activo = self.activo
+
+        self.muestras = []
+        self.inicio_ventana = None
+        self.enfriamiento = 0
+        self.holgura = 0 # Ventanas seguidas con margen para subir
+        self.ventanas_subir = VENTANAS_SUBIR
+        self.ultima_subida = None
+
+        self.p90_ms = 0.0
+        self.presupuesto_ms = 0.0
+        self.ultima_decision = "estable"
+        self.decisiones = [] # (segundos desde el inicio, texto)
+        self.t0 = None
+
+    @property
+    def activo(self):
+        return self.config.get("calidad_auto", 1.0) > 0.5
+
+    def registrar(self, cpu_ms, gpu_ms=None):
+        """Tiempo de trabajo de un frame (el mayor entre CPU y GPU)."""
+        self.muestras.append(max(cpu_ms, gpu_ms or 0.0))
+
+    def reiniciar_ventana(self):
+        """Descarta la ventana actual (ej. en el menú de selección: otra carga)."""
+        self.muestras.clear()
+        self.inicio_ventana = None
+
+    def actualizar(self, ahora=None):
+        """Llamar una vez por frame; evalúa cuando se completa la ventana."""
+        ahora = time.perf_counter() if ahora is None else ahora
+        if self.t0 is None:
+            self.t0 = ahora
+        self._sincronizar_techos()
+
+        if not self.activo:
+            if self.estaba_activo:
+                self._restaurar()
+            self.estaba_activo = False
+            self.reiniciar_ventana()
+            return
+        self.estaba_activo = True
+
+        if self.inicio_ventana is None:
+            self.inicio_ventana = ahora
+            return
+        if ahora - self.inicio_ventana < self.ventana_s:
+            return
+        self._evaluar(ahora)
+        self.muestras.clear()
+        self.inicio_ventana = ahora
+
+    def _sincronizar_techos(self):
+        # Un valor distinto del que escribimos viene del usuario: es el techo nuevo
+        for p in self.perillas:
+            valor = self.config[p.clave]
+            if valor != self.aplicado[p.clave]:
+                self.techos[p.clave] = valor
+                self.aplicado[p.clave] = valor
+
+    def _evaluar(self, ahora):
+        if len(self.muestras) < 5:
+            return
+        self.p90_ms = float(np.percentile(self.muestras, 90))
+        self.presupuesto_ms = 1000.0 / max(1.0, float(self.config["FPS_NORMAL"]))
+        if self.profiler:
+            self.profiler.records["calidad_p90_ms"] = self.p90_ms
+            self.profiler.records["calidad_presupuesto_ms"] = self.presupuesto_ms
+
+        if self.enfriamiento > 0:
+            self.enfriamiento -= 1
+            return
+
+        if self.p90_ms > self.presupuesto_ms * UMBRAL_BAJAR:
+            self.holgura = 0
+            # Un paso extra por cada 50% de exceso sobre el presupuesto
+            exceso = self.p90_ms / self.presupuesto_ms - 1.0
+            for _ in range(min(PASOS_MAX, 1 + int(exceso / 0.5))):
+                if not self._bajar(ahora):
+                    break
+        elif self.p90_ms < self.presupuesto_ms * UMBRAL_SUBIR:
+            self.holgura += 1
+            if self.holgura >= self.ventanas_subir:
+                self.holgura = 0
+                self._subir(ahora)
+        else:
+            self.holgura = 0
+
+    def _bajar(self, ahora):
+        for p in self.perillas:
+            valor = self.config[p.clave]
+            nuevo = p.mas_barato(valor)
+            if nuevo != valor:
+                if p.clave == self.ultima_subida:
+                    # Subirla no se sostuvo: exigir más margen la próxima vez
+                    self.ventanas_subir = min(self.ventanas_subir * 2, VENTANAS_SUBIR_MAX)
+                self.ultima_subida = None
+                self._aplicar(p, valor, nuevo, ahora, "↓")
+                return True
+        self.ultima_decision = "al mínimo"
+        return False
+
+    def _subir(self, ahora):
+        for p in reversed(self.perillas):
+            valor = self.config[p.clave]
+            nuevo = p.mas_caro(valor, self.techos[p.clave])
+            if nuevo != valor:
+                self.ultima_subida = p.clave
+                self._aplicar(p, valor, nuevo, ahora, "↑")
+                return
+        self.ultima_decision = "calidad completa"
+
+    def _aplicar(self, perilla, valor, nuevo, ahora, flecha):
+        self.config[perilla.clave] = nuevo
+        self.aplicado[perilla.clave] = nuevo
+        self.enfriamiento = 1
+        self.ultima_decision = f"{perilla.clave} {flecha} {nuevo:g}"
+        self.decisiones.append((ahora - self.t0, self.ultima_decision))
+        print(f"⚖️ Calidad: {perilla.clave} {valor:g} -> {nuevo:g} "
+              f"(p90 {self.p90_ms:.1f}ms / presupuesto {self.presupuesto_ms:.1f}ms)")
+
+    def _restaurar(self):
+        """Vuelve a los valores del usuario al desactivar el modo automático."""
+        for p in self.perillas:
+            self.config[p.clave] = self.techos[p.clave]
+            self.aplicado[p.clave] = self.techos[p.clave]
+        self.ultima_decision = "desactivado"
+        print("⚖️ Calidad automática desactivada: valores del usuario restaurados")
+
+    def texto_hud(self):
+        return (f"Calidad auto: {self.p90_ms:.0f}/{self.presupuesto_ms:.0f}ms"
+                f" | {self.ultima_decision}")
+
+# ============================================================================
+# Simulación (sin ventana ni GPU)
+# ============================================================================
+def _costo_simulado(cfg, factor_gpu, rng):
+    """Modelo de costo por frame (ms): lineal en cada perilla, más ruido."""
+    # Bloom y relleno de puntos escalan con los píxeles de la escena (render_scale²)
+    pixeles = cfg["render_scale"] ** 2
+    bloom = (cfg["bloom_iterations"] * 0.35 * (4.0 / cfg["bloom_downscale"]) ** 2 * pixeles
+             / cfg["bloom_cadencia"]) # Blur repartido entre 'cadencia' frames
+    estrellas = (cfg["NUM_PARTICULAS"] + cfg["NUM_PLATOS"]) * 0.002 * (0.5 + 0.5 * pixeles)
+    tunel = cfg["num_dots"] * cfg["tunel_vueltas"] * 0.0008 * (0.5 + 0.5 * pixeles)
+    return (2.0 + bloom + estrellas + tunel) * factor_gpu * rng.uniform(0.9, 1.15)
+
+def simular(factor_gpu, segundos=60, fps=60, semilla=0):
+    rng = np.random.default_rng(semilla)
+    cfg = {"FPS_NORMAL": fps, "calidad_auto": 1.0, "bloom_iterations": 20, "bloom_cadencia": 1,
+           "bloom_downscale": 4, "render_scale": 1.0, "NUM_PARTICULAS": 2000, "NUM_PLATOS": 200,
+           "num_dots": 100, "tunel_vueltas": 100}
+    gob = GobernadorCalidad(cfg)
+    ahora = 0.0
+    while ahora < segundos:
+        costo = _costo_simulado(cfg, factor_gpu, rng)
+        gob.registrar(costo * 0.4, costo) # CPU más liviana que la GPU
+        ahora += max(costo, 1000.0 / fps) / 1000.0
+        gob.actualizar(ahora)
+    fps_final = 1000.0 / max(gob.p90_ms, 1000.0 / fps)
+    print(f"   -> {len(gob.decisiones)} decisiones, p90 final {gob.p90_ms:.1f}ms "
+          f"(~{fps_final:.0f} FPS)")
+    print("   -> " + ", ".join(f"{k}={cfg[k]:g}" for k in gob.techos))
+    return gob
+
+if __name__ == "__main__":
+    for nombre, factor in (("GPU dedicada", 0.6), ("GPU integrada", 3.0)):
+        print(f"🖥️ Simulación: {nombre} (factor de costo {factor})")
+        simular(factor)
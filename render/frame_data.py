@@ -0,0 +1,64 @@
+# render/frame_data.py
+# ============================================================================
+# Datos por Frame (Uniform Buffer)
+# ============================================================================
+# Cámara y features de audio compartidos por todos los programas en un único
+# uniform buffer (bloque 'FrameData', layout std140). Se escribe una vez por
+# frame con un glBufferSubData desde un array estructurado preasignado, en vez
+# de repetir u_projection/u_view/u_time/u_energy en cada pasada.
+#
+# Declaración en GLSL (igual en todos los shaders que lo usen):
+#
+#   layout(std140) uniform FrameData {
+#       mat4 u_projection;
+#       mat4 u_view;
+#       float u_time;        // Segundos
+#       float u_bass_energy; // Graves (0..1)
+#       float u_high_energy; // Agudos (0..1)
+#       float u_energy;      // Media del espectro
+#       float u_escala_render; // Fracción de la ventana a la que se dibuja la escena
+#   };
+#
+# shaders.load_shader_program enlaza el bloque al punto BINDING de cada
+# programa que lo declare.
+# ============================================================================
+
+import numpy as np
+from OpenGL.GL import *
+from .shaders import BLOQUE_FRAME_BINDING
+
+# Offsets std140: mat4 = 4 columnas vec4 (64 bytes); los floats sueltos se
+# empaquetan seguidos a partir del byte 128. El tamaño del bloque se redondea
+# a múltiplo de 16.
+FRAME_DTYPE = np.dtype({
+    'names':   ['projection', 'view', 'time', 'bass_energy', 'high_energy', 'energy',
+                'escala_render'],
+    'formats': [('<f4', (4, 4)), ('<f4', (4, 4)), '<f4', '<f4', '<f4', '<f4', '<f4'],
+    'offsets': [0, 64, 128, 132, 136, 140, 144],
+    'itemsize': 160,
+})
+
+class FrameData:
+    def __init__(self):
+        self.datos = np.zeros(1, dtype=FRAME_DTYPE)
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, FRAME_DTYPE.itemsize, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        # El punto de enlace queda fijo: no hay otros uniform buffers
+        glBindBufferBase(GL_UNIFORM_BUFFER, BLOQUE_FRAME_BINDING, self.ubo)
+
+    def actualizar(self, projection, view, tiempo, bass, high, energia, escala_render=1.0):
+        """Escribe el frame en el array preasignado y lo sube con una sola llamada."""
+        d = self.datos[0]
+        # pyrr usa vector fila: su layout en memoria ya es el column-major de GLSL
+        d['projection'] = projection
+        d['view'] = view
+        d['time'] = tiempo
+        d['bass_energy'] = bass
+        d['high_energy'] = high
+        d['energy'] = energia
+        d['escala_render'] = escala_render
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, FRAME_DTYPE.itemsize, self.datos)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
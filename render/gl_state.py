@@ -0,0 +1,112 @@
+# render/gl_state.py
+# ============================================================================
+# Estado de OpenGL con Caché
+# ============================================================================
+# Cada pasada (túnel, estrellas, modelo, post, UI) fija defensivamente su
+# estado: programa, VAO, texturas, blend, depth, FBO y viewport. Desde
+# PyOpenGL cada llamada cuesta microsegundos de Python más la validación del
+# driver, así que este módulo recuerda el último valor emitido y omite las
+# llamadas que no cambian nada.
+#
+# Reglas:
+# - Un valor desconocido (None) siempre se emite.
+# - nuevo_frame() olvida todo al inicio del frame: el código de creación de
+#   recursos (subidas del AssetLoader, resize, caché de textos) hace binds
+#   directos y no pasa por aquí.
+# - Dentro del frame, el código de dibujo debe usar 'estado' para todo lo que
+#   este módulo rastrea.
+#
+# Métricas en el profiler: gl_llamadas (emitidas) y gl_omitidas, por frame.
+# ============================================================================
+
+from OpenGL.GL import *
+
+class GLState:
+    def __init__(self):
+        self.emitidas = 0
+        self.omitidas = 0
+        self.invalidar()
+
+    def invalidar(self):
+        """Olvida el estado conocido (la próxima llamada de cada tipo se emite)."""
+        self.programa = None
+        self.vao = None
+        self.unidad = None     # Unidad de textura activa (0, 1, ...)
+        self.texturas = {}     # (unidad, target) -> textura
+        self.capacidades = {}  # GL_BLEND, GL_DEPTH_TEST... -> bool
+        self.blend = None      # (src, dst)
+        self.fbo = None
+        self.vista = None      # (x, y, w, h)
+
+    def nuevo_frame(self, profiler=None):
+        """Publica los contadores del frame anterior y reinicia el caché."""
+        if profiler:
+            profiler.records["gl_llamadas"] = self.emitidas
+            profiler.records["gl_omitidas"] = self.omitidas
+        self.emitidas = 0
+        self.omitidas = 0
+        self.invalidar()
+
+    def _cambia(self, actual, nuevo):
+        if actual == nuevo:
+            self.omitidas += 1
+            return False
+        self.emitidas += 1
+        return True
+
+    # --- Programa / geometría ---
+    def use_program(self, programa):
+        if self._cambia(self.programa, programa):
+            glUseProgram(programa)
+            self.programa = programa
+
+    def bind_vao(self, vao):
+        if self._cambia(self.vao, vao):
+            glBindVertexArray(vao)
+            self.vao = vao
+
+    # --- Texturas ---
+    def active_texture(self, unidad):
+        if self._cambia(self.unidad, unidad):
+            glActiveTexture(GL_TEXTURE0 + unidad)
+            self.unidad = unidad
+
+    def bind_texture(self, unidad, target, textura):
+        clave = (unidad, target)
+        if self.texturas.get(clave) == textura:
+            self.omitidas += 1
+            return
+        self.active_texture(unidad)
+        self.emitidas += 1
+        glBindTexture(target, textura)
+        self.texturas[clave] = textura
+
+    # --- Capacidades (blend, depth, point size...) ---
+    def enable(self, capacidad):
+        if self._cambia(self.capacidades.get(capacidad), True):
+            glEnable(capacidad)
+            self.capacidades[capacidad] = True
+
+    def disable(self, capacidad):
+        if self._cambia(self.capacidades.get(capacidad), False):
+            glDisable(capacidad)
+            self.capacidades[capacidad] = False
+
+    def blend_func(self, src, dst):
+        if self._cambia(self.blend, (src, dst)):
+            glBlendFunc(src, dst)
+            self.blend = (src, dst)
+
+    # --- Destino de render ---
+    def bind_framebuffer(self, fbo):
+        if self._cambia(self.fbo, fbo):
+            glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+            self.fbo = fbo
+
+    def viewport(self, x, y, w, h):
+        if self._cambia(self.vista, (x, y, w, h)):
+            glViewport(x, y, w, h)
+            self.vista = (x, y, w, h)
+
+# Instancia compartida por todos los módulos de render (un solo contexto GL)
+estado = GLState()
@@ -0,0 +1,397 @@
+# render/gltf.py
+# ============================================================================
+# Cargador Nativo glTF 2.0 / GLB
+# ============================================================================
+# Lee .glb (y .gltf con buffers externos o data URIs) sin trimesh:
+# - El chunk binario se abre con np.memmap y cada bufferView usado por la
+#   geometría se sube tal cual a un buffer de OpenGL (sin trabajo por vértice).
+# - Los accessors se traducen directamente a glVertexAttribPointer
+#   (POSITION -> 0, TEXCOORD_0 -> 1, NORMAL -> 2) y a glDrawElements.
+# - Los materiales apuntan a sus imágenes: no hace falta un TEXTURE_MAP.
+#   Las imágenes se decodifican en los hilos del AssetLoader y van a un
+#   texture array (una capa por imagen; la capa se fija por draw con
+#   glVertexAttrib1f(3, capa), mismo shader que los modelos OBJ).
+# - La normalización (centrar + radio 1) se calcula con los min/max de los
+#   accessors POSITION y se aplica como matriz, sin tocar los vértices.
+# - LODs: las primitivas de triángulos indexadas se simplifican con el mismo
+#   vertex clustering que los OBJ (grilla común en espacio de mundo). Cada
+#   nivel es solo un array de índices nuevo; todos van a un buffer extra por
+#   primitiva, con su propio VAO sobre los mismos bufferViews de vértices.
+# ============================================================================
+
+import base64
+import ctypes
+import io
+import json
+import os
+import struct
+import numpy as np
+from OpenGL.GL import *
+from . import texturas
+from .gl_state import estado
+
+_GLB_MAGIC = 0x46546C67 # 'glTF'
+_CHUNK_JSON = 0x4E4F534A
+_CHUNK_BIN = 0x004E4942
+
+_COMPONENTES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+_TAM_TIPO = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+_ATRIBUTOS = {"POSITION": 0, "TEXCOORD_0": 1, "NORMAL": 2}
+_DTYPE_INDICES = {5121: np.uint8, 5123: np.dtype("<u2"), 5125: np.dtype("<u4")}
+# Valor constante cuando la primitiva no trae el atributo
+_POR_DEFECTO = {1: (0.0, 0.0, 0.0), 2: (0.0, 0.0, 1.0)}
+
+def _matriz_nodo(nodo):
+    """Matriz local del nodo en la convención de pyrr (vector fila, traslación en la fila 3)."""
+    if "matrix" in nodo:
+        # glTF guarda column-major: leído fila a fila ya es la traspuesta (vector fila)
+        return np.array(nodo["matrix"], dtype=np.float64).reshape(4, 4)
+    x, y, z, w = nodo.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    rot = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w),     2 * (x * z + y * w)],
+        [2 * (x * y + z * w),     1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w),     2 * (y * z + x * w),     1 - 2 * (x * x + y * y)],
+    ])
+    m = np.identity(4)
+    # T * R * S (vector columna) == S^T * R^T * T^T (vector fila)
+    m[:3, :3] = np.diag(nodo.get("scale", (1.0, 1.0, 1.0))) @ rot.T
+    m[3, :3] = nodo.get("translation", (0.0, 0.0, 0.0))
+    return m
+
+class GLTFScene:
+    def __init__(self, filepath, tam_capa=512, radio=1.0, lod_resoluciones=()):
+        self.filepath = filepath
+        self.tam_capa = tam_capa
+        self.radio = radio
+        self.lod_resoluciones = tuple(lod_resoluciones)
+        self.listo = False
+
+        self.doc = None
+        self.buffers = []       # memmaps / bytes por buffer del documento
+        self.draws = []         # Primitivas listas para dibujar
+        self.imagenes = []      # Índices de imagen usados como baseColor (orden = capa)
+        self.normalizacion = np.identity(4, dtype=np.float32)
+
+        # Recursos OpenGL
+        self.gl_buffers = {}    # bufferView -> id de buffer GL
+        self.buffers_lod = []   # Buffers de índices de los LODs (uno por primitiva simplificada)
+        self.vaos = []
+        self.texture_array = None
+
+        # Matrices reutilizadas en cada draw (sin asignar por frame)
+        self._base = np.empty((4, 4), dtype=np.float32)
+        self._matriz = np.empty((4, 4), dtype=np.float32)
+
+    # --- Hilo de trabajo ---
+    def preparar(self):
+        """Parsea el documento, mapea los buffers y arma la lista de draws (sin GL)."""
+        with open(self.filepath, "rb") as f:
+            cabecera = f.read(12)
+        carpeta = os.path.dirname(self.filepath)
+
+        if len(cabecera) == 12 and struct.unpack("<I", cabecera[:4])[0] == _GLB_MAGIC:
+            mapa = np.memmap(self.filepath, dtype=np.uint8, mode="r")
+            offset = 12
+            binario = None
+            while offset + 8 <= len(mapa):
+                largo, tipo = struct.unpack("<II", mapa[offset:offset + 8].tobytes())
+                datos = mapa[offset + 8:offset + 8 + largo]
+                if tipo == _CHUNK_JSON:
+                    self.doc = json.loads(datos.tobytes().decode("utf-8"))
+                elif tipo == _CHUNK_BIN and binario is None:
+                    binario = datos
+                offset += 8 + largo
+        else:
+            binario = None
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                self.doc = json.load(f)
+
+        for i, buf in enumerate(self.doc.get("buffers", [])):
+            uri = buf.get("uri")
+            if uri is None:
+                self.buffers.append(binario) # Buffer 0 del GLB
+            elif uri.startswith("data:"):
+                self.buffers.append(np.frombuffer(base64.b64decode(uri.split(",", 1)[1]), dtype=np.uint8))
+            else:
+                self.buffers.append(np.memmap(os.path.join(carpeta, uri), dtype=np.uint8, mode="r"))
+
+        self._armar_draws()
+        print(f"📦 glTF: {len(self.draws)} primitivas, {len(self.imagenes)} texturas")
+        self._generar_lods()
+        return self
+
+    def _datos_vista(self, indice):
+        vista = self.doc["bufferViews"][indice]
+        return self.buffers[vista["buffer"]], vista.get("byteOffset", 0)
+
+    def _generar_lods(self):
+        """Índices simplificados por nivel para las primitivas de triángulos indexadas."""
+        if not self.lod_resoluciones:
+            return
+        # Evita el import circular (modelo.py importa este módulo)
+        from .modelo import simplificar_clustering
+
+        candidatas = []
+        for draw in self.draws:
+            pos = draw["punteros"][0]
+            if draw["modo"] != GL_TRIANGLES or "indices" not in draw or pos["tipo"] != GL_FLOAT:
+                continue
+            datos, inicio = self._datos_vista(pos["vista"])
+            local = np.ndarray((pos["count"], 3), dtype="<f4", buffer=datos, offset=inicio + pos["offset"],
+                               strides=(pos["stride"] or 12, 4))
+            m = draw["matriz"]
+            mundo = local @ m[:3, :3] + m[3, :3]
+            idx = draw["indices"]
+            datos, inicio = self._datos_vista(idx["vista"])
+            indices = np.ndarray((idx["count"],), dtype=_DTYPE_INDICES[idx["tipo"]],
+                                 buffer=datos, offset=inicio + idx["offset"])
+            candidatas.append((draw, mundo, indices))
+        if not candidatas:
+            return
+
+        # Grilla común para que las costuras entre primitivas coincidan
+        todos = np.concatenate([mundo for _, mundo, _ in candidatas])
+        origen = todos.min(axis=0)
+        extension = float((todos.max(axis=0) - origen).max()) or 1.0
+        for draw, _, _ in candidatas:
+            draw["indices_lod"] = []
+        for nivel, resolucion in enumerate(self.lod_resoluciones, start=1):
+            tam_celda = extension / resolucion
+            tris = 0
+            for draw, mundo, indices in candidatas:
+                lod = simplificar_clustering(mundo, indices, origen, tam_celda)
+                draw["indices_lod"].append(lod)
+                tris += len(lod) // 3
+            print(f"   🔻 glTF LOD {nivel} (grilla {resolucion}³): {tris} triángulos")
+
+    def _armar_draws(self):
+        doc = self.doc
+        materiales = doc.get("materials", [])
+        texturas_doc = doc.get("textures", [])
+        escena = doc.get("scenes", [{"nodes": list(range(len(doc.get("nodes", []))))}])[doc.get("scene", 0)]
+
+        minimo = np.full(3, np.inf)
+        maximo = np.full(3, -np.inf)
+
+        def visitar(indice, padre):
+            nodo = doc["nodes"][indice]
+            mundo = _matriz_nodo(nodo) @ padre
+            if "mesh" in nodo:
+                for prim in doc["meshes"][nodo["mesh"]]["primitives"]:
+                    draw = self._armar_primitiva(prim, materiales, texturas_doc, mundo)
+                    if draw is None:
+                        continue
+                    self.draws.append(draw)
+                    # Bounds desde min/max del accessor (obligatorios en POSITION)
+                    acc = doc["accessors"][prim["attributes"]["POSITION"]]
+                    if "min" in acc and "max" in acc:
+                        lo, hi = np.array(acc["min"][:3]), np.array(acc["max"][:3])
+                        esquinas = np.array([[x, y, z, 1.0] for x in (lo[0], hi[0])
+                                             for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+                        puntos = (esquinas @ mundo)[:, :3]
+                        np.minimum(minimo, puntos.min(axis=0), out=minimo)
+                        np.maximum(maximo, puntos.max(axis=0), out=maximo)
+            for hijo in nodo.get("children", []):
+                visitar(hijo, mundo)
+
+        for raiz in escena.get("nodes", []):
+            visitar(raiz, np.identity(4))
+
+        # --- Normalización como matriz: centrar en el origen y escalar a 'radio' ---
+        if np.all(np.isfinite(minimo)):
+            centro = (minimo + maximo) / 2.0
+            extension = float(np.linalg.norm(maximo - minimo)) / 2.0 or 1.0
+            escala = self.radio / extension
+            m = np.identity(4) * escala
+            m[3, :3] = -centro * escala
+            m[3, 3] = 1.0
+            self.normalizacion = m.astype(np.float32)
+            print(f"📏 glTF normalizado (Escala aplicada: 1/{extension:.2f})")
+
+    def _armar_primitiva(self, prim, materiales, texturas_doc, mundo):
+        doc = self.doc
+        atributos = prim.get("attributes", {})
+        if "POSITION" not in atributos:
+            return None
+
+        punteros = {}
+        for nombre, loc in _ATRIBUTOS.items():
+            if nombre not in atributos:
+                continue
+            acc = doc["accessors"][atributos[nombre]]
+            if "bufferView" not in acc or "sparse" in acc:
+                print(f"⚠️ glTF: accessor {nombre} sin bufferView o disperso (no soportado)")
+                continue
+            vista = doc["bufferViews"][acc["bufferView"]]
+            punteros[loc] = {
+                "vista": acc["bufferView"],
+                "componentes": _COMPONENTES[acc["type"]],
+                "tipo": acc["componentType"],
+                "normalizado": bool(acc.get("normalized", False)),
+                "stride": vista.get("byteStride", 0),
+                "offset": acc.get("byteOffset", 0),
+                "count": acc["count"],
+            }
+        if 0 not in punteros:
+            return None
+
+        draw = {
+            "modo": prim.get("mode", 4), # Los modos de glTF coinciden con los enums de GL
+            "punteros": punteros,
+            "matriz": mundo.astype(np.float32),
+            "capa": None,
+        }
+        if "indices" in prim:
+            acc = doc["accessors"][prim["indices"]]
+            draw["indices"] = {
+                "vista": acc["bufferView"],
+                "tipo": acc["componentType"],
+                "offset": acc.get("byteOffset", 0),
+                "count": acc["count"],
+            }
+        else:
+            draw["count"] = punteros[0]["count"]
+
+        # --- Material -> imagen baseColor -> capa del texture array ---
+        if "material" in prim:
+            pbr = materiales[prim["material"]].get("pbrMetallicRoughness", {})
+            info = pbr.get("baseColorTexture")
+            if info is not None:
+                imagen = texturas_doc[info["index"]].get("source")
+                if imagen is not None:
+                    if imagen not in self.imagenes:
+                        self.imagenes.append(imagen)
+                    draw["capa"] = self.imagenes.index(imagen)
+        return draw
+
+    def bytes_imagen(self, indice):
+        """Hilo de trabajo: bytes codificados (PNG/JPEG) de una imagen del documento."""
+        img = self.doc["images"][indice]
+        if "bufferView" in img:
+            vista = self.doc["bufferViews"][img["bufferView"]]
+            inicio = vista.get("byteOffset", 0)
+            return self.buffers[vista["buffer"]][inicio:inicio + vista["byteLength"]].tobytes()
+        uri = img["uri"]
+        if uri.startswith("data:"):
+            return base64.b64decode(uri.split(",", 1)[1])
+        with open(os.path.join(os.path.dirname(self.filepath), uri), "rb") as f:
+            return f.read()
+
+    # --- Hilo de GL ---
+    def subir(self, assets):
+        """Generador: un bufferView por paso, luego los VAOs y el texture array."""
+        # Capa extra al final: ajedrez para primitivas sin textura
+        self.capa_sin_textura = len(self.imagenes)
+        self.texture_array = texturas.crear_texture_array(self.tam_capa, len(self.imagenes) + 1)
+        yield
+
+        vistas = {}
+        for draw in self.draws:
+            for p in draw["punteros"].values():
+                vistas.setdefault(p["vista"], GL_ARRAY_BUFFER)
+            if "indices" in draw:
+                vistas[draw["indices"]["vista"]] = GL_ELEMENT_ARRAY_BUFFER
+
+        total = 0
+        for indice, target in vistas.items():
+            vista = self.doc["bufferViews"][indice]
+            inicio = vista.get("byteOffset", 0)
+            datos = self.buffers[vista["buffer"]][inicio:inicio + vista["byteLength"]]
+            buf = glGenBuffers(1)
+            # Se usa GL_ARRAY_BUFFER para subir: el target real lo da el VAO al enlazarlo
+            glBindBuffer(GL_ARRAY_BUFFER, buf)
+            glBufferData(GL_ARRAY_BUFFER, datos.nbytes, datos, GL_STATIC_DRAW)
+            self.gl_buffers[indice] = buf
+            total += datos.nbytes
+            yield
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        for draw in self.draws:
+            ebo = self.gl_buffers[draw["indices"]["vista"]] if "indices" in draw else None
+            draw["vao"] = self._crear_vao(draw, ebo)
+            if "indices" in draw:
+                idx = draw["indices"]
+                draw["lods"] = [(draw["vao"], idx["offset"], idx["count"])]
+            else:
+                draw["lods"] = [(draw["vao"], None, draw["count"])]
+
+            # LODs: todos los niveles en un buffer de índices propio y un VAO que lo usa
+            if draw.get("indices_lod"):
+                unidos = np.concatenate(draw["indices_lod"])
+                buf = glGenBuffers(1)
+                glBindBuffer(GL_ARRAY_BUFFER, buf)
+                glBufferData(GL_ARRAY_BUFFER, unidos.nbytes, unidos, GL_STATIC_DRAW)
+                glBindBuffer(GL_ARRAY_BUFFER, 0)
+                self.buffers_lod.append(buf)
+                total += unidos.nbytes
+                vao_lod = self._crear_vao(draw, buf)
+                offset = 0
+                for lod in draw.pop("indices_lod"):
+                    draw["lods"].append((vao_lod, offset, len(lod)))
+                    offset += lod.nbytes
+            if draw["capa"] is None:
+                draw["capa"] = self.capa_sin_textura
+
+        # --- Imágenes embebidas: decodificación en los hilos del AssetLoader ---
+        for capa, imagen in enumerate(self.imagenes):
+            assets.cargar(f"gltf_imagen:{imagen}",
+                          lambda imagen=imagen: self._decodificar(imagen),
+                          lambda datos, capa=capa: self._subir_imagen(capa, datos))
+
+        self.gpu_bytes = total
+        self.listo = True
+        print(f"✅ glTF subido a GPU: {len(self.gl_buffers)} bufferViews, {total / 1024:.0f} KB")
+
+    def _crear_vao(self, draw, ebo):
+        vao = glGenVertexArrays(1)
+        glBindVertexArray(vao)
+        for loc, p in draw["punteros"].items():
+            glBindBuffer(GL_ARRAY_BUFFER, self.gl_buffers[p["vista"]])
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, p["componentes"], p["tipo"],
+                                  GL_TRUE if p["normalizado"] else GL_FALSE,
+                                  p["stride"], ctypes.c_void_p(p["offset"]))
+        if ebo is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+        glBindVertexArray(0)
+        self.vaos.append(vao)
+        return vao
+
+    def _decodificar(self, imagen):
+        try:
+            return texturas.decodificar_rgba(io.BytesIO(self.bytes_imagen(imagen)), self.tam_capa, voltear=False)
+        except Exception as e:
+            print(f"   ❌ Error decodificando imagen glTF {imagen}: {e}")
+            return None
+
+    def _subir_imagen(self, capa, datos):
+        if datos is None:
+            return
+        yield from texturas.subir_capa(self.texture_array, capa, datos, self.tam_capa)
+
+    def dibujar(self, u_model_loc, model_mat, nivel=0):
+        """
+        Dibuja todas las primitivas en el LOD 'nivel' (el programa del modelo
+        ya está en uso). Las primitivas sin LODs se dibujan completas.
+        Returns:
+            int: Triángulos dibujados.
+        """
+        estado.bind_texture(0, GL_TEXTURE_2D_ARRAY, self.texture_array)
+        np.matmul(self.normalizacion, model_mat, out=self._base)
+        triangulos = 0
+        for draw in self.draws:
+            np.matmul(draw["matriz"], self._base, out=self._matriz)
+            glUniformMatrix4fv(u_model_loc, 1, GL_FALSE, self._matriz)
+            vao, offset, count = draw["lods"][min(nivel, len(draw["lods"]) - 1)]
+            estado.bind_vao(vao)
+            # Atributos ausentes / capa: valores constantes (no forman parte del VAO)
+            for loc, valor in _POR_DEFECTO.items():
+                if loc not in draw["punteros"]:
+                    glVertexAttrib3f(loc, *valor)
+            glVertexAttrib1f(3, draw["capa"])
+            if offset is not None:
+                glDrawElements(draw["modo"], count, draw["indices"]["tipo"], ctypes.c_void_p(offset))
+            else:
+                glDrawArrays(draw["modo"], 0, count)
+            triangulos += count // 3
+        return triangulos
@@ -0,0 +1,242 @@
+# render/grafo.py
+# ============================================================================
+# Grafo de Render
+# ============================================================================
+# El frame se describe como una lista de pasadas que declaran qué recursos
+# leen (entradas) y escriben (salidas). En cada frame el grafo:
+#
+# 1. Descarta las pasadas inactivas (ej. bloom apagado, modelo sin cargar) y,
+#    hacia atrás, las que escriben algo que ninguna pasada viva lee.
+# 2. Calcula la vida de cada recurso (primera y última pasada que lo usa) y
+#    toma los targets del pool justo antes de su primer uso; los devuelve
+#    después del último, así dos recursos con vidas disjuntas y el mismo
+#    tamaño/formato comparten memoria (aliasing).
+# 3. Mide cada pasada en CPU (profiler: cpu_<pasada>) y en GPU con marcas
+#    GL_TIMESTAMP (gpu_<pasada>, llegan unos frames después, sin bloquear).
+#
+# Los targets se piden por clave (ancho, alto, formato de color, formato de
+# profundidad): ningún efecto crea sus propios FBOs. Los que no se usan
+# durante un rato se liberan solos.
+# ============================================================================
+
+import time
+from OpenGL.GL import *
+from .gl_state import estado
+from .temporizador import MarcasGPU
+
+# Bytes por texel de cada formato (para el registro de memoria)
+BYTES_FORMATO = {
+    GL_RGBA16F: 8, GL_R11F_G11F_B10F: 4,
+    GL_DEPTH_COMPONENT16: 2, GL_DEPTH_COMPONENT24: 4,
+}
+_FORMATO_PIXEL = {GL_RGBA16F: GL_RGBA, GL_R11F_G11F_B10F: GL_RGB}
+
+FRAMES_SIN_USO = 120 # Frames que un target libre espera antes de liberarse
+
+class Target:
+    """FBO con una textura de color y, opcionalmente, un renderbuffer de profundidad."""
+    def __init__(self, ancho, alto, formato, profundidad=None):
+        self.ancho, self.alto = ancho, alto
+        self.formato, self.profundidad = formato, profundidad
+        self.clave = (ancho, alto, formato, profundidad)
+        self.ultimo_uso = 0
+        self.rbo = 0
+
+        # Binds directos (se crea entre pasadas): el caché de estado se invalida al final
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        self.tex = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.tex)
+        glTexImage2D(GL_TEXTURE_2D, 0, formato, ancho, alto, 0,
+                     _FORMATO_PIXEL[formato], GL_FLOAT, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.tex, 0)
+
+        if profundidad:
+            self.rbo = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
+            glRenderbufferStorage(GL_RENDERBUFFER, profundidad, ancho, alto)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.rbo)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            print("⚠️ Error: Framebuffer no está completo.")
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        estado.invalidar()
+
+    @property
+    def bytes(self):
+        return self.ancho * self.alto * (BYTES_FORMATO[self.formato] + BYTES_FORMATO.get(self.profundidad, 0))
+
+    def liberar(self):
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteTextures(1, [self.tex])
+        if self.rbo:
+            glDeleteRenderbuffers(1, [self.rbo])
+        estado.invalidar() # Borrar un objeto enlazado deja el enlace en 0
+
+class PoolTargets:
+    """Targets reutilizables por clave. pedir() solo asigna si no hay uno libre igual."""
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.libres = {}  # clave -> [Target]
+        self.en_uso = 0
+        self.frame = 0
+        self.asignaciones = 0
+
+    def pedir(self, ancho, alto, formato, profundidad=None):
+        clave = (ancho, alto, formato, profundidad)
+        libres = self.libres.get(clave)
+        if libres:
+            target = libres.pop()
+        else:
+            inicio = time.perf_counter()
+            target = Target(ancho, alto, formato, profundidad)
+            ms = (time.perf_counter() - inicio) * 1000
+            self.asignaciones += 1
+            if self.profiler:
+                self.profiler.records["targets_asignaciones"] = self.asignaciones
+                self.profiler.records["targets_asignacion_ms"] = ms
+            print(f"🖼️ Target {ancho}x{alto}: {target.bytes / 1024 / 1024:.1f} MB "
+                  f"en {ms:.1f}ms (asignación #{self.asignaciones})")
+        self.en_uso += 1
+        return target
+
+    def devolver(self, target):
+        target.ultimo_uso = self.frame
+        self.libres.setdefault(target.clave, []).append(target)
+        self.en_uso -= 1
+
+    def recortar(self, frames=FRAMES_SIN_USO):
+        """Libera los targets que llevan más de 'frames' sin usarse (0 = todos los libres)."""
+        for clave, libres in list(self.libres.items()):
+            viejos = [t for t in libres if self.frame - t.ultimo_uso >= frames]
+            for t in viejos:
+                t.liberar()
+                libres.remove(t)
+            if not libres:
+                del self.libres[clave]
+
+    def fin_frame(self):
+        self.frame += 1
+        self.recortar()
+        if self.profiler:
+            total = sum(t.bytes for libres in self.libres.values() for t in libres)
+            self.profiler.records["targets_libres_mb"] = total / 1024 / 1024
+
+class Recurso:
+    def __init__(self, nombre, describir):
+        """
+        Args:
+            nombre (str): Con el que lo nombran las pasadas.
+            describir (callable): Se llama una vez por frame y devuelve la
+                clave (ancho, alto, formato, profundidad) del target a pedir
+                al pool, un Target externo (persistente, no vuelve al pool)
+                o None si en este frame no se usa.
+        """
+        self.nombre = nombre
+        self.describir = describir
+
+class Pasada:
+    def __init__(self, nombre, ejecutar, entradas=(), salidas=(), activa=None, final=False):
+        """
+        Args:
+            ejecutar (callable): Recibe un dict nombre -> Target (None si
+                una entrada no la escribe ninguna pasada viva en este frame).
+            activa (callable): Si devuelve False la pasada se descarta.
+            final (bool): Escribe fuera del grafo (la pantalla): nunca se
+                descarta por falta de lectores.
+        """
+        self.nombre = nombre
+        self.ejecutar = ejecutar
+        self.entradas = tuple(entradas)
+        self.salidas = tuple(salidas)
+        self.activa = activa
+        self.final = final
+
+class GrafoRender:
+    def __init__(self, pool, profiler=None):
+        self.pool = pool
+        self.profiler = profiler
+        self.recursos = {}
+        self.pasadas = []
+        self.marcas = MarcasGPU()
+        self.ultimas_vivas = [] # Nombres de las pasadas ejecutadas en el último frame
+
+    def recurso(self, nombre, describir):
+        self.recursos[nombre] = Recurso(nombre, describir)
+
+    def agregar(self, pasada):
+        self.pasadas.append(pasada)
+
+    def _vivas(self):
+        """Pasadas activas que aportan algo a una pasada final."""
+        activas = [p for p in self.pasadas if p.activa is None or p.activa()]
+        vivas, leidos = [], set()
+        for p in reversed(activas):
+            if p.final or leidos.intersection(p.salidas):
+                vivas.append(p)
+                leidos.update(p.entradas)
+        vivas.reverse()
+        return vivas
+
+    def ejecutar(self):
+        vivas = self._vivas()
+
+        # Vida de cada recurso: índices de su primer y último uso
+        primero, ultimo = {}, {}
+        for i, p in enumerate(vivas):
+            for nombre in p.entradas + p.salidas:
+                primero.setdefault(nombre, i)
+                ultimo[nombre] = i
+
+        self.marcas.comenzar_frame()
+        asignados = {}  # nombre -> Target
+        del_pool = set()
+        for i, p in enumerate(vivas):
+            for nombre, inicio in primero.items():
+                if inicio != i:
+                    continue
+                if nombre not in p.salidas:
+                    # Se lee antes de que alguien lo escriba (su productor se descartó)
+                    asignados[nombre] = None
+                    continue
+                desc = self.recursos[nombre].describir()
+                if isinstance(desc, tuple):
+                    asignados[nombre] = self.pool.pedir(*desc)
+                    del_pool.add(nombre)
+                else:
+                    asignados[nombre] = desc # Externo o None
+
+            usados = {n: asignados.get(n) for n in p.entradas + p.salidas}
+            marca = self.marcas.marca()
+            if self.profiler:
+                with self.profiler.region(f"cpu_{p.nombre}"):
+                    p.ejecutar(usados)
+            else:
+                p.ejecutar(usados)
+            self.marcas.medir(p.nombre, marca, self.marcas.marca())
+
+            # Lo que no se vuelve a usar en el frame queda libre para las pasadas siguientes
+            for nombre, fin in ultimo.items():
+                if fin == i and nombre in del_pool:
+                    self.pool.devolver(asignados[nombre])
+        self.marcas.terminar_frame()
+
+        if self.profiler:
+            # Las pasadas descartadas cuentan 0 (no el valor del último frame en que corrieron)
+            for p in self.pasadas:
+                if p not in vivas:
+                    self.profiler.records[f"cpu_{p.nombre}"] = 0.0
+                self.profiler.records[f"gpu_{p.nombre}"] = self.marcas.ultimos_ms.get(p.nombre, 0.0)
+        self.pool.fin_frame()
+        self.ultimas_vivas = [p.nombre for p in vivas]
+
+    def resumen(self):
+        """Una línea con CPU/GPU de cada pasada del último frame (para el log)."""
+        res = self.profiler.records if self.profiler else {}
+        partes = [f"{n} {res.get(f'cpu_{n}', 0):.2f}/{res.get(f'gpu_{n}', 0):.2f}"
+                  for n in self.ultimas_vivas]
+        return "Pasadas (CPU/GPU ms): " + " | ".join(partes)
@@ -0,0 +1,58 @@
+# render/historial.py
+# ============================================================================
+# Historial del Espectro en GPU
+# ============================================================================
+# Textura 2D R32F usada como anillo: cada fila es el espectro de un paso de
+# simulación (60 por segundo, ver core/time.py). Por paso se sube UNA fila
+# (glTexSubImage2D de ~1024 floats) y se avanza la cabeza; el túnel lee con
+# texelFetch la fila de 'k' pasos atrás, así cada capa muestra el espectro
+# de un momento distinto (túnel en el tiempo).
+#
+#   fila(k) = (cabeza - k) mod filas      (k = 0 -> espectro actual)
+# ============================================================================
+
+import numpy as np
+from OpenGL.GL import *
+from .gl_state import estado
+
+FILAS_MAX = 4096 # Tope de profundidad (4096 x 1024 x 4B = 16 MB)
+
+class HistorialEspectro:
+    def __init__(self, ancho, filas):
+        self.tex = glGenTextures(1)
+        self.ancho = 0
+        self.filas = 0
+        self.cabeza = 0
+        self.fila = None # Fila float32 preasignada para la conversión desde float64
+        self.filas_max = min(FILAS_MAX, int(glGetIntegerv(GL_MAX_TEXTURE_SIZE)))
+        self._asignar(ancho, self.limitar(filas))
+
+    def limitar(self, filas):
+        return int(np.clip(filas, 1, self.filas_max))
+
+    def _asignar(self, ancho, filas):
+        """(Re)crea la textura. Se llama al inicio y si cambia el ancho o la profundidad."""
+        self.ancho, self.filas = ancho, filas
+        self.cabeza = 0
+        self.fila = np.zeros(ancho, dtype=np.float32)
+        estado.bind_texture(0, GL_TEXTURE_2D, self.tex)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        # Ceros explícitos: el contenido inicial de glTexImage2D(None) es indefinido
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, ancho, filas, 0, GL_RED, GL_FLOAT,
+                     np.zeros((filas, ancho), dtype=np.float32))
+        # Solo se lee con texelFetch: sin filtrado ni mipmaps
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        print(f"🕓 Historial de espectro: {filas} frames x {ancho} bandas "
+              f"({filas * ancho * 4 / 1024 / 1024:.1f} MB)")
+
+    def empujar(self, espectro, filas):
+        """Sube el espectro de este paso como la nueva cabeza del anillo."""
+        filas = self.limitar(filas)
+        if len(espectro) != self.ancho or filas != self.filas:
+            self._asignar(len(espectro), filas)
+        self.cabeza = (self.cabeza + 1) % self.filas
+        np.copyto(self.fila, espectro, casting="unsafe")
+        estado.bind_texture(0, GL_TEXTURE_2D, self.tex)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, self.cabeza, self.ancho, 1, GL_RED, GL_FLOAT, self.fila)
@@ -0,0 +1,131 @@
+# render/mesh_cache.py
+# ============================================================================
+# Caché de Mallas Horneadas (Baked Meshes)
+# ============================================================================
+# Guarda el resultado final de la carga de un modelo (vértices intercalados
+# + índices, ya en el layout que se sube a la GPU) en un archivo binario
+# propio, para que los siguientes arranques no necesiten trimesh ni parsear
+# el OBJ como texto.
+#
+# Formato (.mesh, little-endian):
+#   [0:16]   Cabecera: magic b"RHLMESH\0" | versión (u32) | largo JSON (u32)
+#   [16:..]  Metadatos JSON: clave de origen + tabla de sub-mallas
+#            (nombre, campos simples en 'extra' y, por cada array:
+#            dtype, shape y offset)
+#   [...]    Arrays crudos, cada uno alineado a 64 bytes
+#
+# La lectura usa np.memmap: los arrays son vistas del archivo y se suben
+# directo a los VBOs sin copias intermedias.
+#
+# La clave es un hash del OBJ, sus MTL y las opciones de horneado
+# (normalización, LODs, mapeo de texturas); si alguno cambia, el archivo se
+# regenera automáticamente.
+# ============================================================================
+
+import hashlib
+import json
+import os
+import re
+import struct
+import numpy as np
+
+MAGIC = b"RHLMESH\0"
+VERSION = 2 # 2: campos 'extra' (el modelo guarda el buffer ya fusionado)
+_HEADER = struct.Struct("<8sII")
+_ALINEACION = 64
+
+def _alinear(n):
+    return (n + _ALINEACION - 1) // _ALINEACION * _ALINEACION
+
+def clave_fuente(filepath, opciones):
+    """Hash de todo lo que influye en la malla horneada."""
+    h = hashlib.sha1()
+    h.update(f"v{VERSION}".encode())
+    h.update(json.dumps(opciones, sort_keys=True).encode())
+
+    with open(filepath, "rb") as f:
+        datos = f.read()
+    h.update(datos)
+
+    # Materiales referenciados por el OBJ (mtllib)
+    carpeta = os.path.dirname(filepath)
+    for nombre in re.findall(rb"^mtllib[ \t]+(.+?)[ \t]*$", datos, re.M):
+        ruta = os.path.join(carpeta, nombre.decode("utf-8", "replace"))
+        if os.path.exists(ruta):
+            with open(ruta, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def guardar(ruta, clave, submallas):
+    """
+    Escribe las sub-mallas horneadas.
+    Args:
+        submallas: lista de dicts con 'nombre' (str) y arrays numpy
+                   (al menos 'vertices' e 'indices'). Los demás campos
+                   deben ser serializables a JSON.
+    """
+    tabla = []
+    arrays = []
+    offset = 0
+    for sub in submallas:
+        entrada = {"nombre": sub["nombre"], "arrays": {}}
+        for campo, valor in sub.items():
+            if not isinstance(valor, np.ndarray):
+                if campo != "nombre":
+                    entrada.setdefault("extra", {})[campo] = valor
+                continue
+            valor = np.ascontiguousarray(valor)
+            entrada["arrays"][campo] = {
+                "dtype": valor.dtype.str,
+                "shape": list(valor.shape),
+                "offset": offset
+            }
+            arrays.append((offset, valor))
+            offset = _alinear(offset + valor.nbytes)
+        tabla.append(entrada)
+
+    meta = json.dumps({"clave": clave, "submallas": tabla}).encode("utf-8")
+    inicio_datos = _alinear(_HEADER.size + len(meta))
+
+    # Escritura atómica: un arranque interrumpido no deja un archivo a medias
+    tmp = ruta + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        for rel, valor in arrays:
+            f.seek(inicio_datos + rel)
+            f.write(valor.tobytes())
+    os.replace(tmp, ruta)
+
+def cargar(ruta, clave):
+    """
+    Devuelve la lista de sub-mallas (arrays como vistas memmap) o None si no
+    existe el archivo, está corrupto o fue horneado con otra clave.
+    """
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "rb") as f:
+            magic, version, largo = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            meta = json.loads(f.read(largo).decode("utf-8"))
+        if meta.get("clave") != clave:
+            return None
+
+        inicio_datos = _alinear(_HEADER.size + largo)
+        blob = np.memmap(ruta, dtype=np.uint8, mode="r")
+        submallas = []
+        for entrada in meta["submallas"]:
+            sub = {"nombre": entrada["nombre"], **entrada.get("extra", {})}
+            for campo, info in entrada["arrays"].items():
+                dtype = np.dtype(info["dtype"])
+                shape = tuple(info["shape"])
+                inicio = inicio_datos + info["offset"]
+                nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+                sub[campo] = blob[inicio:inicio + nbytes].view(dtype).reshape(shape)
+            submallas.append(sub)
+        return submallas
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"⚠️ Caché de malla inválida ({e}). Se regenerará.")
+        return None
@@ -2,8 +2,9 @@
 
 in vec2 v_uv;
 in vec3 v_normal;
+flat in float v_layer;
 
-uniform sampler2D u_texture;
+uniform sampler2DArray u_textures; // Todas las texturas del modelo (una capa por material)
 uniform int u_use_texture;
 
 out vec4 FragColor;
@@ -14,7 +15,7 @@ void main() {
     // 1. Color Base
     vec4 base_color;
     if (u_use_texture == 1) {
-        base_color = texture(u_texture, v_uv);
+        base_color = texture(u_textures, vec3(v_uv, v_layer));
     } else {
         base_color = vec4(1.0, 0.0, 1.0, 1.0); // Rosa debug
     }
@@ -4,19 +4,29 @@
 layout(location = 0) in vec3 a_pos;
 layout(location = 1) in vec2 a_uv;
 layout(location = 2) in vec3 a_normal; // Nueva entrada de normales
+layout(location = 3) in float a_layer; // Capa del texture array (una por material)
 
-uniform mat4 u_projection;
-uniform mat4 u_view;
+layout(std140) uniform FrameData { // Datos por frame compartidos (ver frame_data.py)
+    mat4 u_projection;
+    mat4 u_view;
+    float u_time;
+    float u_bass_energy;
+    float u_high_energy;
+    float u_energy;
+    float u_escala_render;
+};
 uniform mat4 u_model;
 
 out vec2 v_uv;
 out vec3 v_normal;
+flat out float v_layer;
 
 void main() {
     // Transformación estándar de posición
     gl_Position = u_projection * u_view * u_model * vec4(a_pos, 1.0);
     
     v_uv = a_uv;
+    v_layer = a_layer;
     
     // FASE 3: Normalización correcta
     // Usamos mat3(u_model) asumiendo escalado uniforme.
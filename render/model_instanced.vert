@@ -0,0 +1,35 @@
+#version 330 core
+
+// Variante instanciada de model.vert: la matriz de modelo y la energía de la
+// banda asignada llegan por instancia (glVertexAttribDivisor = 1).
+layout(location = 0) in vec3 a_pos;
+layout(location = 1) in vec2 a_uv;
+layout(location = 2) in vec3 a_normal;
+layout(location = 3) in float a_layer;
+layout(location = 4) in mat4 a_instance_model; // Ocupa las locations 4, 5, 6 y 7
+layout(location = 8) in float a_instance_energy; // Energía de la banda de esta copia (0..1)
+
+layout(std140) uniform FrameData { // Datos por frame compartidos (ver frame_data.py)
+    mat4 u_projection;
+    mat4 u_view;
+    float u_time;
+    float u_bass_energy;
+    float u_high_energy;
+    float u_energy;
+    float u_escala_render;
+};
+uniform float u_inflate; // Cuánto se "infla" la figura a lo largo de la normal con la energía
+
+out vec2 v_uv;
+out vec3 v_normal;
+flat out float v_layer;
+
+void main() {
+    vec3 pos = a_pos + a_normal * (a_instance_energy * u_inflate);
+    gl_Position = u_projection * u_view * a_instance_model * vec4(pos, 1.0);
+
+    v_uv = a_uv;
+    v_layer = a_layer;
+    // Escalado uniforme por instancia: mat3 basta para las normales
+    v_normal = mat3(a_instance_model) * a_normal;
+}
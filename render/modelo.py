@@ -4,17 +4,108 @@ import numpy as np
 import ctypes
 import pyrr
 import os
+import time
 from . import shaders
-from GestorDeRecursos import resource_path
+from . import mesh_cache
+from . import texturas
+from .gl_state import estado
+from .streaming import StreamingBuffer, comenzar_frame, terminar_frame
+from .gltf import GLTFScene
+from .simulacion import interpolar, suavizar
+from GestorDeRecursos import resource_path, cache_path
 
-# Intentamos importar trimesh para cargar el GLB
-try:
-    import trimesh
-    from PIL import Image
-except ImportError:
-    trimesh = None
-    Image = None
-    print("⚠️ Error: Librería 'trimesh' no encontrada. Instala con: pip install trimesh")
+# trimesh solo se importa al (re)hornear la malla; PIL vive en render/texturas.py
+
+def interleave_indexed(verts, normals, uvs, faces):
+    """
+    Construye una malla indexada a partir de los arrays de trimesh.
+    Intercala [pos(3), normal(3), uv(2)] en un array float32 (V, 8) y
+    deduplica los vértices con la misma tupla (pos, normal, uv).
+    Returns:
+        tuple: (vertices float32 (V, 8), indices uint16 si caben, si no uint32)
+    """
+    corners = np.asarray(faces, dtype=np.intp).reshape(-1)
+    # Solo los vértices referenciados por alguna cara
+    usados, corner_local = np.unique(corners, return_inverse=True)
+
+    tabla = np.empty((len(usados), 8), dtype=np.float32)
+    tabla[:, 0:3] = np.asarray(verts)[usados]
+    tabla[:, 6:8] = np.asarray(uvs)[usados, :2]
+    if normals is not None and len(normals) == len(verts):
+        tabla[:, 3:6] = np.asarray(normals)[usados]
+    else:
+        tabla[:, 3:6] = (0.0, 0.0, 1.0)
+
+    # Filas idénticas byte a byte -> mismo vértice (vista 'void' de 32 bytes por fila)
+    filas = np.ascontiguousarray(tabla).view(np.dtype((np.void, tabla.dtype.itemsize * 8))).ravel()
+    _, primera, inversa = np.unique(filas, return_index=True, return_inverse=True)
+    vertices = tabla[primera]
+    indices = inversa.reshape(-1)[corner_local.reshape(-1)]
+
+    index_dtype = np.uint16 if len(vertices) <= 0xFFFF else np.uint32
+    return vertices, indices.astype(index_dtype)
+
+def simplificar_clustering(vertices, indices, origen, tam_celda):
+    """
+    LOD por agrupamiento de vértices (vertex clustering) en una grilla 3D.
+    Todos los vértices de una celda se colapsan en uno de ellos (el primero),
+    así el LOD es solo un nuevo array de índices sobre el mismo VBO.
+    Se descartan los triángulos degenerados y los duplicados.
+    """
+    celda = np.floor((vertices[:, :3] - origen) / tam_celda).astype(np.int64)
+    n = int(celda.max()) + 1 if len(celda) else 1
+    clave = (celda[:, 0] * n + celda[:, 1]) * n + celda[:, 2]
+    _, primero, grupo = np.unique(clave, return_index=True, return_inverse=True)
+    representante = primero[grupo.reshape(-1)]
+
+    tris = representante[np.asarray(indices, dtype=np.intp).reshape(-1, 3)]
+    validos = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 0] != tris[:, 2])
+    tris = tris[validos]
+    if len(tris):
+        _, unicos = np.unique(np.sort(tris, axis=1), axis=0, return_index=True)
+        tris = tris[np.sort(unicos)]
+    return tris.reshape(-1).astype(indices.dtype)
+
+def fusionar_submallas(submallas, capas, niveles=1):
+    """
+    Une varias sub-mallas en un único buffer de vértices e índices.
+    Args:
+        capas: índice de capa de textura (GL_TEXTURE_2D_ARRAY) de cada sub-malla.
+        niveles: cantidad de LODs ('indices', 'indices_lod1', ...).
+    Returns:
+        tuple: (vertices float32 (V, 9) = [pos, normal, uv, capa],
+                indices de todos los LODs concatenados, [(offset, count)] por LOD)
+    """
+    total = sum(len(sub['vertices']) for sub in submallas)
+    vertices = np.empty((total, 9), dtype=np.float32)
+    index_dtype = np.uint16 if total <= 0xFFFF else np.uint32
+
+    def campo_lod(sub, nivel):
+        # Si falta un nivel (malla horneada sin LODs) se repite el anterior
+        while nivel > 0 and f'indices_lod{nivel}' not in sub:
+            nivel -= 1
+        return sub[f'indices_lod{nivel}'] if nivel else sub['indices']
+
+    v0 = 0
+    for sub, capa in zip(submallas, capas):
+        nv = len(sub['vertices'])
+        vertices[v0:v0 + nv, :8] = sub['vertices']
+        vertices[v0:v0 + nv, 8] = capa
+        v0 += nv
+
+    partes = []
+    lods = []
+    offset = 0
+    for nivel in range(niveles):
+        inicio = offset
+        v0 = 0
+        for sub in submallas:
+            idx = campo_lod(sub, nivel)
+            partes.append(idx.astype(index_dtype) + index_dtype(v0))
+            v0 += len(sub['vertices'])
+            offset += len(idx)
+        lods.append((inicio, offset - inicio))
+    return vertices, np.concatenate(partes), lods
 
 class Model3D:
     def __init__(self, ctx, filename="elfa.obj"):
@@ -27,8 +118,9 @@ class Model3D:
         self.scale = [1.0, 1.0, 1.0]     # Escala 1.0 porque normalizamos la geometría
         self.rotation = [0.0, 0.0, 0.0]
 
-        # Variable para suavizar el movimiento Z
+        # Variable para suavizar el movimiento Z (paso fijo; se interpola al dibujar)
         self.smoothed_bass_energy = 0.0
+        self.energia_anterior = 0.0
 
         # Cargar Shaders
         self.program = shaders.load_shader_program("render/model.vert", "render/model.frag")
@@ -37,14 +129,29 @@ class Model3D:
             return
 
         # Obtener ubicaciones de Uniforms
-        self.u_proj_loc = glGetUniformLocation(self.program, "u_projection")
-        self.u_view_loc = glGetUniformLocation(self.program, "u_view")
-        self.u_model_loc = glGetUniformLocation(self.program, "u_model")
-        self.u_tex_loc = glGetUniformLocation(self.program, "u_texture")
-        self.u_use_tex_loc = glGetUniformLocation(self.program, "u_use_texture")
+        self.u_model_loc = shaders.get_uniform_location(self.program, "u_model")
+        self.u_tex_loc = shaders.get_uniform_location(self.program, "u_textures")
+        self.u_use_tex_loc = shaders.get_uniform_location(self.program, "u_use_texture")
 
-        # Recursos OpenGL
-        self.meshes = [] # Lista de sub-mallas: {vao, index_count, texture_id}
+        # --- Modo instanciado: anillo de copias, cada una reacciona a una banda ---
+        self.program_inst = shaders.load_shader_program("render/model_instanced.vert", "render/model.frag")
+        self.u_inst_tex_loc = shaders.get_uniform_location(self.program_inst, "u_textures")
+        self.u_inst_use_tex_loc = shaders.get_uniform_location(self.program_inst, "u_use_texture")
+        self.u_inst_inflate_loc = shaders.get_uniform_location(self.program_inst, "u_inflate")
+        # Por instancia, (N, 17) float32: mat4 + energía, escritos directo en el buffer de streaming
+        self.stream_instancias = None
+        self.vao_instancias = None
+        self.primera_instancia = 0 # Instancia a la que apuntan los atributos del VAO
+        self._angulos = None
+        self.anillo = {"radio": 3.5, "z": -8.0, "escala": 0.5, "reactividad": 0.8}
+
+        # Recursos OpenGL: todas las sub-mallas comparten VBO/EBO y un
+        # GL_TEXTURE_2D_ARRAY (una capa por textura), así el modelo se
+        # dibuja con un solo bind y un solo glDrawElements.
+        self.mesh = None          # {vao, vbo, ebo, count, index_type}
+        self.gltf = None          # GLTFScene si el archivo es .glb/.gltf (cargador nativo)
+        self.texture_array = None
+        self.tam_capa = 512       # Todas las texturas se escalan a este tamaño
 
         # --- FASE 1: Mapeo explícito de sub-mallas -> texturas ---
         # Definimos manualmente qué archivo PNG usa cada parte del modelo.
@@ -64,235 +171,465 @@ class Model3D:
             "ssjgohan_2": "modelo 3d/gohan/ssjgohanface.png"  # Ajuste manual: Cabeza
         }
 
-        # Cargar geometría si trimesh está disponible
-        if trimesh:
-            self.load_glb(filename)
+        # Opciones de normalización (forman parte de la clave de la caché horneada)
+        self.normalizacion = {"centrar": True, "radio": 1.0}
+
+        # --- LODs: resolución de la grilla de clustering de cada nivel (también en la clave) ---
+        self.lod_resoluciones = (64, 32, 16)
+        # Radio proyectado (px) por debajo del cual se pasa al siguiente LOD, con histéresis
+        self.lod_umbrales_px = (220.0, 110.0, 50.0)
+        self.lod_histeresis = 0.15
+        self.lod_actual = 0
+        self.lod_instancias = 0
+
+        self.load_glb(filename)
 
     def load_glb(self, filename):
+        """
+        Encola la carga del modelo en el cargador de assets (ctx.assets).
+        La malla se prepara en un hilo de trabajo y se sube a GPU por partes;
+        hasta entonces el modelo simplemente no se dibuja.
+        """
         filepath = resource_path(filename)
         if not os.path.exists(filepath):
             print(f"⚠️ Archivo de modelo no encontrado: {filepath}")
             return
 
         print(f"📂 Cargando modelo 3D: {filepath}...")
+        self._inicio_carga = time.perf_counter()
+
+        # glTF/GLB: cargador nativo (bufferViews directo a GPU, texturas desde los materiales)
+        if filepath.lower().endswith((".glb", ".gltf")):
+            self.gltf = GLTFScene(filepath, self.tam_capa, self.normalizacion["radio"], self.lod_resoluciones)
+            self.ctx.assets.cargar(f"gltf:{os.path.basename(filepath)}",
+                                   self.gltf.preparar, self._subir_gltf)
+            return
+
+        self.ctx.assets.cargar(f"malla:{os.path.basename(filepath)}",
+                               lambda: self._preparar_malla(filepath),
+                               self._subir_malla)
+
+    def _subir_gltf(self, escena):
+        """Hilo de GL (generador): sube la escena glTF y marca el modelo como cargado."""
+        yield from escena.subir(self.ctx.assets)
+        self.loaded = True
+        self.gpu_bytes = escena.gpu_bytes
+        duracion_ms = (time.perf_counter() - self._inicio_carga) * 1000
+        print(f"✅ Modelo glTF cargado en GPU en {duracion_ms:.0f}ms")
+
+    def _preparar_malla(self, filepath):
+        """
+        Hilo de trabajo: obtiene la malla fusionada de la caché (memmap, se
+        sube tal cual al VBO) o la hornea y la guarda.
+        """
+        # --- Caché horneada: evita trimesh, el parseo del OBJ y la fusión ---
+        # Las capas de textura quedan en los vértices: el mapeo es parte de la clave
+        opciones = {**self.normalizacion, "lods": self.lod_resoluciones, "texturas": self.TEXTURE_MAP}
+        clave = mesh_cache.clave_fuente(filepath, opciones)
+        nombre_cache = os.path.splitext(os.path.basename(filepath))[0] + ".mesh"
+        ruta_cache = cache_path(os.path.join("mallas", nombre_cache))
+
+        cache = mesh_cache.cargar(ruta_cache, clave)
+        if cache is not None:
+            malla = cache[0]
+            print(f"⚡ Malla horneada cargada desde caché: {ruta_cache}")
+        else:
+            submallas = self._hornear(filepath)
+            if not submallas:
+                raise ValueError("el modelo no contiene geometría válida")
+            malla = self._fusionar(submallas)
+            try:
+                mesh_cache.guardar(ruta_cache, clave, [malla])
+                print(f"💾 Malla horneada guardada en: {ruta_cache}")
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar la caché de malla: {e}")
+
+        return {
+            'vertices': malla['vertices'],
+            'indices': malla['indices'],
+            'lods': [(int(o), int(c)) for o, c in malla['lods']],
+            'archivos': malla['archivos'],
+            'submallas': malla['submallas']
+        }
+
+    def _fusionar(self, submallas):
+        """Asigna las capas de textura y une las sub-mallas (formato de la caché)."""
+        # --- Una capa por archivo de textura distinto (None = sin mapeo -> ajedrez) ---
+        archivos = []
+        capas = []
+        for sub in submallas:
+            archivo = self.TEXTURE_MAP.get(sub['nombre'])
+            if archivo is None:
+                print(f"   ⚠️ Malla sin mapeo definido: '{sub['nombre']}'")
+                # Aquí podrías imprimir el nombre para copiarlo al diccionario si falta
+            if archivo not in archivos:
+                archivos.append(archivo)
+            capas.append(archivos.index(archivo))
+
+        vertices, indices, lods = fusionar_submallas(submallas, capas, 1 + len(self.lod_resoluciones))
+        return {
+            'nombre': 'fusionada',
+            'vertices': vertices,
+            'indices': indices,
+            'lods': np.array(lods, dtype=np.int64), # [(offset, count)] por LOD
+            'archivos': archivos,
+            'submallas': len(submallas)
+        }
+
+    def _subir_malla(self, malla):
+        """Hilo de GL (generador): texture array con ajedrez provisional + buffers únicos."""
+        archivos = malla['archivos']
+        final_vertices = malla['vertices']
+        final_indices = malla['indices']
+
+        # --- Texture array: cada capa arranca con el ajedrez hasta que llega su textura ---
+        self.texture_array = texturas.crear_texture_array(self.tam_capa, len(archivos))
+        yield
+
+        # --- Configurar VAO/VBO/EBO únicos ---
+        vao = glGenVertexArrays(1)
+        glBindVertexArray(vao)
+        
+        vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glBufferData(GL_ARRAY_BUFFER, final_vertices.nbytes, final_vertices, GL_STATIC_DRAW)
+        
+        ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, final_indices.nbytes, final_indices, GL_STATIC_DRAW)
+        index_type = GL_UNSIGNED_SHORT if final_indices.dtype == np.uint16 else GL_UNSIGNED_INT
+        
+        # Layout: [pos(3), normal(3), uv(2), capa(1)] -> locations del shader: 0=pos, 1=uv, 2=normal, 3=capa
+        stride = 9 * 4 
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
+        glEnableVertexAttribArray(2)
+        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(3)
+        glVertexAttribPointer(3, 1, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(32))
+        
+        glBindVertexArray(0)
+        
+        self._crear_vao_instancias(vbo, ebo)
+
+        self.mesh = {
+            'vao': vao,
+            'vbo': vbo,
+            'ebo': ebo,
+            'count': malla['lods'][0][1],
+            'index_type': index_type,
+            'index_size': final_indices.itemsize,
+            'lods': malla['lods'] # [(offset, count)] dentro del EBO, LOD 0 = completo
+        }
+        print(f"✅ {malla['submallas']} sub-mallas unidas en un buffer ({len(final_vertices)} vértices, {len(archivos)} capas de textura).")
+
+        # --- Texturas: se decodifican en paralelo y se copian a su capa ---
+        for capa, archivo in enumerate(archivos):
+            if archivo is None:
+                continue
+            self.ctx.assets.cargar(f"textura:{os.path.basename(archivo)}",
+                                   lambda archivo=archivo: self._decodificar_textura(archivo),
+                                   lambda imagen, capa=capa: self._subir_textura(capa, imagen))
+
+        self.loaded = True
+        self.gpu_bytes = final_vertices.nbytes + final_indices.nbytes
+        duracion_ms = (time.perf_counter() - self._inicio_carga) * 1000
+        print(f"✅ Modelo completo cargado en GPU en {duracion_ms:.0f}ms | "
+              f"Memoria GPU: {self.gpu_bytes / 1024:.0f} KB")
+
+    def _crear_vao_instancias(self, vbo, ebo):
+        """VAO que comparte VBO/EBO con el modelo y agrega el buffer por instancia."""
+        vao = glGenVertexArrays(1)
+        glBindVertexArray(vao)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+        stride = 9 * 4
+        for loc, n, offset in ((0, 3, 0), (1, 2, 24), (2, 3, 12), (3, 1, 32)):
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, n, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset))
+
+        glBindVertexArray(0)
+        self.vao_instancias = vao
+
+        # Por instancia: buffer de streaming (una región por frame en vuelo, crece solo)
+        self.stream_instancias = StreamingBuffer(17, 64, self._configurar_instancias, "instancias")
+
+    def _configurar_instancias(self, vbo):
+        """Atributos por instancia: mat4 (4 columnas vec4, locations 4-7) + energía (location 8)."""
+        estado.bind_vao(self.vao_instancias)
+        for loc in range(4, 9):
+            glEnableVertexAttribArray(loc)
+            glVertexAttribDivisor(loc, 1)
+        self._apuntar_instancias(vbo, 0)
+
+    def _apuntar_instancias(self, vbo, primera):
+        """
+        Apunta los atributos por instancia a 'primera' dentro del buffer. Core
+        3.3 no tiene base instance: el desplazamiento va en el puntero.
+        """
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        stride = 17 * 4
+        base = primera * stride
+        for col in range(4):
+            glVertexAttribPointer(4 + col, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(base + col * 16))
+        glVertexAttribPointer(8, 1, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(base + 64))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.primera_instancia = primera
+
+    def _radio_proyectado_px(self, projection, view, posicion, escala):
+        """Radio en píxeles de la esfera envolvente del modelo (radio normalizado * escala)."""
+        p = np.array([posicion[0], posicion[1], posicion[2], 1.0], dtype=np.float32) @ view
+        distancia = max(-float(p[2]), 1e-3) # Cámara mirando hacia -Z
+        radio = self.normalizacion["radio"] * escala
+        return radio * float(projection[1][1]) / distancia * (self.ctx.H / 2.0)
+
+    def _elegir_lod(self, radio_px, actual):
+        """
+        LOD según el tamaño en pantalla. Con histéresis: para cambiar de nivel el
+        tamaño debe cruzar el umbral por un margen, así no parpadea en el borde.
+        """
+        umbrales = self.lod_umbrales_px
+        maximo = len(self.lod_resoluciones) # Mismos niveles en OBJ y glTF
+        h = self.lod_histeresis
+        # Más detalle: el tamaño supera con margen el umbral del nivel actual
+        while actual > 0 and radio_px > umbrales[actual - 1] * (1.0 + h):
+            actual -= 1
+        # Menos detalle: el tamaño cae con margen bajo el umbral siguiente
+        while actual < min(maximo, len(umbrales)) and radio_px < umbrales[actual] * (1.0 - h):
+            actual += 1
+        return actual
+
+    def _dibujar_lod(self, nivel, instancias=1):
+        """Dibuja el rango de índices del LOD y registra los triángulos del frame."""
+        offset, count = self.mesh['lods'][nivel]
+        puntero = ctypes.c_void_p(offset * self.mesh['index_size'])
+        if instancias > 1:
+            glDrawElementsInstanced(GL_TRIANGLES, count, self.mesh['index_type'], puntero, instancias)
+        else:
+            glDrawElements(GL_TRIANGLES, count, self.mesh['index_type'], puntero)
+        records = self.ctx.profiler.records
+        records["model_lod"] = nivel
+        records["model_triangulos"] = count // 3 * instancias
+
+    def _calcular_instancias(self, m):
+        """
+        Calcula de una vez (NumPy) las N matrices de modelo del anillo y la
+        energía de la banda de cada copia, sin bucles por instancia, y las
+        escribe en 'm' (N, 17). Layout igual al de pyrr (traslación en la
+        fila 3) para que la GPU lo lea tal cual.
+        """
+        n = len(m)
+        if self._angulos is None or len(self._angulos) != n:
+            self._angulos = np.linspace(0.0, 2.0 * np.pi, n, endpoint=False, dtype=np.float32)
+            self._bandas = None
+
+        espectro = self.ctx.espectro
+        if self._bandas is None or self._bandas[-1] >= len(espectro):
+            # Cada copia escucha una banda distinta, repartidas por todo el espectro
+            self._bandas = np.linspace(0, len(espectro) - 1, n).astype(np.intp)
+
+        anillo = self.anillo
+        energia = np.clip(espectro[self._bandas], 0.0, 1.0)
+        angulos = self._angulos + self.ctx.giro
+        escala = anillo["escala"] * (1.0 + anillo["reactividad"] * energia)
+        c = np.cos(angulos) * escala
+        sn = np.sin(angulos) * escala
+
+        # La memoria mapeada no viene en cero: se escriben las 17 columnas
+        m[:, (2, 3, 6, 7, 8, 9, 11)] = 0.0
+        # Rotación en Z (los pies apuntan al eje del túnel) + escala uniforme
+        m[:, 0] = sn
+        m[:, 1] = -c
+        m[:, 4] = c
+        m[:, 5] = sn
+        m[:, 10] = escala
+        m[:, 15] = 1.0
+        # Traslación sobre el anillo
+        m[:, 12] = np.cos(angulos) * anillo["radio"]
+        m[:, 13] = np.sin(angulos) * anillo["radio"]
+        m[:, 14] = anillo["z"]
+        m[:, 16] = energia
+
+    def render_instanced(self, projection, view, n):
+        """Dibuja N copias del modelo con una sola llamada."""
+        if not self.loaded or self.vao_instancias is None or not self.program_inst: return
+
+        stream = self.stream_instancias
+        destino, primera = stream.reservar(n)
+        self._calcular_instancias(destino)
+        stream.confirmar()
+
+        estado.use_program(self.program_inst)
+        estado.enable(GL_DEPTH_TEST)
+        estado.enable(GL_BLEND)
+        estado.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glUniform1f(self.u_inst_inflate_loc, 0.05)
+        estado.bind_texture(0, GL_TEXTURE_2D_ARRAY, self.texture_array)
+        glUniform1i(self.u_inst_tex_loc, 0)
+        glUniform1i(self.u_inst_use_tex_loc, 1)
+
+        # LOD según el tamaño en pantalla de una copia en reposo
+        a = self.anillo
+        radio_px = self._radio_proyectado_px(projection, view, (a["radio"], 0.0, a["z"]), a["escala"])
+        self.lod_instancias = self._elegir_lod(radio_px, self.lod_instancias)
+
+        estado.bind_vao(self.vao_instancias)
+        if primera != self.primera_instancia:
+            self._apuntar_instancias(stream.vbo, primera)
+        self._dibujar_lod(self.lod_instancias, n)
+
+    def benchmark_instancias(self, projection, view, cantidades=(1, 100, 1000), frames=120):
+        """
+        Mide el costo por frame (CPU + GPU, con glFinish) del modo instanciado.
+        Returns:
+            dict: cantidad -> ms por frame
+        """
+        resultados = {}
+        profiler = self.ctx.profiler
+        for n in cantidades:
+            for i in range(frames + 1): # El primero es de calentamiento (asignaciones)
+                if i == 1:
+                    glFinish()
+                    inicio = time.perf_counter()
+                # Cada iteración es un frame: las regiones de streaming rotan como en el loop principal
+                comenzar_frame(profiler)
+                self.render_instanced(projection, view, n)
+                terminar_frame(profiler)
+            glFinish()
+            resultados[n] = (time.perf_counter() - inicio) * 1000 / frames
+        base = resultados[cantidades[0]]
+        print("📊 Benchmark de instancias")
+        for n, ms in resultados.items():
+            print(f"   {n:>5} copias: {ms:6.3f}ms/frame (x{ms / base:.2f})")
+        return resultados
+
+    def _hornear(self, filepath):
+        """
+        Carga el modelo con trimesh, lo normaliza y genera las sub-mallas
+        indexadas. Solo se ejecuta cuando la caché no existe o quedó obsoleta.
+        Returns:
+            list: dicts {'nombre', 'vertices', 'indices'} o None si falla.
+        """
         try:
-            # Cargar escena
-            scene = trimesh.load(filepath)
-            
-            # Obtener la primera geometría disponible
-            geometries = []
-            geometry_names = []
-            if isinstance(scene, trimesh.Scene):
-                for name, geom in scene.geometry.items():
-                    geometries.append(geom)
-                    geometry_names.append(name)
-            else:
-                geometries = [scene]
-                geometry_names.append("mesh_0")
-
-            if not geometries:
-                print("⚠️ El archivo GLB no contiene geometría válida.")
-                return
-
-            print(f" Sub-mallas encontradas: {len(geometries)}")
-            print(f"🔹 Nombres detectados: {geometry_names}")
-
-            # --- NORMALIZACIÓN DE GEOMETRÍA (CRÍTICO) ---
-            # 1. Centrar en (0,0,0)
-            # Calculamos el centroide global si es una escena
-            if isinstance(scene, trimesh.Scene):
-                centroid = scene.centroid
-                bounds = scene.bounds
-            else:
-                centroid = scene.centroid
-                bounds = scene.bounds
-            
-            print(f"📏 Bounds Globales: {bounds}")
-            
-            # Normalizar todas las geometrías relativas al centro global
-            # Primero centrar
+            import trimesh
+        except ImportError:
+            print("⚠️ Error: Librería 'trimesh' no encontrada. Instala con: pip install trimesh")
+            return None
+
+        print("🔥 Horneando malla con trimesh...")
+        # Cargar escena
+        scene = trimesh.load(filepath)
+        
+        # Obtener la primera geometría disponible
+        geometries = []
+        geometry_names = []
+        if isinstance(scene, trimesh.Scene):
+            for name, geom in scene.geometry.items():
+                geometries.append(geom)
+                geometry_names.append(name)
+        else:
+            geometries = [scene]
+            geometry_names.append("mesh_0")
+
+        if not geometries:
+            print("⚠️ El archivo GLB no contiene geometría válida.")
+            return None
+
+        print(f" Sub-mallas encontradas: {len(geometries)}")
+        print(f"🔹 Nombres detectados: {geometry_names}")
+
+        # --- NORMALIZACIÓN DE GEOMETRÍA (CRÍTICO) ---
+        # 1. Centrar en (0,0,0)
+        # Calculamos el centroide global si es una escena
+        centroid = scene.centroid
+        bounds = scene.bounds
+        
+        print(f"📏 Bounds Globales: {bounds}")
+        
+        # Normalizar todas las geometrías relativas al centro global
+        # Primero centrar
+        if self.normalizacion["centrar"]:
             for g in geometries:
                 g.vertices -= centroid
-            
-            # Calcular escala global
-            max_dist = 0
+        
+        # Calcular escala global
+        max_dist = 0
+        for g in geometries:
+            d = np.max(np.linalg.norm(g.vertices, axis=1))
+            if d > max_dist: max_dist = d
+        
+        if max_dist > 0:
+            scale = self.normalizacion["radio"] / max_dist
             for g in geometries:
-                d = np.max(np.linalg.norm(g.vertices, axis=1))
-                if d > max_dist: max_dist = d
+                g.vertices *= scale
+            print(f"📏 Geometría normalizada (Escala aplicada: 1/{max_dist:.2f})")
+
+        # --- Interleaving vectorizado + malla indexada ---
+        submallas = []
+        for geometry, mesh_name in zip(geometries, geometry_names):
+            # --- Procesar Geometría ---
+            verts = geometry.vertices
+            faces = geometry.faces
+            uvs = getattr(geometry.visual, 'uv', None)
             
-            if max_dist > 0:
-                scale = 1.0 / max_dist
-                for g in geometries:
-                    g.vertices *= scale
-                print(f"📏 Geometría normalizada (Escala aplicada: 1/{max_dist:.2f})")
-
-            # --- Expandir Vértices (Geometry Expansion) ---
-            self.meshes = []
+            if not hasattr(geometry, 'vertex_normals') or geometry.vertex_normals is None:
+                try: geometry.compute_vertex_normals()
+                except: pass
+            normals = getattr(geometry, 'vertex_normals', None)
             
-            for i, geometry in enumerate(geometries):
-                mesh_name = geometry_names[i]
-                # --- Procesar Geometría ---
-                verts = geometry.vertices
-                faces = geometry.faces
-                uvs = getattr(geometry.visual, 'uv', None)
-                
-                if not hasattr(geometry, 'vertex_normals') or geometry.vertex_normals is None:
-                    try: geometry.compute_vertex_normals()
-                    except: pass
-                normals = getattr(geometry, 'vertex_normals', None)
-                
-                if uvs is None:
-                    uvs = np.zeros((len(verts), 2), dtype=np.float32)
-                # Debug UVs para asegurar que no sean todos ceros
-                # print(f"   📊 Malla '{mesh_name}': {len(uvs)} UVs. Rango: {uvs.min():.2f} a {uvs.max():.2f}")
-
-                final_vertices_list = []
-                final_indices_list = []
-                
-                idx = 0
-                for face in faces:
-                    for vert_idx in face:
-                        pos = verts[vert_idx]
-                        uv = uvs[vert_idx]
-                        if normals is not None and len(normals) > vert_idx:
-                            norm = normals[vert_idx]
-                        else:
-                            norm = [0.0, 0.0, 1.0]
-                        
-                        final_vertices_list.extend([
-                            pos[0], pos[1], pos[2], 
-                            norm[0], norm[1], norm[2], 
-                            uv[0], uv[1]
-                        ])
-                        final_indices_list.append(idx)
-                        idx += 1
-
-                final_vertices = np.array(final_vertices_list, dtype=np.float32)
-                final_indices = np.array(final_indices_list, dtype=np.uint32)
-                
-                # --- Cargar Textura Específica ---
-                tex_id = self._load_texture_for_mesh(geometry, mesh_name)
-                
-                # --- Configurar VAO/VBO ---
-                vao = glGenVertexArrays(1)
-                glBindVertexArray(vao)
-                
-                vbo = glGenBuffers(1)
-                glBindBuffer(GL_ARRAY_BUFFER, vbo)
-                glBufferData(GL_ARRAY_BUFFER, final_vertices.nbytes, final_vertices, GL_STATIC_DRAW)
-                
-                ebo = glGenBuffers(1)
-                glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
-                glBufferData(GL_ELEMENT_ARRAY_BUFFER, final_indices.nbytes, final_indices, GL_STATIC_DRAW)
-                
-                stride = 8 * 4 
-                glEnableVertexAttribArray(0)
-                glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-                glEnableVertexAttribArray(2)
-                glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
-                glEnableVertexAttribArray(1)
-                glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
-                
-                glBindVertexArray(0)
-                
-                self.meshes.append({
-                    'vao': vao,
-                    'vbo': vbo,
-                    'ebo': ebo,
-                    'count': len(final_indices),
-                    'texture_id': tex_id
-                })
-                print(f"✅ Sub-malla {i} cargada. Textura ID: {tex_id}")
-
-            self.loaded = True
-            print("✅ Modelo completo cargado en GPU.")
+            if uvs is None:
+                uvs = np.zeros((len(verts), 2), dtype=np.float32)
+            # Debug UVs para asegurar que no sean todos ceros
+            # print(f"   📊 Malla '{mesh_name}': {len(uvs)} UVs. Rango: {uvs.min():.2f} a {uvs.max():.2f}")
 
-        except Exception as e:
-            print(f"❌ Error crítico cargando GLB: {e}")
-            import traceback
-            traceback.print_exc()
-
-    def _load_texture_for_mesh(self, geometry, mesh_name):
-        """Carga la textura correspondiente a una sub-malla."""
-        tex_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, tex_id)
-        
+            vertices, indices = interleave_indexed(verts, normals, uvs, faces)
+            submallas.append({'nombre': mesh_name, 'vertices': vertices, 'indices': indices})
+
+        # --- LODs por vertex clustering (grilla común para que las costuras coincidan) ---
+        todos = np.concatenate([sub['vertices'][:, :3] for sub in submallas])
+        origen = todos.min(axis=0)
+        extension = float((todos.max(axis=0) - origen).max()) or 1.0
+        for nivel, resolucion in enumerate(self.lod_resoluciones, start=1):
+            tam_celda = extension / resolucion
+            for sub in submallas:
+                sub[f'indices_lod{nivel}'] = simplificar_clustering(sub['vertices'], sub['indices'], origen, tam_celda)
+            tris = sum(len(sub[f'indices_lod{nivel}']) for sub in submallas) // 3
+            print(f"   🔻 LOD {nivel} (grilla {resolucion}³): {tris} triángulos")
+        return submallas
+
+    def _decodificar_textura(self, filename):
+        """
+        Hilo de trabajo: abre, convierte, voltea y escala una textura al tamaño de capa.
+        Returns:
+            bytes: píxeles RGBA (tam_capa x tam_capa) o None para quedarse con el ajedrez.
+        """
         # --- FASE 2: Carga directa desde raíz (Sin búsquedas) ---
-        filename = self.TEXTURE_MAP.get(mesh_name)
-        image = None
-        
-        if filename:
-            # Intentar cargar archivo exacto desde la raíz
-            filepath = resource_path(filename)
-            if os.path.exists(filepath):
-                print(f"   🎯 Mapeo explícito: '{mesh_name}' -> '{filepath}'")
-                try:
-                    image = Image.open(filepath)
-                except Exception as e:
-                    print(f"   ❌ Error abriendo textura '{filepath}': {e}")
-            else:
-                print(f"   ⚠️ Archivo no encontrado en ruta: '{filepath}'")
-        else:
-            print(f"   ⚠️ Malla sin mapeo definido: '{mesh_name}'")
-            # Aquí podrías imprimir mesh_name para copiarlo al diccionario si falta
-        
-        # 3. Fallback a Ajedrez
-        if image is None:
-            print("   ⚠️ Textura no encontrada. Usando Ajedrez.")
-            self._create_checkerboard_texture(tex_id)
-            return tex_id
-            
-        # Procesar imagen encontrada
+        filepath = resource_path(filename)
+        if not os.path.exists(filepath):
+            print(f"   ⚠️ Archivo no encontrado en ruta: '{filepath}'")
+            return None
+
+        print(f"   🎯 Textura: '{filepath}'")
         try:
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            img_data = image.tobytes()
-            w, h = image.size
-            
-            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-            glGenerateMipmap(GL_TEXTURE_2D)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+            return texturas.decodificar_rgba(filepath, self.tam_capa, voltear=True)
         except Exception as e:
-            print(f"   ❌ Error procesando textura: {e}")
-            self._create_checkerboard_texture(tex_id)
-            
-        return tex_id
-
-    def _create_checkerboard_texture(self, tex_id=None):
-        """Genera una textura de ajedrez rojo/azul para debug."""
-        if tex_id: glBindTexture(GL_TEXTURE_2D, tex_id)
-        w, h = 64, 64
-        checker = np.zeros((h, w, 4), dtype=np.uint8)
-        for y in range(h):
-            for x in range(w):
-                if (x // 8 + y // 8) % 2 == 0:
-                    checker[y, x] = [255, 50, 50, 255] # Rojo
-                else:
-                    checker[y, x] = [50, 50, 255, 255] # Azul
-        
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, checker.tobytes())
-        glGenerateMipmap(GL_TEXTURE_2D)
+            print(f"   ❌ Error procesando textura '{filepath}': {e}")
+            return None
 
-    def render(self, projection, view):
-        if not self.loaded or not self.meshes: return
-
-        glUseProgram(self.program)
-        
-        # Reactivamos Depth Test y Blending estándar para que se vea sólido pero correcto
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        
-        # Animación: Rotación desactivada (estático)
-        # self.rotation[1] = self.ctx.time.get_time() * 0.0005
+    def _subir_textura(self, capa, img_data):
+        """Hilo de GL (generador): copia la imagen decodificada a su capa."""
+        if img_data is None:
+            print("   ⚠️ Textura no encontrada. Usando Ajedrez.")
+            return
+        yield from texturas.subir_capa(self.texture_array, capa, img_data, self.tam_capa)
 
-        # --- Suavizado de Movimiento Z (Independiente de las estrellas) ---
+    def paso(self):
+        """
+        Un paso de simulación: suavizado del movimiento Z (independiente de
+        las estrellas). Corre aunque el modelo aún no haya cargado.
+        """
         # Configuración desde UI
         cfg = self.ctx.ui.config
         attack_factor = cfg.get("model_attack", 0.1)
@@ -305,16 +642,36 @@ class Model3D:
             target_energy = 0.0
         else:
             target_energy = raw_energy
+
+        # Lerp rápido hacia el pico de energía, lento de vuelta a cero
+        self.energia_anterior = self.smoothed_bass_energy
+        self.smoothed_bass_energy = suavizar(self.smoothed_bass_energy, target_energy,
+                                             attack_factor, decay_factor)
+
+    def render(self, projection, view):
+        if not self.loaded: return
+
+        copias = int(self.ctx.ui.config.get("model_instances", 0))
+        if copias > 0 and self.gltf is None: # El modo instanciado usa la malla unificada (OBJ)
+            self.render_instanced(projection, view, copias)
+            return
+
+        estado.use_program(self.program)
         
-        if target_energy > self.smoothed_bass_energy:
-            # Lerp rápido hacia el pico de energía
-            self.smoothed_bass_energy = self.smoothed_bass_energy * (1.0 - attack_factor) + target_energy * attack_factor
-        else:
-            # Lerp lento de vuelta a cero
-            self.smoothed_bass_energy = self.smoothed_bass_energy * (1.0 - decay_factor) + target_energy * decay_factor
+        # Reactivamos Depth Test y Blending estándar para que se vea sólido pero correcto
+        estado.enable(GL_DEPTH_TEST)
+        estado.enable(GL_BLEND)
+        estado.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        
+        # Animación: Rotación desactivada (estático)
+        # self.rotation[1] = self.ctx.time.get_time() * 0.0005
+
+        # Energía del frame, interpolada entre los dos últimos pasos
+        energia = interpolar(self.energia_anterior, self.smoothed_bass_energy, self.ctx.time.sim.alfa)
 
         # Si la energía suavizada es muy baja, no renderizamos (ahorra recursos y cumple "no se vea")
-        if self.smoothed_bass_energy < 0.001:
+        if energia < 0.001:
+            self.ctx.profiler.records["model_triangulos"] = 0
             return
 
         # Animación Z: Gohan se aleja con los bajos (Reactividad)
@@ -322,7 +679,7 @@ class Model3D:
         base_z = 6.0
         target_z = -15.0
         reactivity = self.ctx.ui.config.get("ESCALA_POR_INTENSIDAD", 100.0) / 100.0
-        self.position[2] = base_z + (target_z - base_z) * self.smoothed_bass_energy * reactivity
+        self.position[2] = base_z + (target_z - base_z) * energia * reactivity
 
         # Construir matriz de modelo (Orden corregido: Identity -> Scale -> Rot -> Trans)
         scale_mat = pyrr.matrix44.create_from_scale(self.scale)
@@ -334,17 +691,24 @@ class Model3D:
         model_mat = pyrr.matrix44.multiply(model_mat, rot_mat)
         model_mat = pyrr.matrix44.multiply(model_mat, trans_mat)
         
-        glUniformMatrix4fv(self.u_proj_loc, 1, GL_FALSE, projection)
-        glUniformMatrix4fv(self.u_view_loc, 1, GL_FALSE, view)
         glUniformMatrix4fv(self.u_model_loc, 1, GL_FALSE, model_mat)
-        
-        # Renderizar cada sub-malla
-        for mesh in self.meshes:
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, mesh['texture_id'])
+
+        # LOD según el tamaño proyectado (el modelo se aleja hasta z=-15 con los bajos)
+        radio_px = self._radio_proyectado_px(projection, view, self.position, max(self.scale))
+        self.lod_actual = self._elegir_lod(radio_px, self.lod_actual)
+
+        if self.gltf is not None:
             glUniform1i(self.u_tex_loc, 0)
-            glUniform1i(self.u_use_tex_loc, 1) # Asumimos que siempre hay textura (o ajedrez)
-            
-            glBindVertexArray(mesh['vao'])
-            glDrawElements(GL_TRIANGLES, mesh['count'], GL_UNSIGNED_INT, None)
-            glBindVertexArray(0)
\ No newline at end of file
+            glUniform1i(self.u_use_tex_loc, 1)
+            records = self.ctx.profiler.records
+            records["model_triangulos"] = self.gltf.dibujar(self.u_model_loc, model_mat, self.lod_actual)
+            records["model_lod"] = self.lod_actual
+            return
+
+        # Todo el modelo en una llamada: un VAO y un texture array
+        estado.bind_texture(0, GL_TEXTURE_2D_ARRAY, self.texture_array)
+        glUniform1i(self.u_tex_loc, 0)
+        glUniform1i(self.u_use_tex_loc, 1) # Asumimos que siempre hay textura (o ajedrez)
+
+        estado.bind_vao(self.mesh['vao'])
+        self._dibujar_lod(self.lod_actual)
@@ -6,12 +6,73 @@ uniform sampler2D u_scene;
 uniform sampler2D u_bloom;
 uniform float u_bloom_intensity;
 
+// Región válida de cada textura (render_scale): escala de UV y último texel
+uniform vec2 u_escena_uv;
+uniform vec2 u_escena_max;
+uniform vec2 u_bloom_uv;
+uniform vec2 u_bloom_max;
+uniform bool u_bicubico; // Escena a menor resolución que la ventana: reescalado Catmull-Rom
+uniform float u_exposicion = 1.0;
+uniform bool u_tonemap;  // Curva ACES (ajuste de Narkowicz): comprime el HDR en vez de recortarlo
+uniform float u_bloom_giro; // Bloom temporal: giro del túnel desde que se calculó el bloom
+uniform float u_aspecto;    // Ancho / alto de la ventana
+
+// Catmull-Rom con 9 lecturas bilineales en vez de 16 (se aprovecha el filtrado
+// lineal para combinar los dos texels centrales de cada eje).
+vec3 catmull_rom(sampler2D tex, vec2 uv, vec2 uv_max)
+{
+    vec2 tam = vec2(textureSize(tex, 0));
+    vec2 pos = uv * tam;
+    vec2 p1 = floor(pos - 0.5) + 0.5;
+    vec2 f = pos - p1;
+
+    vec2 w0 = f * (-0.5 + f * (1.0 - 0.5 * f));
+    vec2 w1 = 1.0 + f * f * (-2.5 + 1.5 * f);
+    vec2 w2 = f * (0.5 + f * (2.0 - 1.5 * f));
+    vec2 w3 = f * f * (-0.5 + 0.5 * f);
+    vec2 w12 = w1 + w2;
+
+    vec2 t0 = min((p1 - 1.0) / tam, uv_max);
+    vec2 t12 = min((p1 + w2 / w12) / tam, uv_max);
+    vec2 t3 = min((p1 + 2.0) / tam, uv_max);
+
+    vec3 c = texture(tex, vec2(t0.x, t0.y)).rgb * w0.x * w0.y
+           + texture(tex, vec2(t12.x, t0.y)).rgb * w12.x * w0.y
+           + texture(tex, vec2(t3.x, t0.y)).rgb * w3.x * w0.y
+           + texture(tex, vec2(t0.x, t12.y)).rgb * w0.x * w12.y
+           + texture(tex, vec2(t12.x, t12.y)).rgb * w12.x * w12.y
+           + texture(tex, vec2(t3.x, t12.y)).rgb * w3.x * w12.y
+           + texture(tex, vec2(t0.x, t3.y)).rgb * w0.x * w3.y
+           + texture(tex, vec2(t12.x, t3.y)).rgb * w12.x * w3.y
+           + texture(tex, vec2(t3.x, t3.y)).rgb * w3.x * w3.y;
+    return max(c, vec3(0.0)); // Los lóbulos negativos pueden dar valores < 0 en bordes duros
+}
+
+vec3 aces(vec3 x)
+{
+    return clamp((x * (2.51 * x + 0.03)) / (x * (2.43 * x + 0.59) + 0.14), 0.0, 1.0);
+}
+
 void main()
 { 
-    vec3 scene = texture(u_scene, v_uv).rgb;
-    vec3 bloom = texture(u_bloom, v_uv).rgb;
+    vec2 uv_escena = min(v_uv * u_escena_uv, u_escena_max);
+    vec3 scene = u_bicubico ? catmull_rom(u_scene, uv_escena, u_escena_max)
+                            : texture(u_scene, uv_escena).rgb;
+    // Reproyección: el túnel gira alrededor del centro de la pantalla (la
+    // cámara mira por su eje), así que se lee el bloom rotado hacia atrás.
+    vec2 uv_bloom = v_uv;
+    if (u_bloom_giro != 0.0)
+    {
+        vec2 d = (v_uv - 0.5) * vec2(u_aspecto, 1.0);
+        float c = cos(-u_bloom_giro), s = sin(-u_bloom_giro);
+        d = vec2(c * d.x - s * d.y, s * d.x + c * d.y);
+        uv_bloom = clamp(d / vec2(u_aspecto, 1.0) + 0.5, 0.0, 1.0);
+    }
+    vec3 bloom = texture(u_bloom, min(uv_bloom * u_bloom_uv, u_bloom_max)).rgb;
     
-    // Mezcla aditiva: Escena + Bloom
-    // (Opcional: Aquí se podría agregar Tone Mapping para controlar la exposición HDR)
-    FragColor = vec4(scene + bloom * u_bloom_intensity, 1.0);
+    // Mezcla aditiva: Escena + Bloom, luego exposición y (opcional) tone mapping
+    vec3 color = (scene + bloom * u_bloom_intensity) * u_exposicion;
+    if (u_tonemap)
+        color = aces(color);
+    FragColor = vec4(color, 1.0);
 }
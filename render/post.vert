@@ -4,8 +4,13 @@ layout (location = 1) in vec2 aTexCoords;
 
 out vec2 v_uv;
 
+// Fracción de la textura de entrada que ocupa la imagen válida. La escena
+// puede dibujarse a menor resolución que la ventana (render_scale) dentro de
+// un target más grande: el quad solo debe recorrer esa esquina.
+uniform vec2 u_uv_escala = vec2(1.0);
+
 void main()
 {
     gl_Position = vec4(aPos.x, aPos.y, 0.0, 1.0); 
-    v_uv = aTexCoords;
+    v_uv = aTexCoords * u_uv_escala;
 }
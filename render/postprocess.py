@@ -2,30 +2,86 @@ from OpenGL.GL import *
 import numpy as np
 import ctypes
 from . import shaders
+from .gl_state import estado
+from .grafo import BYTES_FORMATO
+
+ESCALA_MIN = 0.25 # Mínimo de render_scale (1/4 de la resolución de la ventana)
+CRECIMIENTO = 1.25 # Al agrandar la ventana por encima de la capacidad, margen extra por eje
+
+# Formatos de los targets (el ancho de banda manda en las GPUs integradas).
+# R11F_G11F_B10F guarda el mismo rango HDR que RGBA16F en la mitad de bytes;
+# el alfa de la escena no se usa (el blending aditivo usa el alfa del fragmento).
+FORMATOS_COLOR = {
+    False: (GL_RGBA16F, "RGBA16F"),
+    True: (GL_R11F_G11F_B10F, "R11F_G11F_B10F"),
+}
+FORMATOS_PROFUNDIDAD = {
+    False: (GL_DEPTH_COMPONENT24, "24 bits"), # 24 bits (+8 de relleno en la mayoría de drivers)
+    True: (GL_DEPTH_COMPONENT16, "16 bits"),  # Alcanza: puntos aditivos y un solo modelo
+}
+TAPS_BLUR = 9 # Lecturas por fragmento del blur gaussiano (ver blur.frag)
+
+# Bloom temporal (bloom_cadencia = N > 1): la cadena de blur se reparte entre
+# N frames (~iteraciones/N pasadas por frame, costo parejo en vez de un pico
+# cada N frames) y al terminar se mezcla con la historia. Lo que se muestra es
+# la historia, rotada con el giro del túnel desde que se leyó la escena
+# (reproyección). Un golpe de audio (subida de energía sobre su media lenta)
+# recalcula la cadena entera en ese frame y sube el peso del bloom nuevo, así
+# los golpes siguen dando brillo instantáneo.
+UMBRAL_GOLPE = 0.08   # Subida de energía que fuerza el recálculo
+GANANCIA_GOLPE = 4.0  # Peso extra del bloom nuevo por unidad de subida
+SUAVIZADO_ENERGIA = 0.1 # Factor de la media lenta de energía (por frame)
 
 class PostProcessor:
-    def __init__(self, ctx):
+    def __init__(self, ctx, pool):
+        """
+        Args:
+            pool (PoolTargets): De donde salen todos los targets. Los de cada
+                frame los pide el grafo de render (ver recursos()); aquí solo
+                se retienen los que el bloom temporal necesita entre frames.
+        """
         self.ctx = ctx
+        self.pool = pool
         self.downscale = 4 # Resolución 1/4 para Bloom (Optimización)
-        self.fbo = 0
-        self.color_tex = 0
-        self.depth_rbo = 0
-        # --- Recursos para Bright Pass ---
-        self.bright_fbo = 0
-        self.bright_tex = 0
-        # --- Recursos para Ping-Pong Blur ---
-        self.pingpong_fbo = [0, 0]
-        self.pingpong_tex = [0, 0]
+        # --- Bloom temporal: targets retenidos entre frames ---
+        # (La extracción de brillo va fusionada en la primera pasada de blur)
+        self.temporal = False
+        self.cadena = None   # Par de ping-pong de la cadena repartida
+        self.historia = None
+        self.historia_valida = False
+        self.region_historia = None # (bw, bh) con la que se escribió la historia
+        self.giro_historia = 0.0    # Giro del túnel al escribirla
+        self.bloom_giro = 0.0       # Rotación a aplicar al bloom en la composición
+        self.paso_cadena = 0        # Próxima pasada de la cadena repartida (0 = empezar)
+        self.frame_cadena = 0       # Frames que lleva la cadena en curso
+        self.golpe_forzado = False  # Si en este frame un golpe forzó la cadena completa
+        self.giro_cadena = 0.0      # Giro del túnel cuando la cadena leyó la escena
+        self.energia_lenta = 0.0
+        self.diff = None # Lista de mediciones cuando corre la prueba de diferencia (ver renderer)
+        self.pasadas_frame = 0      # Pasadas de blur de este frame (para el tráfico)
+        self.extraccion_frame = False
         
         self.quad_vao = 0
         self.quad_vbo = 0
         self.program = None
-        self.bright_program = None
         self.blur_program = None
-        self.bloom_tex = 0 # Almacena el resultado del cálculo de bloom
+
+        # --- Resolución de render ---
+        # Los targets tienen una capacidad (ancho, alto) >= ventana; la escena de
+        # cada frame ocupa solo la esquina (escena_w, escena_h) y el bloom la
+        # esquina (bloom_w, bloom_h): ni render_scale ni achicar la ventana reasignan.
+        self.escala = 1.0
+        self.escena_w, self.escena_h = ctx.W, ctx.H
+        self.bloom_w, self.bloom_h = 1, 1
+
+        # Formatos elegidos en la configuración (se leen en comenzar_frame)
+        cfg = ctx.ui.config
+        self.color_compacto = cfg.get("hdr_compacto", 1.0) > 0.5
+        self.profundidad_16 = cfg.get("profundidad_16", 1.0) > 0.5
         
-        # Inicializar FBO y Texturas
-        self.init_framebuffer(ctx.W, ctx.H)
+        # Capacidad de los targets (se asignan en el primer frame que los usa)
+        self.tam_max = int(glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+        self._fijar_capacidad(ctx.W, ctx.H)
         
         # Inicializar Quad de pantalla completa
         self.init_quad()
@@ -35,111 +91,81 @@ class PostProcessor:
         if not self.program:
             raise RuntimeError("No se pudieron cargar los shaders de post-procesamiento.")
             
-        self.u_scene_loc = glGetUniformLocation(self.program, "u_scene")
-        self.u_bloom_loc = glGetUniformLocation(self.program, "u_bloom")
-        self.u_bloom_intensity_loc = glGetUniformLocation(self.program, "u_bloom_intensity")
-        
-        # Cargar shader de Bright Pass
-        self.bright_program = shaders.load_shader_program("render/post.vert", "render/bright_pass.frag")
-        if not self.bright_program:
-            raise RuntimeError("No se pudieron cargar los shaders de bright pass.")
-        self.u_bright_scene_loc = glGetUniformLocation(self.bright_program, "u_scene")
-        self.u_threshold_loc = glGetUniformLocation(self.bright_program, "u_threshold")
+        self.u_scene_loc = shaders.get_uniform_location(self.program, "u_scene")
+        self.u_bloom_loc = shaders.get_uniform_location(self.program, "u_bloom")
+        self.u_bloom_intensity_loc = shaders.get_uniform_location(self.program, "u_bloom_intensity")
+        self.u_escena_uv_loc = shaders.get_uniform_location(self.program, "u_escena_uv")
+        self.u_escena_max_loc = shaders.get_uniform_location(self.program, "u_escena_max")
+        self.u_bloom_uv_loc = shaders.get_uniform_location(self.program, "u_bloom_uv")
+        self.u_bloom_max_loc = shaders.get_uniform_location(self.program, "u_bloom_max")
+        self.u_bicubico_loc = shaders.get_uniform_location(self.program, "u_bicubico")
+        self.u_exposicion_loc = shaders.get_uniform_location(self.program, "u_exposicion")
+        self.u_tonemap_loc = shaders.get_uniform_location(self.program, "u_tonemap")
+        self.u_bloom_giro_loc = shaders.get_uniform_location(self.program, "u_bloom_giro")
+        self.u_aspecto_loc = shaders.get_uniform_location(self.program, "u_aspecto")
         
-        # Cargar shader de Blur
+        # Cargar shader de Blur (con la extracción de brillo integrada)
         self.blur_program = shaders.load_shader_program("render/post.vert", "render/blur.frag")
         if not self.blur_program:
             raise RuntimeError("No se pudieron cargar los shaders de blur.")
-        self.u_blur_image_loc = glGetUniformLocation(self.blur_program, "u_image")
-        self.u_horizontal_loc = glGetUniformLocation(self.blur_program, "u_horizontal")
-
-    def init_framebuffer(self, width, height):
-        # Limpiar recursos si ya existen (para resize)
-        if self.fbo:
-            glDeleteFramebuffers(1, [self.fbo])
-            glDeleteTextures(1, [self.color_tex])
-            glDeleteRenderbuffers(1, [self.depth_rbo])
-            glDeleteFramebuffers(1, [self.bright_fbo])
-            glDeleteTextures(1, [self.bright_tex])
-            glDeleteFramebuffers(2, self.pingpong_fbo)
-            glDeleteTextures(2, self.pingpong_tex)
-
-        # 1. Crear FBO
-        self.fbo = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
-
-        # 2. Crear Textura de Color (RGBA16F para HDR)
-        self.color_tex = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, self.color_tex)
-        glTexImage2D(
-            GL_TEXTURE_2D, 0, GL_RGBA16F,
-            width, height, 0,
-            GL_RGBA, GL_FLOAT, None
-        )
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        
-        glFramebufferTexture2D(
-            GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0,
-            GL_TEXTURE_2D, self.color_tex, 0
-        )
-
-        # 3. Crear Renderbuffer de Profundidad
-        self.depth_rbo = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_rbo)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, width, height)
-        glFramebufferRenderbuffer(
-            GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT,
-            GL_RENDERBUFFER, self.depth_rbo
-        )
-
-        # Verificar estado
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print("⚠️ Error: Framebuffer no está completo.")
-        
-        # Dimensiones reducidas para Bloom
-        bw = max(1, width // self.downscale)
-        bh = max(1, height // self.downscale)
-        
-        # --- Crear FBO para Bright Pass ---
-        self.bright_fbo = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.bright_fbo)
-        
-        self.bright_tex = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, self.bright_tex)
-        glTexImage2D(
-            GL_TEXTURE_2D, 0, GL_RGBA16F,
-            bw, bh, 0,
-            GL_RGBA, GL_FLOAT, None
-        )
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.bright_tex, 0)
-        
-        # --- Crear FBOs para Ping-Pong ---
-        self.pingpong_fbo = glGenFramebuffers(2)
-        self.pingpong_tex = glGenTextures(2)
-        
-        for i in range(2):
-            glBindFramebuffer(GL_FRAMEBUFFER, self.pingpong_fbo[i])
-            glBindTexture(GL_TEXTURE_2D, self.pingpong_tex[i])
-            glTexImage2D(
-                GL_TEXTURE_2D, 0, GL_RGBA16F,
-                bw, bh, 0,
-                GL_RGBA, GL_FLOAT, None
-            )
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.pingpong_tex[i], 0)
-
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        self.u_blur_image_loc = shaders.get_uniform_location(self.blur_program, "u_image")
+        self.u_horizontal_loc = shaders.get_uniform_location(self.blur_program, "u_horizontal")
+        self.u_extraer_loc = shaders.get_uniform_location(self.blur_program, "u_extraer")
+        self.u_threshold_loc = shaders.get_uniform_location(self.blur_program, "u_threshold")
+        self.u_texel_loc = shaders.get_uniform_location(self.blur_program, "u_texel")
+        self.u_blur_uv_escala_loc = shaders.get_uniform_location(self.blur_program, "u_uv_escala")
+        self.u_blur_uv_max_loc = shaders.get_uniform_location(self.blur_program, "u_uv_max")
+
+    # --- Targets ---
+    def clave_escena(self):
+        """Clave del pool para la escena: color HDR + profundidad, a capacidad completa."""
+        return (self.ancho, self.alto, FORMATOS_COLOR[self.color_compacto][0],
+                FORMATOS_PROFUNDIDAD[self.profundidad_16][0])
+
+    def clave_bloom(self):
+        return (self.bloom_ancho, self.bloom_alto, FORMATOS_COLOR[self.color_compacto][0], None)
+
+    def recursos(self, grafo):
+        """Declara en el grafo los recursos que usan las pasadas de post-proceso."""
+        grafo.recurso("escena", self.clave_escena)
+        # Con el bloom temporal el resultado es la historia (persistente); si no, uno del pool
+        grafo.recurso("bloom", lambda: self.historia if self.temporal else self.clave_bloom())
+        grafo.recurso("bloom_tmp", lambda: None if self.temporal else self.clave_bloom())
+        # Referencia de la prueba de diferencia: se solapa con bloom_tmp, ya libre
+        grafo.recurso("diff_a", self.clave_bloom)
+        grafo.recurso("diff_b", self.clave_bloom)
+
+    def _fijar_capacidad(self, width, height):
+        """
+        Tamaño asignado de los targets (la escena de cada frame usa una esquina
+        de hasta este tamaño). Los del pool con la clave anterior se liberan ya:
+        no se vuelven a pedir.
+        """
+        self.ancho, self.alto = width, height
+        self.bloom_ancho = max(1, width // self.downscale)
+        self.bloom_alto = max(1, height // self.downscale)
+        self._soltar_persistentes()
+        self.pool.recortar(0)
+
+        _, nombre = FORMATOS_COLOR[self.color_compacto]
+        _, nombre_prof = FORMATOS_PROFUNDIDAD[self.profundidad_16]
+        print(f"🖼️ Targets de post-proceso: {width}x{height} (bloom {self.bloom_ancho}x{self.bloom_alto}), "
+              f"{nombre} + profundidad {nombre_prof}")
+
+    def _retener_persistentes(self):
+        """Par de ping-pong e historia del bloom temporal, retenidos entre frames."""
+        if self.historia is None:
+            self.cadena = [self.pool.pedir(*self.clave_bloom()) for _ in range(2)]
+            self.historia = self.pool.pedir(*self.clave_bloom())
+            self.historia_valida = False # Se rellena en la próxima actualización
+            self.paso_cadena = 0
+
+    def _soltar_persistentes(self):
+        if self.historia is not None:
+            for target in self.cadena + [self.historia]:
+                self.pool.devolver(target)
+            self.cadena = self.historia = None
+            self.historia_valida = False
 
     def init_quad(self):
         # Quad que cubre la pantalla en coordenadas normalizadas (-1 a 1)
@@ -173,108 +199,316 @@ class PostProcessor:
         glBindVertexArray(0)
 
     def resize(self, w, h):
-        self.init_framebuffer(w, h)
+        """
+        Solo reasigna si la ventana supera la capacidad actual; entonces crece
+        con margen (CRECIMIENTO) para que seguir arrastrando el borde no vuelva
+        a reasignar. Si cabe, la escena usa una esquina de los targets
+        (ver comenzar_frame), igual que con render_scale.
+        """
+        if w <= self.ancho and h <= self.alto:
+            return
+        ancho, alto = self.ancho, self.alto
+        if w > ancho:
+            ancho = max(w, int(ancho * CRECIMIENTO))
+        if h > alto:
+            alto = max(h, int(alto * CRECIMIENTO))
+        self._fijar_capacidad(min(ancho, self.tam_max), min(alto, self.tam_max))
+
+    def comenzar_frame(self):
+        """
+        Fija la resolución de la escena de este frame según render_scale y
+        decide el modo del bloom (las pasadas del grafo lo leen).
+        Returns:
+            float: Escala efectiva (ancho de la escena / ancho de la ventana).
+        """
+        cfg = self.ctx.ui.config
+        downscale = max(1, int(cfg.get("bloom_downscale", 4)))
+        compacto = cfg.get("hdr_compacto", 1.0) > 0.5
+        prof_16 = cfg.get("profundidad_16", 1.0) > 0.5
+        if (downscale, compacto, prof_16) != (self.downscale, self.color_compacto, self.profundidad_16):
+            # Cambió la reducción del bloom (menú o gobernador de calidad) o un formato: claves nuevas
+            self.downscale = downscale
+            self.color_compacto, self.profundidad_16 = compacto, prof_16
+            self._fijar_capacidad(self.ancho, self.alto)
+
+        self.escala = float(np.clip(cfg.get("render_scale", 1.0), ESCALA_MIN, 1.0))
+        self.escena_w = max(1, min(self.ancho, round(self.ctx.W * self.escala)))
+        self.escena_h = max(1, min(self.alto, round(self.ctx.H * self.escala)))
+        self.bloom_w = max(1, min(self.bloom_ancho, self.escena_w // self.downscale))
+        self.bloom_h = max(1, min(self.bloom_alto, self.escena_h // self.downscale))
+
+        # Bloom temporal: retiene su historia; al salir de ese modo vuelve al pool
+        self.temporal = self.bloom_activo() and int(cfg.get("bloom_cadencia", 1)) > 1
+        if self.temporal:
+            self._retener_persistentes()
+        else:
+            self._soltar_persistentes()
+            self.golpe_forzado = False
+            self.paso_cadena = 0
+        self.bloom_giro = 0.0
+        self.pasadas_frame, self.extraccion_frame = 0, False
+        return self.escena_w / max(1, self.ctx.W)
+
+    def bloom_activo(self):
+        return self.ctx.ui.config.get("bloom_enabled", 1.0) > 0.5
 
-    def bind(self):
-        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
-        glViewport(0, 0, self.ctx.W, self.ctx.H)
+    def bind(self, escena):
+        estado.bind_framebuffer(escena.fbo)
+        estado.viewport(0, 0, self.escena_w, self.escena_h)
 
-    def unbind(self):
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        glViewport(0, 0, self.ctx.W, self.ctx.H)
+    def _registrar_trafico(self, pasadas, con_extraccion):
+        """
+        Estima los bytes que mueve cada pasada de post-proceso en este frame
+        (texels leídos + escritos x bytes por texel; las lecturas repetidas de
+        los taps vecinos se suponen servidas por el caché de texturas).
+        Args:
+            pasadas (int): Pasadas de blur hechas en este frame.
+            con_extraccion (bool): Si una de ellas fue la primera (lee la escena).
+        """
+        bpp = BYTES_FORMATO[FORMATOS_COLOR[self.color_compacto][0]]
+        escena = self.escena_w * self.escena_h
+        bloom = self.bloom_w * self.bloom_h
+        extraccion = blur = 0
+        if con_extraccion:
+            # Extracción + primer blur: lee la escena (hasta lo que alcanzan los taps) y escribe el bloom
+            extraccion = (min(escena, bloom * TAPS_BLUR * 4) + bloom) * bpp
+            pasadas -= 1
+        blur = pasadas * bloom * 2 * bpp
+        # Composición: escena + bloom, escribe la ventana (RGBA8)
+        composicion = (escena + bloom) * bpp + self.ctx.W * self.ctx.H * 4
 
-    def calculate_bloom(self):
-        """Calcula el mapa de bloom basado en el contenido actual del FBO."""
-        glDisable(GL_BLEND)
-        glDisable(GL_DEPTH_TEST)
+        records = self.ctx.profiler.records
+        records["post_bytes_extraccion"] = extraccion
+        records["post_bytes_blur"] = blur
+        records["post_bytes_composicion"] = composicion
+        records["post_bytes"] = extraccion + blur + composicion
 
-        # Leer configuración de UI
+    def _cadena_blur(self, iteraciones, threshold, escena, par, desde=0, hasta=None, alfa=None):
+        """
+        Blur Gaussiano (Ping-Pong), pasadas [desde, hasta) de una cadena de
+        'iteraciones'. La primera pasada lee la escena directamente y aplica
+        el umbral en cada tap: la extracción de brillo y la reducción de
+        resolución van fusionadas con ella, sin un target intermedio. Con
+        'alfa', la última pasada de la cadena escribe en la historia con
+        blending constante (historia = mezcla(historia, nuevo, alfa)) en vez
+        de una pasada extra de mezcla.
+        Args:
+            par (list): Dos targets de bloom; la pasada i escribe en par[i % 2 == 0].
+        Returns:
+            Target: El que tiene el resultado (válido si se llegó al final).
+        """
+        hasta = iteraciones if hasta is None else hasta
+        bw, bh = self.bloom_w, self.bloom_h
+        
+        estado.use_program(self.blur_program)
+        estado.viewport(0, 0, bw, bh) # Viewport reducido
+        estado.bind_vao(self.quad_vao)
+        glUniform1f(self.u_threshold_loc, threshold)
+        # Un texel del bloom mide lo mismo en UV de la escena y del bloom (misma asignación)
+        glUniform2f(self.u_texel_loc, 1.0 / self.bloom_ancho, 1.0 / self.bloom_alto)
+        if desde > 0:
+            self._uniforms_blur_bloom(bw, bh)
+        
+        for i in range(desde, hasta):
+            horizontal = i % 2 == 0 # Pasadas pares horizontales, impares verticales
+            if alfa is not None and i == iteraciones - 1:
+                estado.bind_framebuffer(self.historia.fbo)
+                estado.enable(GL_BLEND)
+                estado.blend_func(GL_CONSTANT_ALPHA, GL_ONE_MINUS_CONSTANT_ALPHA)
+                glBlendColor(0.0, 0.0, 0.0, alfa)
+            else:
+                estado.bind_framebuffer(par[int(horizontal)].fbo)
+            glUniform1i(self.u_horizontal_loc, int(horizontal))
+            
+            if i == 0:
+                # Primera iteración: escena original, con extracción de brillo
+                estado.bind_texture(0, GL_TEXTURE_2D, escena.tex)
+                glUniform1i(self.u_extraer_loc, 1)
+                glUniform2f(self.u_blur_uv_escala_loc,
+                            self.escena_w / self.ancho, self.escena_h / self.alto)
+                glUniform2f(self.u_blur_uv_max_loc,
+                            (self.escena_w - 0.5) / self.ancho, (self.escena_h - 0.5) / self.alto)
+            else:
+                if i == 1:
+                    self._uniforms_blur_bloom(bw, bh)
+                # Luego leemos del otro buffer de pingpong (el que escribió la pasada anterior)
+                estado.bind_texture(0, GL_TEXTURE_2D, par[int(not horizontal)].tex)
+            
+            glDrawArrays(GL_TRIANGLES, 0, 6)
+
+        if alfa is not None and hasta == iteraciones:
+            estado.disable(GL_BLEND)
+            return self.historia
+        return par[int((iteraciones - 1) % 2 == 0)]
+
+    def _uniforms_blur_bloom(self, bw, bh):
+        """Pasadas de blur que leen un target de bloom (no la escena)."""
+        glUniform1i(self.u_extraer_loc, 0)
+        glUniform2f(self.u_blur_uv_escala_loc, bw / self.bloom_ancho, bh / self.bloom_alto)
+        glUniform2f(self.u_blur_uv_max_loc,
+                    (bw - 0.5) / self.bloom_ancho, (bh - 0.5) / self.bloom_alto)
+
+    def _golpe(self):
+        """Subida de la energía de audio sobre su media lenta (0 si baja)."""
+        energia = self.ctx.bass_energy + self.ctx.high_energy
+        golpe = max(0.0, energia - self.energia_lenta)
+        if golpe > UMBRAL_GOLPE:
+            self.energia_lenta = energia # El golpe se consume: un recálculo por subida
+        else:
+            self.energia_lenta += (energia - self.energia_lenta) * SUAVIZADO_ENERGIA
+        return golpe
+
+    def _bloom_temporal(self, cfg, cadencia, iteraciones, threshold, escena):
+        """
+        Avanza la cadena de blur repartida (o la hace entera si hay un golpe o
+        no hay historia) sobre la historia, que es lo que se muestra.
+        Returns:
+            tuple: (pasadas hechas en este frame, si alguna leyó la escena).
+        """
+        golpe = self._golpe()
+        if self.region_historia != (self.bloom_w, self.bloom_h):
+            self.historia_valida = False # Cambió render_scale o la ventana
+        if self.paso_cadena >= iteraciones:
+            self.paso_cadena = 0 # Bajaron las iteraciones a mitad de cadena
+
+        historia = float(np.clip(cfg.get("bloom_historia", 0.3), 0.0, 0.95))
+        self.golpe_forzado = self.historia_valida and golpe > UMBRAL_GOLPE
+        if not self.historia_valida or self.golpe_forzado:
+            # Cadena completa ya mismo con la escena de este frame
+            desde, hasta = 0, iteraciones
+            alfa = 1.0 if not self.historia_valida else min(1.0, 1.0 - historia + golpe * GANANCIA_GOLPE)
+        else:
+            # Pasadas repartidas en partes iguales: el frame k llega hasta (k+1)/cadencia de la cadena
+            if self.paso_cadena == 0:
+                self.frame_cadena = 0
+            desde = self.paso_cadena
+            hasta = min(iteraciones, max(desde + 1, (self.frame_cadena + 1) * iteraciones // cadencia))
+            alfa = 1.0 - historia
+        self.frame_cadena += 1
+
+        if desde == 0:
+            self.giro_cadena = self.ctx.giro
+        self._cadena_blur(iteraciones, threshold, escena, self.cadena, desde, hasta, alfa)
+        if hasta == iteraciones:
+            self.historia_valida = True
+            self.region_historia = (self.bloom_w, self.bloom_h)
+            self.giro_historia = self.giro_cadena
+            self.paso_cadena = 0
+        else:
+            self.paso_cadena = hasta
+
+        self.bloom_giro = self.ctx.giro - self.giro_historia
+        return hasta - desde, desde == 0
+
+    def _parametros_bloom(self):
         cfg = self.ctx.ui.config
-        enabled = cfg.get("bloom_enabled", 1.0) > 0.5
         threshold = cfg.get("bloom_threshold", 1.0)
-        iterations = int(cfg.get("bloom_iterations", 10))
-
-        # Dimensiones
-        w, h = self.ctx.W, self.ctx.H
-        bw, bh = max(1, w // self.downscale), max(1, h // self.downscale)
-
-        if enabled:
-            with self.ctx.profiler.region("post_bloom"):
-                # 1. Paso de Extracción de Brillo (Scene -> Bright FBO)
-                glBindFramebuffer(GL_FRAMEBUFFER, self.bright_fbo)
-                glViewport(0, 0, bw, bh) # Viewport reducido
-                glClear(GL_COLOR_BUFFER_BIT)
-                
-                glUseProgram(self.bright_program)
-                glActiveTexture(GL_TEXTURE0)
-                glBindTexture(GL_TEXTURE_2D, self.color_tex) # Leemos la escena original
-                glUniform1i(self.u_bright_scene_loc, 0)
-                glUniform1f(self.u_threshold_loc, threshold)
-                
-                glBindVertexArray(self.quad_vao)
-                glDrawArrays(GL_TRIANGLES, 0, 6)
-                
-                # 2. Blur Gaussiano (Ping-Pong)
-                horizontal = True
-                first_iteration = True
-                amount = iterations
-                
-                glUseProgram(self.blur_program)
-                glActiveTexture(GL_TEXTURE0)
-                glViewport(0, 0, bw, bh) # Asegurar viewport reducido para el blur
-                
-                for i in range(amount):
-                    glBindFramebuffer(GL_FRAMEBUFFER, self.pingpong_fbo[int(horizontal)])
-                    glUniform1i(self.u_horizontal_loc, int(horizontal))
-                    
-                    # En la primera iteración leemos de bright_tex, luego del otro buffer de pingpong
-                    if first_iteration:
-                        glBindTexture(GL_TEXTURE_2D, self.bright_tex)
-                    else:
-                        glBindTexture(GL_TEXTURE_2D, self.pingpong_tex[int(not horizontal)])
-                    
-                    glBindVertexArray(self.quad_vao)
-                    glDrawArrays(GL_TRIANGLES, 0, 6)
-                    
-                    horizontal = not horizontal
-                    first_iteration = False
-                
-                glBindVertexArray(0)
-                self.bloom_tex = self.pingpong_tex[int(not horizontal)]
+        iterations = max(1, int(cfg.get("bloom_iterations", 10)))
+        return cfg, iterations, threshold
+
+    # --- Pasadas del grafo ---
+    def pasada_bloom(self, r):
+        """Calcula el mapa de bloom a partir de la escena (antes de dibujar el modelo)."""
+        estado.disable(GL_BLEND)
+        estado.disable(GL_DEPTH_TEST)
+        cfg, iterations, threshold = self._parametros_bloom()
+
+        if self.temporal:
+            cadencia = int(cfg.get("bloom_cadencia", 1))
+            pasadas, con_extraccion = self._bloom_temporal(cfg, cadencia, iterations, threshold, r["escena"])
         else:
-            self.bloom_tex = self.pingpong_tex[0]
+            # La última pasada de la cadena cae en "bloom"; la otra mitad del ping-pong es descartable
+            if (iterations - 1) % 2 == 0:
+                par = [r["bloom_tmp"], r["bloom"]]
+            else:
+                par = [r["bloom"], r["bloom_tmp"]]
+            self._cadena_blur(iterations, threshold, r["escena"], par)
+            pasadas, con_extraccion = iterations, True
+        self.ctx.profiler.records["bloom_pasadas"] = pasadas
+        self.pasadas_frame, self.extraccion_frame = pasadas, con_extraccion
+
+    def _leer_bloom(self, target):
+        """Lee la región de bloom de un target (solo para la prueba de diferencia)."""
+        estado.bind_framebuffer(target.fbo)
+        datos = glReadPixels(0, 0, self.bloom_w, self.bloom_h, GL_RGB, GL_FLOAT)
+        return np.frombuffer(datos, dtype=np.float32).reshape(self.bloom_h, self.bloom_w, 3)
+
+    def pasada_diff(self, r):
+        """
+        Compara el bloom que se va a mostrar (reproyectado igual que en
+        post.frag) con el bloom a tasa completa de este mismo frame. La
+        referencia usa su propio par de targets (diff_a, diff_b) para no pisar
+        la cadena repartida en curso.
+        """
+        _, iteraciones, threshold = self._parametros_bloom()
+        mostrado = self._leer_bloom(r["bloom"])
+        ref = self._cadena_blur(iteraciones, threshold, r["escena"], [r["diff_a"], r["diff_b"]])
+        referencia = self._leer_bloom(ref)
+
+        if self.bloom_giro:
+            # Misma rotación alrededor del centro que aplica la composición (vecino más cercano)
+            h, w = mostrado.shape[:2]
+            aspecto = self.ctx.W / self.ctx.H
+            y, x = np.mgrid[0:h, 0:w]
+            dx = ((x + 0.5) / w - 0.5) * aspecto
+            dy = (y + 0.5) / h - 0.5
+            c, s = np.cos(-self.bloom_giro), np.sin(-self.bloom_giro)
+            sx = ((c * dx - s * dy) / aspecto + 0.5) * w
+            sy = (s * dx + c * dy + 0.5) * h
+            mostrado = mostrado[np.clip(sy.astype(int), 0, h - 1), np.clip(sx.astype(int), 0, w - 1)]
 
-    def render(self):
-        """Realiza la composición final a pantalla (Escena + Bloom)."""
-        glDisable(GL_BLEND)
-        glDisable(GL_DEPTH_TEST)
+        error = np.abs(mostrado - referencia)
+        self.diff.append({
+            "relativo": float(error.sum() / max(referencia.sum(), 1e-6)),
+            "mse": float(np.mean(error ** 2)),
+            "pico": float(referencia.max()),
+            "golpe": self.golpe_forzado,
+        })
+
+    def pasada_composicion(self, r):
+        """Realiza la composición final a pantalla (Escena + Bloom, exposición y tone mapping)."""
+        estado.disable(GL_BLEND)
+        estado.disable(GL_DEPTH_TEST)
 
         cfg = self.ctx.ui.config
-        enabled = cfg.get("bloom_enabled", 1.0) > 0.5
         intensity = cfg.get("bloom_intensity", 1.0)
-        
-        if not enabled:
-            intensity = 0.0
+        bloom = r["bloom"]
+        if bloom is None:
+            intensity = 0.0 # Pasada de bloom descartada
+        self._registrar_trafico(self.pasadas_frame, self.extraccion_frame)
 
         # 3. Composición Final (Scene + Bloom)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        glViewport(0, 0, self.ctx.W, self.ctx.H) # Restaurar viewport completo
+        estado.bind_framebuffer(0)
+        estado.viewport(0, 0, self.ctx.W, self.ctx.H) # Restaurar viewport completo
         
-        glUseProgram(self.program)
+        estado.use_program(self.program)
         
         # Textura 0: Escena Original
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.color_tex)
+        estado.bind_texture(0, GL_TEXTURE_2D, r["escena"].tex)
         glUniform1i(self.u_scene_loc, 0)
         
-        # Textura 1: Bloom (Resultado del Blur)
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.bloom_tex)
+        # Textura 1: Bloom (Resultado del Blur; sin bloom se enlaza la escena, con intensidad 0)
+        estado.bind_texture(1, GL_TEXTURE_2D, (bloom or r["escena"]).tex)
         glUniform1i(self.u_bloom_loc, 1)
         
         # Intensidad del efecto
         glUniform1f(self.u_bloom_intensity_loc, intensity) 
+
+        # Exposición y tone mapping en la misma pasada (sin target intermedio)
+        glUniform1f(self.u_exposicion_loc, cfg.get("exposicion", 1.0))
+        glUniform1i(self.u_tonemap_loc, int(cfg.get("tonemap", 0.0) > 0.5))
+
+        # Regiones válidas; si la escena es más chica que la ventana se reescala con bicúbico
+        glUniform2f(self.u_escena_uv_loc, self.escena_w / self.ancho, self.escena_h / self.alto)
+        glUniform2f(self.u_escena_max_loc,
+                    (self.escena_w - 0.5) / self.ancho, (self.escena_h - 0.5) / self.alto)
+        glUniform2f(self.u_bloom_uv_loc, self.bloom_w / self.bloom_ancho, self.bloom_h / self.bloom_alto)
+        glUniform2f(self.u_bloom_max_loc,
+                    (self.bloom_w - 0.5) / self.bloom_ancho, (self.bloom_h - 0.5) / self.bloom_alto)
+        glUniform1i(self.u_bicubico_loc, int(self.escena_w < self.ctx.W))
+        # Reproyección del bloom temporal: el túnel giró desde que se calculó
+        glUniform1f(self.u_bloom_giro_loc, self.bloom_giro)
+        glUniform1f(self.u_aspecto_loc, self.ctx.W / max(1, self.ctx.H))
         
-        glBindVertexArray(self.quad_vao)
+        estado.bind_vao(self.quad_vao)
         glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
@@ -10,11 +10,16 @@ from OpenGL.GL import *
 import numpy as np
 import ctypes
 import pyrr
-import math
 from . import shaders
 from .postprocess import PostProcessor
-import random
+from .grafo import GrafoRender, Pasada, PoolTargets
 from .modelo import Model3D
+from .frame_data import FrameData
+from .gl_state import estado
+from .streaming import StreamingBuffer, comenzar_frame, terminar_frame
+from .historial import HistorialEspectro
+from .simulacion import EstadoEstrellas, GIRO_POR_PASO, interpolar
+from core.arranque import perfil
 
 class ModernRenderer:
     def __init__(self, ctx):
@@ -30,36 +35,28 @@ class ModernRenderer:
             raise RuntimeError("No se pudieron cargar los shaders. La aplicación no puede continuar.")
 
         # --- Obtención de Ubicación de Uniforms ---
-        # Guardamos las ubicaciones para no tener que buscarlas en cada frame, es más eficiente.
-        self.u_projection_loc = glGetUniformLocation(self.program, "u_projection")
-        self.u_view_loc = glGetUniformLocation(self.program, "u_view")
-        self.u_time_loc = glGetUniformLocation(self.program, "u_time")
-        self.u_energy_loc = glGetUniformLocation(self.program, "u_energy")
-
-        # --- Buffers (VAO/VBO) ---
-        # El VAO (Vertex Array Object) almacena la configuración de los atributos de vértice.
+        # Cámara, tiempo y energía llegan en el bloque FrameData, compartido
+        # por todos los programas. Los del túnel describen la rejilla y el historial.
+        self.frame_data = FrameData()
+        self.u_historial_loc = shaders.get_uniform_location(self.program, "u_historial")
+        self.u_cabeza_loc = shaders.get_uniform_location(self.program, "u_cabeza")
+        self.u_capas_loc = shaders.get_uniform_location(self.program, "u_capas")
+        self.u_puntos_loc = shaders.get_uniform_location(self.program, "u_puntos")
+        self.u_retraso_loc = shaders.get_uniform_location(self.program, "u_retraso")
+        self.u_z_near_loc = shaders.get_uniform_location(self.program, "u_z_near")
+        self.u_z_far_loc = shaders.get_uniform_location(self.program, "u_z_far")
+        self.u_giro_loc = shaders.get_uniform_location(self.program, "u_giro")
+        self.u_fase_loc = shaders.get_uniform_location(self.program, "u_fase")
+
+        # --- Túnel generado en GPU ---
+        # Sin VBO: el vertex shader arma cada punto desde gl_VertexID. El Core
+        # Profile exige un VAO enlazado para dibujar, aunque esté vacío.
         self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-        
-        # El VBO (Vertex Buffer Object) es la memoria donde se guardan los datos de los vértices.
-        self.vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        
-        # --- Configuración de Atributos de Vértice ---
-        # Le decimos a OpenGL cómo interpretar los datos del VBO.
-        # El 'stride' es el tamaño total de un vértice en bytes (6 floats * 4 bytes/float = 24).
-        stride = 6 * 4 
-        
-        # Atributo 0: Posición (vec3) -> layout (location = 0) en el shader
-        # Son 3 floats, y empiezan en el byte 0 de cada vértice.
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-        
-        # Atributo 1: Datos de Color (vec3: hue_base, t, intensity) -> layout (location = 1)
-        # Son 3 floats, y empiezan después de la posición (en el byte 12).
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(1)
-        
+        self.point_count = 0
+
+        # Historial del espectro (anillo en una textura R32F, una fila por frame)
+        self.historial = HistorialEspectro(len(ctx.espectro), ctx.ui.config["historial_frames"])
+
         # --- Matrices de Cámara ---
         # Creamos las matrices de proyección y vista que reemplazan a gluPerspective y glTranslatef.
         self.projection_matrix = pyrr.matrix44.create_perspective_projection_matrix(
@@ -98,20 +95,48 @@ class ModernRenderer:
         }, 1, "high_energy") # 1 = Segundo color de la paleta
 
         # --- Modelo 3D (Elfa) ---
-        self.model = Model3D(ctx, "modelo 3d/gohan/elfa.obj")
+        with perfil.fase("Model3D", ctx.profiler):
+            self.model = Model3D(ctx, ctx.ruta_modelo)
 
-        # --- Post-Procesamiento (Fase 1: FBO Base) ---
-        self.post = PostProcessor(ctx)
+        # --- Post-Procesamiento y grafo del frame ---
+        # Todos los targets salen del pool; el grafo decide qué pasadas corren
+        with perfil.fase("PostProcessor", ctx.profiler):
+            self.pool = PoolTargets(ctx.profiler)
+            self.post = PostProcessor(ctx, self.pool)
+            self.grafo = self._armar_grafo()
 
+        # --- Estado de la simulación a paso fijo (ver simular) ---
         # Acumulador para cambio automático de paleta
         self.energy_accumulator = 0.0
-
-        self.vertex_data = np.array([], dtype=np.float32)
-        self.point_count = 0
+        # Giro del túnel en los dos últimos pasos; ctx.giro es el interpolado del frame
+        self.giro = self.giro_anterior = ctx.giro
+        self.alfa = 1.0
+
+
+    def _armar_grafo(self):
+        """
+        Pasadas del frame en orden. El bloom se calcula antes de dibujar el
+        modelo, así el modelo no contribuye al glow.
+        """
+        grafo = GrafoRender(self.pool, self.ctx.profiler)
+        self.post.recursos(grafo)
+        grafo.agregar(Pasada("escena", self._pasada_escena, salidas=("escena",)))
+        grafo.agregar(Pasada("bloom", self.post.pasada_bloom,
+                             entradas=("escena",), salidas=("bloom", "bloom_tmp"),
+                             activa=self.post.bloom_activo))
+        grafo.agregar(Pasada("diff_bloom", self.post.pasada_diff,
+                             entradas=("escena", "bloom"), salidas=("diff_a", "diff_b"),
+                             activa=lambda: self.post.diff is not None, final=True))
+        grafo.agregar(Pasada("modelo", self._pasada_modelo,
+                             entradas=("escena",), salidas=("escena",),
+                             activa=lambda: self.model.loaded))
+        grafo.agregar(Pasada("composicion", self.post.pasada_composicion,
+                             entradas=("escena", "bloom"), final=True))
+        return grafo
 
     def resize(self, w, h):
-        """Actualiza el viewport y la matriz de proyección al cambiar tamaño de ventana."""
-        glViewport(0, 0, w, h)
+        """Actualiza la matriz de proyección y la capacidad de los targets al cambiar tamaño de ventana."""
+        # El viewport se fija en cada pasada del grafo
         if h > 0:
             self.projection_matrix = pyrr.matrix44.create_perspective_projection_matrix(
                 60.0, w / h, 0.1, 100.0
@@ -119,107 +144,160 @@ class ModernRenderer:
         self.post.resize(w, h)
 
     def update(self, espectro):
-        """Genera los vértices del túnel y los sube al VBO."""
+        """Fija la rejilla del túnel (vueltas x puntos) para este frame."""
         cfg = self.ctx.ui.config
         capas = int(cfg["tunel_vueltas"])
         num_dots = min(int(cfg["num_dots"]), len(espectro))
-        z_near, z_far = cfg["z_near"], cfg["z_far"]
-        
         if num_dots == 0 or capas < 2:
             self.point_count = 0
             return
-
-        points = []
-        for layer in range(capas):
-            t = layer / (capas - 1)
-            z = z_near * (1 - t) + z_far * t
-            for j in range(num_dots):
-                idx = int(j * len(espectro) / num_dots)
-                v = espectro[idx]
-                ang = (j / num_dots) * 2 * math.pi + self.ctx.giro
-                r = v * 4.0 * (0.3 + 0.7 * t) + 0.2
-                if r < 0.3: continue
-                
-                x, y = math.cos(ang) * r, math.sin(ang) * r
-                hue_base = j / num_dots
-                points.extend([x, y, z, hue_base, t, v])
-
-        self.vertex_data = np.array(points, dtype=np.float32)
-        self.point_count = len(points) // 6
-
-        # Subir datos al VBO
-        # No se recrea el buffer (VBO) en cada frame. Solo se actualiza su contenido
-        # con los nuevos vértices del túnel, usando GL_DYNAMIC_DRAW para una
-        # actualización eficiente.
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertex_data.nbytes, self.vertex_data, GL_DYNAMIC_DRAW)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-
-    def render(self):
-        """Ciclo de dibujo principal."""
-        # La limpieza de pantalla (glClear) ahora se gestiona en main.py
-        self.ctx.giro += 0.008
+        self.capas, self.num_dots = capas, num_dots
+        self.point_count = capas * num_dots
+
+    def simular(self):
+        """
+        Un paso fijo de simulación (core.time.PASO_SIM): giro del túnel,
+        paleta automática, estrellas, historial del espectro y modelo. main.py
+        corre los pasos que correspondan al tiempo real antes de render().
+        """
+        cfg = self.ctx.ui.config
+        self.giro_anterior = self.giro
+        self.giro += GIRO_POR_PASO
 
         # --- Lógica de Cambio Automático de Paleta ---
         # Si la opción "Interpolacion" está activada (1.0)
-        if self.ctx.ui.config.get("palette_auto", 1.0) > 0.5:
+        if cfg.get("palette_auto", 1.0) > 0.5:
             self.energy_accumulator += self.ctx.bass_energy
             if self.energy_accumulator > 200.0: # Umbral de energía acumulada
                 self.energy_accumulator = 0.0
                 num_paletas = len(self.ctx.ui.paletas)
-                current = int(self.ctx.ui.config["palette_index"])
-                self.ctx.ui.config["palette_index"] = (current + 1) % num_paletas
-        
-        # Actualizar lógica de estrellas una vez por frame
-        self.stars_bass.update()
-        self.stars_high.update()
+                current = int(cfg["palette_index"])
+                cfg["palette_index"] = (current + 1) % num_paletas
+
+        self.stars_bass.paso()
+        self.stars_high.paso()
+
+        # Una fila del historial por paso: el túnel avanza igual a cualquier tasa de frames
+        self.historial.empujar(self.ctx.espectro, cfg["historial_frames"])
+        self.model.paso()
 
-        # --- FASE 1: Renderizar a FBO ---
-        self.post.bind()
-        # Limpiamos el FBO (necesario porque es un buffer nuevo)
+    def render(self):
+        """Ciclo de dibujo principal."""
+        # La limpieza de pantalla (glClear) ahora se gestiona en main.py
+        # Estado del frame: interpolado entre los dos últimos pasos de simulación
+        self.alfa = self.ctx.time.sim.alfa
+        self.ctx.giro = interpolar(self.giro_anterior, self.giro, self.alfa)
+        self.stars_bass.update(self.alfa)
+        self.stars_high.update(self.alfa)
+
+        # Resolución de la escena en este frame (render_scale)
+        escala = self.post.comenzar_frame()
+
+        # --- Datos compartidos del frame: una sola subida para todos los programas ---
+        self.frame_data.actualizar(
+            self.projection_matrix, self.view_matrix,
+            self.ctx.time.get_time() / 1000.0,
+            self.ctx.bass_energy, self.ctx.high_energy,
+            float(np.mean(self.ctx.espectro)),
+            escala
+        )
+
+        # --- Pasadas del frame (escena, bloom, modelo, composición a pantalla) ---
+        self.grafo.ejecutar()
+
+    def _pasada_escena(self, r):
+        """Túnel y estrellas sobre la escena HDR."""
+        self.post.bind(r["escena"])
+        # Limpiamos el target (viene del pool: puede tener otro contenido)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         
         # 1. Renderizar Estrellas "Fuera" (Fondo) - Radio > 5.0
-        self.stars_bass.render(self.projection_matrix, self.view_matrix, min_r=5.0, max_r=1000.0)
-        self.stars_high.render(self.projection_matrix, self.view_matrix, min_r=5.0, max_r=1000.0)
+        self.stars_bass.render(min_r=5.0, max_r=1000.0)
+        self.stars_high.render(min_r=5.0, max_r=1000.0)
         
         # 2. Renderizar Túnel (Medio)
         self.update(self.ctx.espectro)
         
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE) # Modo aditivo para brillos
-        glEnable(GL_PROGRAM_POINT_SIZE) # Permite al shader controlar el tamaño del punto
+        estado.enable(GL_DEPTH_TEST)
+        estado.enable(GL_BLEND)
+        estado.blend_func(GL_SRC_ALPHA, GL_ONE) # Modo aditivo para brillos
+        estado.enable(GL_PROGRAM_POINT_SIZE) # Permite al shader controlar el tamaño del punto
         
         if self.point_count > 0:
-            glUseProgram(self.program)
-            glUniformMatrix4fv(self.u_projection_loc, 1, GL_FALSE, self.projection_matrix)
-            glUniformMatrix4fv(self.u_view_loc, 1, GL_FALSE, self.view_matrix)
-            glUniform1f(self.u_time_loc, self.ctx.time.get_time() / 1000.0)
-            glUniform1f(self.u_energy_loc, np.mean(self.ctx.espectro))
-
-            glBindVertexArray(self.vao)
+            cfg = self.ctx.ui.config
+            estado.use_program(self.program)
+            estado.bind_texture(0, GL_TEXTURE_2D, self.historial.tex)
+            glUniform1i(self.u_historial_loc, 0)
+            glUniform1i(self.u_cabeza_loc, self.historial.cabeza)
+            glUniform1i(self.u_capas_loc, self.capas)
+            glUniform1i(self.u_puntos_loc, self.num_dots)
+            glUniform1f(self.u_retraso_loc, float(cfg["tunel_retraso"]))
+            glUniform1f(self.u_z_near_loc, float(cfg["z_near"]))
+            glUniform1f(self.u_z_far_loc, float(cfg["z_far"]))
+            glUniform1f(self.u_giro_loc, self.ctx.giro)
+            # El frame cae entre la fila anterior y la cabeza del historial
+            glUniform1f(self.u_fase_loc, 1.0 - self.alfa)
+            estado.bind_vao(self.vao)
             glDrawArrays(GL_POINTS, 0, self.point_count)
-            glBindVertexArray(0)
         
         # 3. Renderizar Estrellas "Dentro" (Frente) - Radio <= 5.0
-        self.stars_bass.render(self.projection_matrix, self.view_matrix, min_r=0.0, max_r=5.0)
-        self.stars_high.render(self.projection_matrix, self.view_matrix, min_r=0.0, max_r=5.0)
+        self.stars_bass.render(min_r=0.0, max_r=5.0)
+        self.stars_high.render(min_r=0.0, max_r=5.0)
 
-        # --- FASE 1.5: Calcular Bloom (SOLO Túnel + Estrellas) ---
-        # Calculamos el brillo antes de dibujar el modelo, así el modelo no contribuye al glow.
-        self.post.calculate_bloom()
-
-        # --- FASE 1.8: Renderizar Modelo 3D (Sin Bloom) ---
-        # Volvemos a bindear el FBO para dibujar el modelo sobre la escena existente.
-        self.post.bind()
+    def _pasada_modelo(self, r):
+        """Modelo 3D sobre la escena existente (sin bloom)."""
+        self.post.bind(r["escena"])
         glClear(GL_DEPTH_BUFFER_BIT)
-        glEnable(GL_DEPTH_TEST)
+        estado.enable(GL_DEPTH_TEST)
         self.model.render(self.projection_matrix, self.view_matrix)
 
-        # --- FASE 2: Volcar a Pantalla ---
-        self.post.unbind()
-        self.post.render()
+    def diff_bloom_temporal(self, cadencia, frames=240, fps=60):
+        """
+        Prueba offscreen del bloom temporal: renderiza 'frames' frames con
+        audio sintético (golpe de graves cada 0.5 s) y compara en cada uno el
+        bloom mostrado con el calculado a tasa completa. Se corre antes de
+        elegir un dispositivo: el hilo de audio no escribe en ctx.
+        Returns:
+            dict: error relativo medio/máximo y PSNR medio/mínimo (dB).
+        """
+        cfg = self.ctx.ui.config
+        guardado = {k: cfg[k] for k in ("bloom_cadencia", "bloom_enabled")}
+        cfg.update(bloom_cadencia=cadencia, bloom_enabled=1.0)
+        rng = np.random.default_rng(0)
+        n = len(self.ctx.espectro)
+        forma = np.exp(-np.linspace(0.0, 4.0, n))
+
+        self.post.diff = []
+        for i in range(frames):
+            golpe = np.exp(-(i / fps % 0.5) * 12.0)
+            self.ctx.bass_energy = float(golpe)
+            self.ctx.high_energy = 0.3 + 0.2 * float(rng.random())
+            self.ctx.espectro = forma * (0.4 + golpe) + rng.random(n) * 0.05
+            # Misma contabilidad que el loop principal: sin ella los buffers de
+            # streaming nunca cambian de región y crecen en cada frame
+            comenzar_frame(self.ctx.profiler)
+            self.simular() # A 60 FPS, un paso de simulación por frame
+            self.render()
+            terminar_frame(self.ctx.profiler)
+        glFinish()
+        medidas, self.post.diff = self.post.diff[fps // 2:], None # Sin el arranque (historia vacía)
+        cfg.update(guardado)
+
+        psnr = [10 * np.log10(m["pico"] ** 2 / m["mse"]) if m["mse"] > 0 else np.inf for m in medidas]
+        relativo = [m["relativo"] for m in medidas]
+        golpes = [m["relativo"] for m in medidas if m["golpe"]]
+        res = {
+            "relativo_medio": float(np.mean(relativo)),
+            "relativo_max": float(np.max(relativo)),
+            "psnr_medio": float(np.mean(np.minimum(psnr, 100.0))),
+            "psnr_min": float(np.min(psnr)),
+        }
+        print(f"📊 Bloom temporal (cadencia {cadencia}) vs tasa completa, {len(medidas)} frames")
+        print(f"   Error relativo: medio {res['relativo_medio'] * 100:.2f}% | máx {res['relativo_max'] * 100:.2f}%")
+        print(f"   PSNR: medio {res['psnr_medio']:.1f} dB | mínimo {res['psnr_min']:.1f} dB")
+        if golpes:
+            print(f"   Frames con golpe ({len(golpes)}): error medio {np.mean(golpes) * 100:.2f}%")
+        return res
 
 class StarField:
     """
@@ -230,6 +308,8 @@ class StarField:
         self.keys = keys # Diccionario con las claves de configuración
         self.palette_slot = palette_slot # 0 o 1, índice dentro de la paleta
         self.energy_attr = energy_attr # Nombre del atributo en ctx ('bass_energy' o 'high_energy')
+        # La energía viaja en FrameData; el shader solo necesita saber cuál usar
+        self.fuente = 0 if energy_attr == "bass_energy" else 1
         
         # Inicializar color actual para transiciones suaves
         idx_paleta = int(self.ctx.ui.config.get("palette_index", 0))
@@ -245,72 +325,50 @@ class StarField:
             return
 
         # Ubicaciones de uniforms
-        self.u_proj_loc = glGetUniformLocation(self.program, "u_projection")
-        self.u_view_loc = glGetUniformLocation(self.program, "u_view")
-        self.u_bass_loc = glGetUniformLocation(self.program, "u_bass_energy")
+        self.u_fuente_loc = shaders.get_uniform_location(self.program, "u_fuente")
         
         # Nuevos uniforms para control desde UI
-        self.u_base_size_loc = glGetUniformLocation(self.program, "u_base_size")
-        self.u_audio_scale_loc = glGetUniformLocation(self.program, "u_audio_scale")
-        self.u_brightness_loc = glGetUniformLocation(self.program, "u_brightness")
-        self.u_threshold_loc = glGetUniformLocation(self.program, "u_threshold")
-        self.u_max_size_loc = glGetUniformLocation(self.program, "u_max_size")
-        self.u_min_r_loc = glGetUniformLocation(self.program, "u_min_radius")
-        self.u_max_r_loc = glGetUniformLocation(self.program, "u_max_radius")
-        self.u_color_loc = glGetUniformLocation(self.program, "u_color")
+        self.u_base_size_loc = shaders.get_uniform_location(self.program, "u_base_size")
+        self.u_audio_scale_loc = shaders.get_uniform_location(self.program, "u_audio_scale")
+        self.u_brightness_loc = shaders.get_uniform_location(self.program, "u_brightness")
+        self.u_threshold_loc = shaders.get_uniform_location(self.program, "u_threshold")
+        self.u_max_size_loc = shaders.get_uniform_location(self.program, "u_max_size")
+        self.u_min_r_loc = shaders.get_uniform_location(self.program, "u_min_radius")
+        self.u_max_r_loc = shaders.get_uniform_location(self.program, "u_max_radius")
+        self.u_color_loc = shaders.get_uniform_location(self.program, "u_color")
         
-        # Rango de generación
-        # X e Y cubren un área amplia para que al acercarse pasen por los lados
-        self.range_x = 60.0 
-        self.range_y = 40.0
-        self.min_z = -150.0 # Muy lejos
-        self.max_z = -5.0   # Un poco lejos
-
         # --- Configuración OpenGL (VAO/VBO) ---
         self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-        
-        self.vbo = glGenBuffers(1)
+        # La simulación vive en self.sim (CPU, paso fijo); cada frame se copia
+        # interpolada a una región del buffer de streaming (crece solo si
+        # aumenta NUM_PARTICULAS).
+        self.stream = StreamingBuffer(4, max(1, self.num_stars), self._configurar_vao, "estrellas")
+        self.primera = 0
 
         # Inicialización de datos
+        self.sim = EstadoEstrellas()
         self._init_star_data()
-        
-        # IMPORTANTE: _init_star_data desvincula el buffer al terminar.
-        # Debemos volver a vincularlo para que glVertexAttribPointer sepa a qué buffer referirse.
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        
+
+    def _configurar_vao(self, vbo):
+        estado.bind_vao(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
         # Atributo 0: Posición (vec3). 
         # NOTA: Ahora enviamos 4 floats (x,y,z,speed) pero el shader lee vec3 (x,y,z).
         # El stride cambia a 4 * 4 bytes = 16 bytes.
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 4 * 4, ctypes.c_void_p(0))
         glEnableVertexAttribArray(0)
-        
-        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _velocidades(self):
+        cfg = self.ctx.ui.config
+        return cfg[self.keys["vmin"]] * 0.01, cfg[self.keys["vmax"]] * 0.01 # Escalar valores de UI
 
     def _init_star_data(self):
         """Genera o regenera el array de estrellas."""
-        # Array numpy: [x, y, z, speed]
-        self.stars = np.zeros((self.num_stars, 4), dtype=np.float32)
-        
-        cfg = self.ctx.ui.config
-        v_min = cfg[self.keys["vmin"]] * 0.01 # Escalar valores de UI
-        v_max = cfg[self.keys["vmax"]] * 0.01
-
-        for i in range(self.num_stars):
-            self.stars[i] = [
-                random.uniform(-self.range_x, self.range_x),
-                random.uniform(-self.range_y, self.range_y),
-                random.uniform(self.min_z, self.max_z),
-                random.uniform(v_min, v_max) # Velocidad individual
-            ]
-        
-        # Subir datos iniciales al buffer
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.stars.nbytes, self.stars, GL_DYNAMIC_DRAW)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.sim.reiniciar(self.num_stars, *self._velocidades())
 
-    def update(self):
-        """Mueve las estrellas y recicla las que salen de cámara."""
+    def paso(self):
+        """Un paso de simulación: mueve las estrellas y acerca el color a la paleta."""
         cfg = self.ctx.ui.config
         
         # Verificar si cambió el número de partículas
@@ -318,61 +376,31 @@ class StarField:
         if target_num != self.num_stars:
             self.num_stars = target_num
             self._init_star_data()
-            return # Salir por este frame
+            return # Arrancan en su lugar en este paso
 
-        # Mover todas las estrellas en Z usando su velocidad individual (columna 3)
-        self.stars[:, 2] += self.stars[:, 3]
-        
-        # Detectar estrellas que pasaron la cámara
-        # Usamos una máscara booleana de Numpy para eficiencia
-        out_of_bounds = self.stars[:, 2] > 1.0
-        
-        # Contar cuántas hay que reciclar
-        count = np.sum(out_of_bounds)
-        
-        if count > 0:
-            v_min = cfg[self.keys["vmin"]] * 0.01
-            v_max = cfg[self.keys["vmax"]] * 0.01
-            
-            # Generar nuevas posiciones aleatorias solo para las que salieron
-            self.stars[out_of_bounds, 0] = np.random.uniform(-self.range_x, self.range_x, count) # X
-            self.stars[out_of_bounds, 1] = np.random.uniform(-self.range_y, self.range_y, count) # Y
-            self.stars[out_of_bounds, 2] = np.random.uniform(self.min_z, self.min_z + 10.0, count) # Z (Fondo)
-            
-            # Asignar nueva velocidad aleatoria
-            self.stars[out_of_bounds, 3] = np.random.uniform(v_min, v_max, count)
-
-        # Actualizar VBO en GPU
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        # glBufferSubData es más rápido para actualizaciones parciales, 
-        # pero aquí actualizamos todo el array por simplicidad y porque Numpy es rápido.
-        glBufferSubData(GL_ARRAY_BUFFER, 0, self.stars.nbytes, self.stars)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.sim.paso(*self._velocidades())
 
-    def render(self, proj_matrix, view_matrix, min_r=0.0, max_r=1000.0):
-        if not self.program: return
-        
-        cfg = self.ctx.ui.config
-        
-        # Obtener color objetivo de la paleta activa
+        # Interpolación lineal (Lerp) para suavizar el cambio de color
+        # (antes 0.02 por dibujo, dos dibujos por frame: fondo y frente)
         idx_paleta = int(cfg.get("palette_index", 0))
         target_color = self.ctx.ui.paletas[idx_paleta][self.palette_slot + 1]
+        lerp_speed = 0.040
+        self.current_color = tuple(c + (t - c) * lerp_speed for c, t in zip(self.current_color, target_color))
 
-        # Interpolación lineal (Lerp) para suavizar el cambio de color
-        lerp_speed = 0.020
-        self.current_color = (
-            self.current_color[0] + (target_color[0] - self.current_color[0]) * lerp_speed,
-            self.current_color[1] + (target_color[1] - self.current_color[1]) * lerp_speed,
-            self.current_color[2] + (target_color[2] - self.current_color[2]) * lerp_speed
-        )
+    def update(self, alfa):
+        """Copia las estrellas, interpoladas entre los dos últimos pasos, a la región de este frame."""
+        destino, self.primera = self.stream.reservar(self.num_stars)
+        self.sim.interpoladas(alfa, destino)
+        self.stream.confirmar()
 
-        glUseProgram(self.program)
-        glUniformMatrix4fv(self.u_proj_loc, 1, GL_FALSE, proj_matrix)
-        glUniformMatrix4fv(self.u_view_loc, 1, GL_FALSE, view_matrix)
+    def render(self, min_r=0.0, max_r=1000.0):
+        if not self.program: return
         
-        # Pasar la energía correcta (graves o agudos)
-        energy_val = getattr(self.ctx, self.energy_attr)
-        glUniform1f(self.u_bass_loc, energy_val)
+        cfg = self.ctx.ui.config
+
+        estado.use_program(self.program)
+        # Los dos campos comparten programa: indicar qué energía del frame usar
+        glUniform1i(self.u_fuente_loc, self.fuente)
         
         # Pasar uniforms de configuración
         glUniform1f(self.u_base_size_loc, float(cfg[self.keys["size"]]))
@@ -385,10 +413,9 @@ class StarField:
         glUniform3f(self.u_color_loc, *self.current_color)
 
         # Habilitar Point Size para que el shader pueda cambiar el tamaño
-        glEnable(GL_PROGRAM_POINT_SIZE)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE) # Aditivo para brillo
+        estado.enable(GL_PROGRAM_POINT_SIZE)
+        estado.enable(GL_BLEND)
+        estado.blend_func(GL_SRC_ALPHA, GL_ONE) # Aditivo para brillo
         
-        glBindVertexArray(self.vao)
-        glDrawArrays(GL_POINTS, 0, self.num_stars)
-        glBindVertexArray(0)
\ No newline at end of file
+        estado.bind_vao(self.vao)
+        glDrawArrays(GL_POINTS, self.primera, self.num_stars)
\ No newline at end of file
@@ -3,20 +3,166 @@
 # Gestión de Shaders
 # ============================================================================
 # Carga, compila y enlaza los shaders de GLSL para crear un programa de GPU.
+#
+# Caché de programas:
+# - En memoria: clave = hash del código fuente (vertex + fragment). Pedir dos
+#   veces el mismo par devuelve el mismo programa (con conteo de referencias).
+#   Cada etapa compilada también se reutiliza (ej. post.vert en 3 programas).
+# - En disco: el binario de glGetProgramBinary se guarda en
+#   .cache/shaders/<driver>/<hash>.bin. La carpeta depende del fabricante,
+#   renderer y versión del driver; si el driver rechaza el binario se
+#   recompila desde el código fuente y se reescribe.
+#
+# Todo programa que declare el bloque 'FrameData' (ver frame_data.py) queda
+# enlazado al punto BLOQUE_FRAME_BINDING al cargarse.
 # ============================================================================
 
+import hashlib
+import os
+import struct
+import time
+import numpy as np
 from OpenGL.GL import *
-from GestorDeRecursos import resource_path
+from GestorDeRecursos import resource_path, cache_path
+
+_programas = {}  # hash fuente -> {'id', 'refs', 'nombre'}
+_por_id = {}     # id programa -> hash fuente
+_etapas = {}     # (tipo, hash etapa) -> id shader compilado
+_uniforms = {}   # (id programa, nombre) -> location
+
+# Tiempo de obtención por programa: nombre -> (modo, ms). modo: compilado | binario | compartido
+estadisticas = {}
+
+_driver = None   # Carpeta de la caché en disco (None = sin soporte de binarios)
+_BIN_HEADER = struct.Struct("<I") # Formato del binario (GLenum)
+
+BLOQUE_FRAME = "FrameData"
+BLOQUE_FRAME_BINDING = 0
+
+def _hash(*partes):
+    h = hashlib.sha1()
+    for p in partes:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _carpeta_driver():
+    """Subcarpeta de caché según el driver, o '' si no hay binarios disponibles."""
+    global _driver
+    if _driver is None:
+        _driver = ""
+        try:
+            if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0:
+                info = [(glGetString(e) or b"").decode(errors="replace")
+                        for e in (GL_VENDOR, GL_RENDERER, GL_VERSION)]
+                _driver = _hash(*info)[:16]
+        except Exception:
+            pass # Contexto sin ARB_get_program_binary: siempre compilamos
+    return _driver
+
+def _compilar_etapa(tipo, fuente, etiqueta):
+    clave = (tipo, _hash(fuente))
+    if clave in _etapas:
+        return _etapas[clave]
+    shader = glCreateShader(tipo)
+    glShaderSource(shader, fuente)
+    glCompileShader(shader)
+    # Comprobar errores de compilación
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        error = glGetShaderInfoLog(shader).decode()
+        print(f"Error de compilación en {etiqueta}:\n{error}")
+        glDeleteShader(shader)
+        return None
+    _etapas[clave] = shader
+    return shader
+
+def _compilar_programa(vertex_src, fragment_src):
+    # --- Compilar Vertex / Fragment Shader (reutilizando etapas ya compiladas) ---
+    vertex_shader = _compilar_etapa(GL_VERTEX_SHADER, vertex_src, "Vertex Shader")
+    if vertex_shader is None:
+        return None
+    fragment_shader = _compilar_etapa(GL_FRAGMENT_SHADER, fragment_src, "Fragment Shader")
+    if fragment_shader is None:
+        return None
+
+    # --- Enlazar Shaders en un Programa ---
+    shader_program = glCreateProgram()
+    if _carpeta_driver():
+        glProgramParameteri(shader_program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+    glAttachShader(shader_program, vertex_shader)
+    glAttachShader(shader_program, fragment_shader)
+    glLinkProgram(shader_program)
+    # Comprobar errores de enlazado
+    if not glGetProgramiv(shader_program, GL_LINK_STATUS):
+        error = glGetProgramInfoLog(shader_program).decode()
+        print(f"Error de enlazado del programa de shaders:\n{error}")
+        glDeleteProgram(shader_program)
+        return None
+
+    # Una vez enlazado, las etapas pueden desacoplarse (siguen en caché para otros programas)
+    glDetachShader(shader_program, vertex_shader)
+    glDetachShader(shader_program, fragment_shader)
+    return shader_program
+
+def _ruta_binario(clave):
+    return cache_path(os.path.join("shaders", _carpeta_driver(), clave + ".bin"))
+
+def _cargar_binario(clave):
+    """Crea el programa desde el binario en disco. None si no existe o el driver lo rechaza."""
+    if not _carpeta_driver():
+        return None
+    ruta = _ruta_binario(clave)
+    if not os.path.exists(ruta):
+        return None
+    programa = None
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        formato, = _BIN_HEADER.unpack_from(datos)
+        binario = np.frombuffer(datos, dtype=np.uint8, offset=_BIN_HEADER.size)
+        programa = glCreateProgram()
+        glProgramBinary(programa, formato, binario, len(binario))
+        if glGetProgramiv(programa, GL_LINK_STATUS):
+            return programa
+    except Exception as e:
+        print(f"⚠️ Binario de shader inválido ({e}).")
+    if programa:
+        glDeleteProgram(programa) # Si no, cada arranque con un binario viejo pierde un programa
+    # Rechazado (driver actualizado, archivo corrupto...): se recompila y reescribe
+    return None
+
+def _guardar_binario(clave, programa):
+    if not _carpeta_driver():
+        return
+    try:
+        largo = int(glGetProgramiv(programa, GL_PROGRAM_BINARY_LENGTH))
+        if largo <= 0:
+            return
+        binario = np.empty(largo, dtype=np.uint8)
+        escrito = np.zeros(1, dtype=np.int32)
+        formato = np.zeros(1, dtype=np.uint32)
+        glGetProgramBinary(programa, largo, escrito, formato, binario)
+        ruta = _ruta_binario(clave)
+        tmp = ruta + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_BIN_HEADER.pack(int(formato[0])))
+            f.write(binario[:int(escrito[0])].tobytes())
+        os.replace(tmp, ruta)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el binario del shader: {e}")
 
 def load_shader_program(vertex_path, fragment_path):
     """
     Carga los shaders, los compila y los enlaza en un programa.
+    Si el mismo código fuente ya se cargó, devuelve el programa existente
+    (hay que liberarlo con release_program, no con glDeleteProgram).
     Args:
         vertex_path (str): Ruta al archivo del vertex shader.
         fragment_path (str): Ruta al archivo del fragment shader.
     Returns:
         int: El ID del programa de shader enlazado.
     """
+    nombre = f"{os.path.basename(vertex_path)}+{os.path.basename(fragment_path)}"
     # Procesar rutas con GestorDeRecursos para compatibilidad con PyInstaller
     vertex_path = resource_path(vertex_path)
     fragment_path = resource_path(fragment_path)
@@ -31,41 +177,66 @@ def load_shader_program(vertex_path, fragment_path):
         print(f"Error: No se pudo encontrar el archivo de shader: {e}")
         return None
 
-    # --- Compilar Vertex Shader ---
-    vertex_shader = glCreateShader(GL_VERTEX_SHADER)
-    glShaderSource(vertex_shader, vertex_src)
-    glCompileShader(vertex_shader)
-    # Comprobar errores de compilación
-    if not glGetShaderiv(vertex_shader, GL_COMPILE_STATUS):
-        error = glGetShaderInfoLog(vertex_shader).decode()
-        print(f"Error de compilación en Vertex Shader:\n{error}")
-        return None
+    inicio = time.perf_counter()
+    clave = _hash(vertex_src, fragment_src)
 
-    # --- Compilar Fragment Shader ---
-    fragment_shader = glCreateShader(GL_FRAGMENT_SHADER)
-    glShaderSource(fragment_shader, fragment_src)
-    glCompileShader(fragment_shader)
-    # Comprobar errores de compilación
-    if not glGetShaderiv(fragment_shader, GL_COMPILE_STATUS):
-        error = glGetShaderInfoLog(fragment_shader).decode()
-        print(f"Error de compilación en Fragment Shader:\n{error}")
-        return None
+    # 1. Mismo código fuente ya cargado: compartimos el programa
+    entrada = _programas.get(clave)
+    if entrada is not None:
+        entrada['refs'] += 1
+        _reportar(nombre, "compartido", inicio)
+        return entrada['id']
 
-    # --- Enlazar Shaders en un Programa ---
-    shader_program = glCreateProgram()
-    glAttachShader(shader_program, vertex_shader)
-    glAttachShader(shader_program, fragment_shader)
-    glLinkProgram(shader_program)
-    # Comprobar errores de enlazado
-    if not glGetProgramiv(shader_program, GL_LINK_STATUS):
-        error = glGetProgramInfoLog(shader_program).decode()
-        print(f"Error de enlazado del programa de shaders:\n{error}")
-        return None
+    # 2. Binario en disco de una ejecución anterior
+    modo = "binario"
+    shader_program = _cargar_binario(clave)
+
+    # 3. Compilación completa
+    if shader_program is None:
+        modo = "compilado"
+        shader_program = _compilar_programa(vertex_src, fragment_src)
+        if shader_program is None:
+            return None
+        _guardar_binario(clave, shader_program)
+
+    _vincular_bloques(shader_program)
+    _programas[clave] = {'id': shader_program, 'refs': 1, 'nombre': nombre}
+    _por_id[shader_program] = clave
+    _reportar(nombre, modo, inicio)
+    return shader_program
+
+def _vincular_bloques(programa):
+    """Enlaza el bloque de datos por frame (si el programa lo declara)."""
+    indice = glGetUniformBlockIndex(programa, BLOQUE_FRAME)
+    if indice != GL_INVALID_INDEX:
+        glUniformBlockBinding(programa, indice, BLOQUE_FRAME_BINDING)
+
+def _reportar(nombre, modo, inicio):
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    estadisticas[nombre] = (modo, duracion_ms)
+    print(f"Shader '{nombre}': {modo} en {duracion_ms:.1f}ms")
 
-    # --- Limpieza ---
-    # Una vez enlazados, los shaders individuales ya no son necesarios.
-    glDeleteShader(vertex_shader)
-    glDeleteShader(fragment_shader)
+def get_uniform_location(program, name):
+    """glGetUniformLocation con caché por (programa, nombre)."""
+    clave = (program, name)
+    loc = _uniforms.get(clave)
+    if loc is None:
+        loc = glGetUniformLocation(program, name)
+        _uniforms[clave] = loc
+    return loc
 
-    print("Shaders compilados y enlazados correctamente.")
-    return shader_program
\ No newline at end of file
+def release_program(program):
+    """Suelta una referencia; el programa se borra cuando nadie más lo usa."""
+    clave = _por_id.get(program)
+    if clave is None:
+        glDeleteProgram(program)
+        return
+    entrada = _programas[clave]
+    entrada['refs'] -= 1
+    if entrada['refs'] > 0:
+        return
+    del _programas[clave]
+    del _por_id[program]
+    for k in [k for k in _uniforms if k[0] == program]:
+        del _uniforms[k]
+    glDeleteProgram(program)
@@ -0,0 +1,122 @@
+# render/simulacion.py
+# ============================================================================
+# Simulación a Paso Fijo (sin OpenGL)
+# ============================================================================
+# Estado que avanza en cada paso de core.time.PasoFijo (60 Hz) y se
+# interpola al dibujar con el alfa del frame:
+#
+# - EstadoEstrellas: posiciones de un campo de estrellas (Z anterior y
+#   actual; las recicladas no se interpolan, aparecen en su lugar nuevo).
+# - suavizar(): ataque/caída de la energía que mueve el modelo.
+# - GIRO_POR_PASO: rotación del túnel por paso.
+#
+# Prueba de independencia de FPS (mismas posiciones a 30, 60, 144 y 48 FPS):
+#   python -m render.simulacion
+# ============================================================================
+
+import numpy as np
+from core.time import PasoFijo
+
+GIRO_POR_PASO = 0.008 # Rotación del túnel por paso (antes, por frame a 60 FPS)
+
+def interpolar(anterior, actual, alfa):
+    return anterior + (actual - anterior) * alfa
+
+def suavizar(actual, objetivo, ataque, caida):
+    """Lerp rápido hacia los picos de energía y lento de vuelta (un paso)."""
+    factor = ataque if objetivo > actual else caida
+    return actual * (1.0 - factor) + objetivo * factor
+
+class EstadoEstrellas:
+    # Rango de generación
+    # X e Y cubren un área amplia para que al acercarse pasen por los lados
+    RANGO_X = 60.0
+    RANGO_Y = 40.0
+    MIN_Z = -150.0 # Muy lejos
+    MAX_Z = -5.0   # Un poco lejos
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.stars = np.zeros((0, 4), dtype=np.float32) # [x, y, z, speed]
+        self.z_anterior = np.zeros(0, dtype=np.float32)
+
+    def reiniciar(self, n, v_min, v_max):
+        """Genera n estrellas repartidas en todo el volumen."""
+        self.stars = np.empty((n, 4), dtype=np.float32)
+        self.stars[:, 0] = self.rng.uniform(-self.RANGO_X, self.RANGO_X, n)
+        self.stars[:, 1] = self.rng.uniform(-self.RANGO_Y, self.RANGO_Y, n)
+        self.stars[:, 2] = self.rng.uniform(self.MIN_Z, self.MAX_Z, n)
+        self.stars[:, 3] = self.rng.uniform(v_min, v_max, n) # Velocidad individual (por paso)
+        self.z_anterior = self.stars[:, 2].copy()
+
+    def paso(self, v_min, v_max):
+        """Mueve las estrellas un paso y recicla las que pasaron la cámara."""
+        np.copyto(self.z_anterior, self.stars[:, 2])
+        # Mover todas las estrellas en Z usando su velocidad individual (columna 3)
+        self.stars[:, 2] += self.stars[:, 3]
+
+        # Detectar estrellas que pasaron la cámara
+        out_of_bounds = self.stars[:, 2] > 1.0
+        count = int(np.count_nonzero(out_of_bounds))
+        if count > 0:
+            # Nuevas posiciones al fondo y nueva velocidad, solo para las que salieron
+            self.stars[out_of_bounds, 0] = self.rng.uniform(-self.RANGO_X, self.RANGO_X, count)
+            self.stars[out_of_bounds, 1] = self.rng.uniform(-self.RANGO_Y, self.RANGO_Y, count)
+            self.stars[out_of_bounds, 2] = self.rng.uniform(self.MIN_Z, self.MIN_Z + 10.0, count)
+            self.stars[out_of_bounds, 3] = self.rng.uniform(v_min, v_max, count)
+            self.z_anterior[out_of_bounds] = self.stars[out_of_bounds, 2]
+
+    def interpoladas(self, alfa, destino):
+        """Escribe en 'destino' (n, 4) las estrellas en la posición del frame."""
+        destino[:] = self.stars
+        destino[:, 2] = interpolar(self.z_anterior, self.stars[:, 2], alfa)
+
+# ============================================================================
+# Prueba: mismas posiciones a cualquier tasa de frames
+# ============================================================================
+def _simular(fps, segundos, muestras_por_segundo, semilla=0):
+    """Corre la simulación con frames de 1/fps y devuelve lo dibujado en los instantes comunes."""
+    reloj = PasoFijo()
+    estrellas = EstadoEstrellas(np.random.default_rng(semilla))
+    estrellas.reiniciar(500, 0.05, 0.6)
+    giro_anterior = giro = 0.0
+    energia_anterior = energia = 0.0
+    dibujado = np.empty_like(estrellas.stars)
+    muestras = []
+    paso = 0
+    for frame in range(1, segundos * fps + 1):
+        for _ in range(reloj.acumular(1.0 / fps)):
+            giro_anterior, giro = giro, giro + GIRO_POR_PASO
+            # Energía de graves sintética, función del paso (no del frame)
+            objetivo = 1.0 if paso % 30 < 3 else 0.0
+            paso += 1
+            energia_anterior, energia = energia, suavizar(energia, objetivo, 0.1, 0.05)
+            estrellas.paso(0.05, 0.6)
+        if frame % (fps // muestras_por_segundo) == 0:
+            estrellas.interpoladas(reloj.alfa, dibujado)
+            muestras.append((paso, interpolar(giro_anterior, giro, reloj.alfa),
+                             interpolar(energia_anterior, energia, reloj.alfa), dibujado.copy()))
+    return muestras
+
+def comprobar(tasas=(30, 60, 144), segundos=5):
+    """
+    Compara lo dibujado en los instantes que comparten todas las tasas
+    (cada 1/mcd(tasas) s). Con 30/60/144 caen justo en un paso; 48 contra
+    144 cae a 1/4, 1/2 y 3/4 de paso y prueba la interpolación.
+    """
+    for grupo in (tasas, (48, 144)):
+        mps = int(np.gcd.reduce(grupo))
+        referencia = _simular(grupo[0], segundos, mps)
+        for fps in grupo[1:]:
+            for i, (ref, otra) in enumerate(zip(referencia, _simular(fps, segundos, mps)), start=1):
+                t = i / mps
+                assert ref[0] == otra[0], f"{fps} FPS: {otra[0]} pasos en {t:.3f}s (esperados {ref[0]})"
+                assert np.isclose(ref[1], otra[1]) and np.isclose(ref[2], otra[2]), \
+                    f"{fps} FPS: giro/energía distintos en {t:.3f}s"
+                assert np.allclose(ref[3], otra[3], atol=1e-4), f"{fps} FPS: estrellas distintas en {t:.3f}s"
+        print(f"✅ Simulación a paso fijo: mismas posiciones a {', '.join(map(str, grupo))} FPS "
+              f"({len(referencia)} instantes en {segundos}s, {referencia[-1][0]} pasos, "
+              f"{len(referencia[-1][3])} estrellas)")
+
+if __name__ == "__main__":
+    comprobar()
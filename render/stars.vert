@@ -6,9 +6,16 @@
 layout (location = 0) in vec3 a_pos;
 
 // Uniforms (Variables globales)
-uniform mat4 u_projection;
-uniform mat4 u_view;
-uniform float u_bass_energy; // Energía de graves (0.0 a 1.0)
+layout(std140) uniform FrameData { // Datos por frame compartidos (ver frame_data.py)
+    mat4 u_projection;
+    mat4 u_view;
+    float u_time;
+    float u_bass_energy;
+    float u_high_energy;
+    float u_energy;
+    float u_escala_render;
+};
+uniform int u_fuente;        // 0 = graves, 1 = agudos (qué energía del frame usa este campo)
 uniform float u_base_size;   // Tamaño base desde UI
 uniform float u_audio_scale; // Factor de escala por audio
 uniform float u_threshold;   // Umbral mínimo de energía para reaccionar
@@ -29,15 +36,17 @@ void main() {
     float base_size = u_base_size; 
     // 2. Perspectiva: Inversamente proporcional a la profundidad (gl_Position.w)
     float perspective_scale = base_size / gl_Position.w;
-    // 3. Reactividad al Audio: Crece con los graves
-    float energy_reaction = max(0.0, u_bass_energy - u_threshold);
+    // 3. Reactividad al Audio: Crece con la energía de su banda
+    float energia = (u_fuente == 0) ? u_bass_energy : u_high_energy;
+    float energy_reaction = max(0.0, energia - u_threshold);
     float audio_scale = 1.0 + energy_reaction * u_audio_scale;
 
     float calculated_size = perspective_scale * audio_scale;
-    gl_PointSize = min(calculated_size, u_max_size);
+    // Tamaños en píxeles de la ventana: a menor resolución de render, puntos más chicos
+    gl_PointSize = min(calculated_size, u_max_size) * u_escala_render;
 
     // Pasar la energía al fragment shader para el brillo
-    v_bass_energy = u_bass_energy;
+    v_bass_energy = energia;
     
     // Filtrado por radio (Cilindro) para separar capas
     float radius = length(a_pos.xy);
@@ -0,0 +1,208 @@
+# render/streaming.py
+# ============================================================================
+# Buffers de Streaming (vértices dinámicos por frame)
+# ============================================================================
+# Las estrellas, la UI y las copias instanciadas del modelo reescriben sus
+# vértices en cada frame. Si se escribe sobre memoria que la GPU todavía
+# está leyendo (frame anterior), el driver tiene que esperar.
+# StreamingBuffer evita esa espera:
+#
+# - Con ARB_buffer_storage: el buffer se mapea una sola vez (persistente y
+#   coherente) y se divide en N regiones, una por frame en vuelo. Al terminar
+#   cada frame se inserta un fence; antes de reutilizar una región se espera
+#   su fence (normalmente ya pasó: la espera solo ocurre si la GPU va N
+#   frames atrasada, y se cuenta como 'stall').
+# - Sin esa extensión: se escribe con glMapBufferRange(UNSYNCHRONIZED) en
+#   zonas nuevas del buffer y, cuando se llena, se hace orphaning
+#   (glBufferData con None) para que el driver entregue memoria nueva.
+#
+# En ambos casos reservar(n) devuelve un array de NumPy que apunta a la
+# memoria mapeada: se escribe directo ahí, sin copia intermedia.
+#
+# Métricas por frame en el profiler: stream_bytes, stream_esperas,
+# stream_espera_ms y stream_huerfanos.
+# ============================================================================
+
+import ctypes
+import time
+import numpy as np
+from OpenGL.GL import *
+from .gl_state import estado
+
+_persistente = None # Se detecta con el primer buffer (requiere contexto GL)
+
+def _soporta_persistente():
+    global _persistente
+    if _persistente is None:
+        try:
+            from OpenGL.GL.ARB.buffer_storage import glInitBufferStorageARB
+            _persistente = bool(glInitBufferStorageARB())
+        except Exception:
+            _persistente = False
+        modo = "mapeo persistente" if _persistente else "orphaning + mapeo no sincronizado"
+        print(f"🔁 Buffers de streaming: {modo}")
+    return _persistente
+
+def _direccion(ptr):
+    """PyOpenGL devuelve el puntero mapeado como int o como c_void_p según la versión."""
+    return ptr if isinstance(ptr, int) else ctypes.cast(ptr, ctypes.c_void_p).value
+
+class AnilloFrames:
+    """Fences por región y contadores, compartidos por todos los StreamingBuffer."""
+    def __init__(self, regiones=3):
+        self.regiones = regiones
+        self.frame = 0
+        self.fences = [None] * regiones
+        self.esperado = False # Si ya se sincronizó la región de este frame
+        self.bytes = 0
+        self.esperas = 0
+        self.espera_ms = 0.0
+        self.huerfanos = 0
+
+    @property
+    def region(self):
+        return self.frame % self.regiones
+
+    def asegurar_region(self):
+        """Espera (una vez por frame) a que la GPU libere la región actual."""
+        if self.esperado:
+            return
+        self.esperado = True
+        fence = self.fences[self.region]
+        if fence is None:
+            return
+        if glClientWaitSync(fence, 0, 0) == GL_TIMEOUT_EXPIRED:
+            # La GPU va 'regiones' frames atrasada: esta espera es un stall real
+            inicio = time.perf_counter()
+            glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1_000_000_000) # 1s máx.
+            self.esperas += 1
+            self.espera_ms += (time.perf_counter() - inicio) * 1000
+        glDeleteSync(fence)
+        self.fences[self.region] = None
+
+    def fin_frame(self, profiler=None):
+        """Cierra el frame: fence de la región usada, métricas y avance del anillo."""
+        if self.esperado:
+            self.fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        if profiler:
+            profiler.records["stream_bytes"] = self.bytes
+            profiler.records["stream_esperas"] = self.esperas
+            profiler.records["stream_espera_ms"] = self.espera_ms
+            profiler.records["stream_huerfanos"] = self.huerfanos
+        self.bytes = 0
+        self.esperas = 0
+        self.espera_ms = 0.0
+        self.huerfanos = 0
+        self.esperado = False
+        self.frame += 1
+
+anillo = AnilloFrames()
+
+# Contabilidad de cada frame (loop principal y pruebas offscreen que renderizan varios)
+def comenzar_frame(profiler=None):
+    """Inicio del frame: el caché de estado GL arranca de cero (las subidas hacen binds directos)."""
+    estado.nuevo_frame(profiler)
+
+def terminar_frame(profiler=None):
+    """Fin del frame: fence de las regiones de streaming usadas y avance del anillo."""
+    anillo.fin_frame(profiler)
+
+class StreamingBuffer:
+    def __init__(self, floats_por_vertice, capacidad, configurar, nombre="stream"):
+        """
+        Args:
+            floats_por_vertice (int): Floats de cada vértice (stride = 4 * floats).
+            capacidad (int): Vértices por frame; crece sola si no alcanza.
+            configurar (callable): Recibe el id del VBO y arma los punteros de
+                atributos del VAO. Se llama al crear y cada vez que el buffer crece.
+            nombre (str): Para los mensajes de log.
+        """
+        self.floats = floats_por_vertice
+        self.stride = floats_por_vertice * 4
+        self.configurar = configurar
+        self.nombre = nombre
+        self.persistente = _soporta_persistente()
+        self.vbo = None
+        self.memoria = None # Vista uint8 de todo el buffer mapeado (modo persistente)
+        self.cursor = 0     # Bytes usados (en la región del frame o en todo el buffer)
+        self.frame = -1
+        self._mapeado = False
+        self._crear(capacidad)
+
+    def _crear(self, capacidad):
+        if self.vbo is not None:
+            # El driver libera la memoria vieja cuando la GPU termine de leerla
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            if self.persistente:
+                glUnmapBuffer(GL_ARRAY_BUFFER)
+            glDeleteBuffers(1, [self.vbo])
+            print(f"🔁 {self.nombre}: buffer de streaming ampliado a {capacidad} vértices/frame")
+
+        self.capacidad = capacidad
+        self.tam_region = capacidad * self.stride
+        total = self.tam_region * anillo.regiones
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if self.persistente:
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+            glBufferStorage(GL_ARRAY_BUFFER, total, None, flags)
+            ptr = _direccion(glMapBufferRange(GL_ARRAY_BUFFER, 0, total, flags))
+            self.memoria = np.frombuffer((ctypes.c_ubyte * total).from_address(ptr), dtype=np.uint8)
+        else:
+            glBufferData(GL_ARRAY_BUFFER, total, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.cursor = 0
+        self.frame = -1
+        self.configurar(self.vbo)
+
+    def reservar(self, n):
+        """
+        Reserva n vértices para este frame.
+        Returns:
+            tuple: (array float32 de (n, floats) sobre la memoria mapeada,
+                    índice del primer vértice para glDrawArrays).
+        """
+        if n > self.capacidad:
+            self._crear(max(n, self.capacidad * 2))
+        if n == 0:
+            return np.empty((0, self.floats), dtype=np.float32), 0
+
+        nbytes = n * self.stride
+        if self.persistente:
+            anillo.asegurar_region()
+            if self.frame != anillo.frame:
+                self.frame = anillo.frame
+                self.cursor = 0
+            if self.cursor + nbytes > self.tam_region:
+                # Más de 'capacidad' vértices en el mismo frame (varias reservas)
+                self._crear(self.capacidad * 2)
+                return self.reservar(n)
+            inicio = anillo.region * self.tam_region + self.cursor
+            vista = self.memoria[inicio:inicio + nbytes]
+        else:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            if self.cursor + nbytes > self.tam_region * anillo.regiones:
+                # Orphaning: memoria nueva sin esperar a los draws pendientes
+                glBufferData(GL_ARRAY_BUFFER, self.tam_region * anillo.regiones, None, GL_STREAM_DRAW)
+                self.cursor = 0
+                anillo.huerfanos += 1
+            inicio = self.cursor
+            flags = GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+            ptr = _direccion(glMapBufferRange(GL_ARRAY_BUFFER, inicio, nbytes, flags))
+            vista = np.frombuffer((ctypes.c_ubyte * nbytes).from_address(ptr), dtype=np.uint8)
+            self._mapeado = True
+
+        self.cursor += nbytes
+        anillo.bytes += nbytes
+        datos = vista.view(np.float32).reshape(n, self.floats)
+        return datos, inicio // self.stride
+
+    def confirmar(self):
+        """Termina la escritura antes de dibujar (desmapea en el modo sin persistencia)."""
+        if self._mapeado:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glUnmapBuffer(GL_ARRAY_BUFFER)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self._mapeado = False
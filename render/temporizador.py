@@ -0,0 +1,97 @@
+# render/temporizador.py
+# ============================================================================
+# Temporizadores de GPU (GL_TIME_ELAPSED y marcas GL_TIMESTAMP)
+# ============================================================================
+# Mide cuánto tarda la GPU en ejecutar los comandos entre inicio() y fin().
+# El resultado llega unos frames después: se usa un pequeño anillo de queries
+# y solo se lee una cuando GL_QUERY_RESULT_AVAILABLE dice que está lista, así
+# medir nunca bloquea a la CPU. Si todas están en vuelo, ese frame no se mide.
+#
+# Las queries GL_TIME_ELAPSED no se pueden anidar: un solo temporizador
+# activo a la vez. Para medir pasadas dentro del frame está MarcasGPU.
+# ============================================================================
+
+from collections import deque
+from OpenGL.GL import *
+
+class TemporizadorGPU:
+    def __init__(self, profundidad=4):
+        self.libres = list(glGenQueries(profundidad))
+        self.pendientes = deque()
+        self.activa = None
+        self.ultimo_ms = None # Último resultado disponible (None hasta el primero)
+
+    def inicio(self):
+        self._recoger()
+        if not self.libres:
+            self.activa = None
+            return
+        self.activa = self.libres.pop()
+        glBeginQuery(GL_TIME_ELAPSED, self.activa)
+
+    def fin(self):
+        if self.activa is None:
+            return
+        glEndQuery(GL_TIME_ELAPSED)
+        self.pendientes.append(self.activa)
+        self.activa = None
+
+    def _recoger(self):
+        """Lee (sin esperar) las queries que ya terminaron, en orden."""
+        while self.pendientes:
+            query = self.pendientes[0]
+            if not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            nanosegundos = glGetQueryObjectui64v(query, GL_QUERY_RESULT)
+            self.ultimo_ms = int(nanosegundos) / 1e6
+            self.libres.append(self.pendientes.popleft())
+
+class MarcasGPU:
+    """
+    Tiempos de GPU de varias pasadas por frame con marcas GL_TIMESTAMP
+    (glQueryCounter). A diferencia de GL_TIME_ELAPSED se pueden usar dentro
+    del TemporizadorGPU del frame. Cada frame usa su propio lote de queries;
+    los lotes se leen en orden y solo cuando están listos.
+    """
+    def __init__(self, profundidad=4):
+        self.profundidad = profundidad
+        self.libres = []          # Queries sin uso
+        self.pendientes = deque() # Lotes en vuelo: [(nombre, q_inicio, q_fin)]
+        self.lote = None
+        self.en_vuelo = 0
+        self.ultimos_ms = {}      # nombre -> ms del último lote disponible
+
+    def comenzar_frame(self):
+        self._recoger()
+        # Si la GPU va 'profundidad' frames atrás, este frame no se mide
+        self.lote = [] if len(self.pendientes) < self.profundidad else None
+
+    def marca(self):
+        if self.lote is None:
+            return None
+        query = self.libres.pop() if self.libres else glGenQueries(1)[0]
+        glQueryCounter(query, GL_TIMESTAMP)
+        return query
+
+    def medir(self, nombre, inicio, fin):
+        if self.lote is not None:
+            self.lote.append((nombre, inicio, fin))
+
+    def terminar_frame(self):
+        if self.lote:
+            self.pendientes.append(self.lote)
+        self.lote = None
+
+    def _recoger(self):
+        while self.pendientes:
+            lote = self.pendientes[0]
+            # La última marca es la más tardía: si está lista, todo el lote lo está
+            if not glGetQueryObjectiv(lote[-1][2], GL_QUERY_RESULT_AVAILABLE):
+                break
+            self.pendientes.popleft()
+            self.ultimos_ms = {}
+            for nombre, inicio, fin in lote:
+                t0 = int(glGetQueryObjectui64v(inicio, GL_QUERY_RESULT))
+                t1 = int(glGetQueryObjectui64v(fin, GL_QUERY_RESULT))
+                self.ultimos_ms[nombre] = (t1 - t0) / 1e6
+                self.libres.extend((inicio, fin))
@@ -0,0 +1,81 @@
+# render/texturas.py
+# ============================================================================
+# Utilidades de Texturas de Modelos
+# ============================================================================
+# Texture arrays (GL_TEXTURE_2D_ARRAY) con una capa por material, usados por
+# Model3D (OBJ) y por el cargador glTF. Cada capa arranca con un ajedrez de
+# debug y se reemplaza por franjas cuando la imagen real está decodificada.
+# ============================================================================
+
+from OpenGL.GL import *
+import numpy as np
+from core.arranque import importar_diferido
+
+# PIL se carga en diferido: la primera decodificación (en un hilo de trabajo)
+# paga el costo de importarlo.
+try:
+    Image = importar_diferido("PIL.Image")
+except ImportError:
+    Image = None
+    print("⚠️ Error: Librería 'pillow' no encontrada. Instala con: pip install pillow")
+
+def checkerboard_pixels(tam=64):
+    """Ajedrez rojo/azul (casillas de 8px) de tam x tam, para debug y placeholders."""
+    y, x = np.indices((tam, tam))
+    pares = ((x // 8 + y // 8) % 2 == 0)[..., None]
+    rojo = np.array([255, 50, 50, 255], dtype=np.uint8)
+    azul = np.array([50, 50, 255, 255], dtype=np.uint8)
+    return np.where(pares, rojo, azul).astype(np.uint8)
+
+def crear_texture_array(tam, capas):
+    """Crea un texture array RGBA8 de 'capas' capas tam x tam, todas con el ajedrez."""
+    tex = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D_ARRAY, tex)
+    glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_RGBA8, tam, tam, capas,
+                 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    checker = checkerboard_pixels(tam)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for capa in range(capas):
+        glTexSubImage3D(GL_TEXTURE_2D_ARRAY, 0, 0, 0, capa, tam, tam, 1,
+                        GL_RGBA, GL_UNSIGNED_BYTE, checker)
+    glGenerateMipmap(GL_TEXTURE_2D_ARRAY)
+    return tex
+
+def decodificar_rgba(fuente, tam, voltear):
+    """
+    Hilo de trabajo: abre una imagen (ruta o archivo en memoria), la convierte a
+    RGBA y la escala a tam x tam. OBJ necesita voltearla; glTF no (su origen
+    UV ya coincide con la primera fila subida).
+    Returns:
+        bytes: píxeles RGBA.
+    """
+    if Image is None:
+        raise ImportError("pillow no está instalado")
+    image = Image.open(fuente)
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    if voltear:
+        image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    if image.size != (tam, tam):
+        image = image.resize((tam, tam), Image.LANCZOS)
+    return image.tobytes()
+
+def subir_capa(tex, capa, img_data, tam, filas_por_paso=256):
+    """Hilo de GL (generador): copia la imagen a su capa por franjas de filas."""
+    # Vista por filas sin copiar: cada franja es contigua
+    pixeles = np.frombuffer(img_data, dtype=np.uint8).reshape(tam, tam * 4)
+    for y in range(0, tam, filas_por_paso):
+        franja = pixeles[y:y + filas_por_paso]
+        glBindTexture(GL_TEXTURE_2D_ARRAY, tex)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage3D(GL_TEXTURE_2D_ARRAY, 0, 0, y, capa, tam, len(franja), 1,
+                        GL_RGBA, GL_UNSIGNED_BYTE, franja)
+        yield
+
+    glBindTexture(GL_TEXTURE_2D_ARRAY, tex)
+    glGenerateMipmap(GL_TEXTURE_2D_ARRAY)
+    print(f"   🖼️ Textura subida a la capa {capa} ({tam}x{tam})")
@@ -8,8 +8,16 @@ in vec3 v_color_info; // (hue_base, t, intensidad)
 
 // --- Uniforms ---
 // Variables globales desde Python.
-uniform float u_time;   // Tiempo global para animaciones.
-uniform float u_energy; // Energía media del audio.
+// Tiempo global (u_time) y energía media del audio (u_energy), del bloque del frame.
+layout(std140) uniform FrameData { // Datos por frame compartidos (ver frame_data.py)
+    mat4 u_projection;
+    mat4 u_view;
+    float u_time;
+    float u_bass_energy;
+    float u_high_energy;
+    float u_energy;
+    float u_escala_render;
+};
 
 // --- Salida ---
 // El color final del fragmento que se escribirá en la pantalla.
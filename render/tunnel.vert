@@ -2,34 +2,79 @@
 
 #version 330 core
 
-// --- Atributos de Vértice ---
-// Datos que vienen del VBO para cada vértice individual.
-// 'location = 0' corresponde al primer puntero de atributos configurado en Python (posición).
-layout (location = 0) in vec3 a_pos;
-// 'location = 1' corresponde al segundo (información para el color).
-layout (location = 1) in vec3 a_color_info; // (hue_base, t, intensidad)
+// --- Sin atributos de vértice ---
+// Los puntos del túnel se generan aquí a partir de gl_VertexID: se dibujan
+// capas * puntos vértices con un VAO vacío. El punto 'j' de la capa 'layer'
+// lee su intensidad del historial del espectro (una fila por paso de
+// simulación), de modo que cada capa muestra el espectro de 'layer * u_retraso'
+// pasos atrás.
 
 // --- Uniforms ---
-// Variables globales que se envían desde Python y son iguales para todos los vértices en un ciclo de dibujado.
-uniform mat4 u_projection; // Matriz para transformar de coordenadas de vista a coordenadas de recorte (perspectiva).
-uniform mat4 u_view;       // Matriz para transformar de coordenadas de mundo a coordenadas de vista (cámara).
+// Cámara (u_projection, u_view) y audio llegan en el bloque compartido del frame.
+layout(std140) uniform FrameData { // Datos por frame compartidos (ver frame_data.py)
+    mat4 u_projection;
+    mat4 u_view;
+    float u_time;
+    float u_bass_energy;
+    float u_high_energy;
+    float u_energy;
+    float u_escala_render;
+};
+
+uniform sampler2D u_historial; // R32F: ancho = bandas del espectro, alto = frames guardados
+uniform int u_cabeza;          // Fila del espectro más reciente
+uniform int u_capas;           // Vueltas del túnel
+uniform int u_puntos;          // Puntos por vuelta
+uniform float u_retraso;       // Frames de historial entre capas consecutivas
+uniform float u_z_near;
+uniform float u_z_far;
+uniform float u_giro;          // Rotación global del túnel
+uniform float u_fase;          // Filas entre la cabeza y el instante del frame (1 - alfa de la simulación)
 
 // --- Salidas ---
 // Variables que se pasan al siguiente paso del pipeline (el Fragment Shader).
 // Se interpolarán para cada fragmento.
-out vec3 v_color_info;
+out vec3 v_color_info; // (hue_base, t, intensidad)
+
+const float TAU = 6.28318530718;
 
 void main()
 {
-    // Pasamos la información de color que recibimos como atributo directamente al fragment shader.
-    v_color_info = a_color_info;
+    int layer = gl_VertexID / u_puntos;
+    int j = gl_VertexID - layer * u_puntos;
+    float t = float(layer) / float(u_capas - 1);
+    float z = u_z_near * (1.0 - t) + u_z_far * t;
+
+    // Filas del anillo: 'atras' pasos antes de la cabeza (acotado a la profundidad).
+    // Se mezclan las dos filas vecinas: el túnel avanza suave entre pasos de simulación.
+    ivec2 tam = textureSize(u_historial, 0);
+    float atras = min(float(layer) * u_retraso + u_fase, float(tam.y - 1));
+    int a0 = int(atras);
+    int a1 = min(a0 + 1, tam.y - 1);
+    int banda = (j * tam.x) / u_puntos;
+    float v0 = texelFetch(u_historial, ivec2(banda, (u_cabeza - a0 + tam.y) % tam.y), 0).r;
+    float v1 = texelFetch(u_historial, ivec2(banda, (u_cabeza - a1 + tam.y) % tam.y), 0).r;
+    float v = mix(v0, v1, atras - float(a0));
+
+    float ang = (float(j) / float(u_puntos)) * TAU + u_giro;
+    float r = v * 4.0 * (0.3 + 0.7 * t) + 0.2;
+
+    v_color_info = vec3(float(j) / float(u_puntos), t, v);
+
+    // Los puntos muy cerca del eje no se dibujan: se mandan fuera del volumen de recorte
+    if (r < 0.3) {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        gl_PointSize = 0.0;
+        return;
+    }
 
     // gl_Position es una variable de salida especial que contiene la posición final del vértice
     // en el "espacio de recorte". Se calcula multiplicando las matrices por la posición original.
     // El orden es importante: Posición -> Vista -> Proyección.
-    gl_Position = u_projection * u_view * vec4(a_pos, 1.0);
+    gl_Position = u_projection * u_view * vec4(cos(ang) * r, sin(ang) * r, z, 1.0);
 
     // gl_PointSize define el tamaño en píxeles de los puntos que se dibujan (si el modo es GL_POINTS).
     // Hacemos que los puntos más lejanos (Z más negativo) se vean más pequeños. Usamos gl_Position.w que contiene la distancia.
-    gl_PointSize = max(1.5, 15.0 / gl_Position.w);
-}
\ No newline at end of file
+    // Se multiplica por u_escala_render para que el tamaño en pantalla no cambie con la resolución de render.
+    gl_PointSize = max(1.5, 15.0 / gl_Position.w) * u_escala_render;
+}
@@ -10,6 +10,7 @@ import pygame
 from OpenGL.GL import *
 import time
 from .ui_renderer import UIRenderer
+from render.gl_state import estado
 from .horizontal_scroll import HorizontalScroll
 
 def hex_to_rgb_float(hex_color):
@@ -105,7 +106,8 @@ class TextureCache:
             data = pygame.image.tostring(surf, "RGBA", True)
             
             tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
+            # Se crea durante el dibujo de la UI: el bind pasa por el caché de estado
+            estado.bind_texture(0, GL_TEXTURE_2D, tex_id)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
@@ -170,10 +172,24 @@ class UIManager:
             **PRESET_RABBIT_HOLE,
             "FPS_MENU": 60,
             "FPS_NORMAL": 60,
+            "model_instances": 0, # 0 = modelo único; N = anillo de N copias (una banda cada una)
+            "tunel_retraso": 1.0,     # Pasos de historial (1/60 s) entre capas (0 = todas con el espectro actual)
+            "historial_frames": 1024, # Profundidad del historial del espectro en GPU
+            "bloom_downscale": 4, # Reducción de resolución del bloom (1/N)
+            "render_scale": 1.0,  # Fracción de la resolución de la ventana para la escena 3D
+            "hdr_compacto": 1.0,   # Targets de color R11F_G11F_B10F (0 = RGBA16F)
+            "profundidad_16": 1.0, # Profundidad de 16 bits (0 = 24 bits)
+            "exposicion": 1.0,
+            "bloom_cadencia": 1,   # Frames en los que se reparte el blur (1 = bloom completo en cada frame)
+            "bloom_historia": 0.3, # Peso de la historia al mezclar el bloom temporal
+            "tonemap": 0.0,        # 1 = curva ACES en la composición final
+            "calidad_auto": 1.0,  # Gobernador de calidad adaptativa (ver render/calidad.py)
         }
         
         self._ultimo_update = time.time()
         self.botones_mic = []
+        self._version_botones = None # Versión de la instantánea de dispositivos mostrada
+        self._layout_size = None
         self.seleccionado_idx = -1
         
         # Definición de opciones (simplificada para brevedad, estructura igual)
@@ -188,8 +204,14 @@ class UIManager:
             {"nombre": "Z Near", "clave": "z_near", "min": -20, "max": 15, "paso": 1},
             {"nombre": "Z Far", "clave": "z_far", "min": -20, "max": 15, "paso": 1},
             {"nombre": "Puntos Tunel", "clave": "num_dots", "min": 1, "max": 100, "paso": 1},
+            {"nombre": "Retraso", "clave": "tunel_retraso", "min": 0, "max": 20, "paso": 0.5},
+            {"nombre": "Historial", "clave": "historial_frames", "min": 64, "max": 4096, "paso": 64},
             {"nombre": "FPS Menu", "clave": "FPS_MENU", "min": 10, "max": 60, "paso": 1},
-            {"nombre": "FPS Visual", "clave": "FPS_NORMAL", "min": 10, "max": 120, "paso": 1},
+            {"nombre": "FPS Visual", "clave": "FPS_NORMAL", "min": 10, "max": 240, "paso": 1},
+            {"nombre": "Calidad Auto", "clave": "calidad_auto", "min": 0, "max": 1, "paso": 1},
+            {"nombre": "Escala Render", "clave": "render_scale", "min": 0.25, "max": 1.0, "paso": 0.05},
+            {"nombre": "HDR Compacto", "clave": "hdr_compacto", "min": 0, "max": 1, "paso": 1},
+            {"nombre": "Prof. 16 bits", "clave": "profundidad_16", "min": 0, "max": 1, "paso": 1},
             {"nombre": "Num Estrellas", "clave": "NUM_PARTICULAS", "min": 1, "max": 2000, "paso": 10},
             {"nombre": "Tam Base", "clave": "TAMANO_BASE_PARTICULA", "min": 1, "max": 800, "paso": 10},
             {"nombre": "Reactividad", "clave": "ESCALA_POR_INTENSIDAD", "min": 0, "max": 100, "paso": 0.5},
@@ -212,19 +234,27 @@ class UIManager:
             {"nombre": "Bloom Thresh", "clave": "bloom_threshold", "min": 0.0, "max": 5.0, "paso": 0.1},
             {"nombre": "Bloom Inten", "clave": "bloom_intensity", "min": 0.0, "max": 5.0, "paso": 0.1},
             {"nombre": "Blur Iter", "clave": "bloom_iterations", "min": 2, "max": 20, "paso": 2},
+            {"nombre": "Reducción", "clave": "bloom_downscale", "min": 2, "max": 16, "paso": 2},
+            {"nombre": "Cadencia", "clave": "bloom_cadencia", "min": 1, "max": 8, "paso": 1},
+            {"nombre": "Historia", "clave": "bloom_historia", "min": 0.0, "max": 0.9, "paso": 0.05},
+            {"nombre": "Exposición", "clave": "exposicion", "min": 0.1, "max": 4.0, "paso": 0.1},
+            {"nombre": "Tone Mapping", "clave": "tonemap", "min": 0, "max": 1, "paso": 1},
             # Opciones Modelo
             {"nombre": "Ataque", "clave": "model_attack", "min": 0.01, "max": 1.0, "paso": 0.01},
             {"nombre": "Decaimiento", "clave": "model_decay", "min": 0.001, "max": 0.5, "paso": 0.001},
             {"nombre": "Umbral", "clave": "model_threshold", "min": 0.0, "max": 100.0, "paso": 1.0},
+            {"nombre": "Copias", "clave": "model_instances", "min": 0, "max": 1000, "paso": 10},
         ]
         self.claves_por_pestana = {
-            0: ["gain_min", "gain_max", "FPS_MENU", "FPS_NORMAL"],
+            0: ["gain_min", "gain_max", "FPS_MENU", "FPS_NORMAL", "calidad_auto", "render_scale",
+                "hdr_compacto", "profundidad_16"],
             1: ["palette_index", "palette_auto"],
-            2: ["tunel_vueltas", "z_near", "z_far", "num_dots"],
+            2: ["tunel_vueltas", "z_near", "z_far", "num_dots", "tunel_retraso", "historial_frames"],
             3: ["NUM_PARTICULAS", "TAMANO_BASE_PARTICULA", "ESCALA_POR_INTENSIDAD", "FACTOR_BRILLO_PARTICULAS", "UMBRAL_INTENSIDAD_tamaño_particulas", "MAX_SIZE_PARTICULA", "velmin_particulas", "velmax_particulas"],
             4: ["NUM_PLATOS", "TAMANO_BASE_PLATO", "ESCALA_INTENSIDAD_PLATO", "FACTOR_BRILLO_PLATO", "UMBRAL_INTENSIDAD_PLATO", "MAX_SIZE_PLATO", "velmin_platos", "velmax_platos"],
-            5: ["bloom_enabled", "bloom_threshold", "bloom_intensity", "bloom_iterations"],
-            6: ["model_attack", "model_decay", "model_threshold"],
+            5: ["bloom_enabled", "bloom_threshold", "bloom_intensity", "bloom_iterations", "bloom_downscale",
+                "bloom_cadencia", "bloom_historia", "exposicion", "tonemap"],
+            6: ["model_attack", "model_decay", "model_threshold", "model_instances"],
         }
         
         # Inicialización del Renderizador Moderno
@@ -250,6 +280,10 @@ class UIManager:
                 if evt.key == pygame.K_m:
                     self.modo_seleccion = True
                     self.ctx.activo = False
+                    self.ctx.audio.pausar()
+                    # Pedimos un refresco al hilo de descubrimiento; mientras tanto
+                    # se muestra la última lista conocida.
+                    self.ctx.audio.devices.observar(True)
                     self._crear_botones_mic()
                 elif evt.key == pygame.K_ESCAPE:
                     self.menu_config_activo = True
@@ -268,19 +302,21 @@ class UIManager:
             for boton in self.botones_mic:
                 x, y, w, h = boton["rect"]
                 if x <= mx <= x + w and y <= my <= y + h:
-                    mics = self.ctx.audio.selected_mics
                     if pygame.key.get_mods() & pygame.KMOD_SHIFT:
-                        if boton["mic"] not in mics:
-                            mics.append(boton["mic"])
+                        self.ctx.audio.agregar_dispositivo(boton["mic"])
                     else:
                         self.ctx.audio.set_devices([boton["mic"]])
                     
                     self.modo_seleccion = False
                     self.ctx.activo = True
+                    self.ctx.audio.reanudar()
+                    self.ctx.audio.devices.observar(False)
                     # Limpiar texturas de botones
                     for b in self.botones_mic:
                         pass # glDeleteTextures([b["tex_id"]]) # Re-enable with texture renderer
                     self.botones_mic = []
+                    self._version_botones = None
+                    break
 
     def _procesar_config(self, evt):
         if evt.type == pygame.KEYDOWN and evt.key == pygame.K_ESCAPE:
@@ -394,36 +430,68 @@ class UIManager:
             self.config[clave] = min(opcion["max"], self.config[clave] + opcion["paso"])
 
     def _crear_botones_mic(self):
-        self.botones_mic = []
-        mics = self.ctx.audio.get_devices()
+        """
+        Sincroniza los botones con la instantánea de dispositivos (no bloquea).
+        Solo se agregan o quitan los botones de los dispositivos que cambiaron.
+        """
+        snap = self.ctx.audio.devices.snapshot()
+        if snap.version == self._version_botones:
+            # Sin cambios de dispositivos; solo recolocamos si cambió la ventana
+            if self._layout_size != (self.ctx.W, self.ctx.H):
+                self._layout_botones_mic()
+            return
+        self._version_botones = snap.version
+
+        por_clave = {mic.key: mic for mic in snap.devices}
+        # Bajas: descartamos botones de dispositivos desconectados y refrescamos
+        # la referencia de los que siguen (PortAudio puede cambiar sus índices)
+        botones = []
+        for boton in self.botones_mic:
+            mic = por_clave.pop(boton["mic"].key, None)
+            if mic is not None:
+                boton["mic"] = mic
+                botones.append(boton)
+        # Altas: lo que queda en el diccionario son dispositivos nuevos
+        for mic in por_clave.values():
+            nombre = f"{mic.name} {'Loop' if mic.isloopback else ''}"
+            # Guardamos el nombre para generar la textura al renderizar
+            botones.append({"mic": mic, "rect": None, "nombre": nombre})
+        self.botones_mic = botones
+        self._layout_botones_mic()
+
+    def _layout_botones_mic(self):
+        """Calcula la posición de cada botón (centrados verticalmente)."""
         # Usar layout relativo para el menú de selección también
         _, _, boton_w, boton_h = self.layout.get_rect(0, 0, 0.6, 0.08)
         h_pantalla = self.ctx.H # Píxeles reales para cálculo vertical centrado
         espaciado = boton_h * 1.3
-        inicio_y = (h_pantalla - len(mics) * espaciado) // 2
+        inicio_y = (h_pantalla - len(self.botones_mic) * espaciado) // 2
+        self._layout_size = (self.ctx.W, self.ctx.H)
         
-        for i, mic in enumerate(mics):
+        for i, boton in enumerate(self.botones_mic):
             x = (self.ctx.W - boton_w) // 2
             y = inicio_y + i * espaciado
-            nombre = f"{mic.name} {'Loop' if mic.isloopback else ''}"
-            # Guardamos el nombre para generar la textura al renderizar
-            self.botones_mic.append({
-                "mic": mic, "rect": [x, y, boton_w, boton_h],
-                "nombre": nombre
-            })
+            boton["rect"] = [x, y, boton_w, boton_h]
 
     def render(self):
         if self.modo_seleccion:
             self._render_seleccion()
         elif self.menu_config_activo:
             self._render_config()
+        if not self.modo_seleccion and self.ctx.calidad and self.ctx.calidad.activo:
+            self._render_hud_calidad()
         
         # Dibujar todo lo acumulado en este frame
         self.renderer.render()
 
+    def _render_hud_calidad(self):
+        # Estado del gobernador (p90 / presupuesto y última decisión), abajo a la izquierda
+        tex_id, tw, th = self.tex_cache.get_texture(self.ctx.calidad.texto_hud(), 14, (0.8, 0.8, 0.8))
+        self.renderer.draw_texture_rect(tex_id, 10, self.ctx.H - th - 10, tw, th, (1.0, 1.0, 1.0, 0.8))
+
     def _render_seleccion(self):
-        # Dibujar botones
-        if not self.botones_mic: self._crear_botones_mic()
+        # Dibujar botones (sincronización barata: solo compara versiones)
+        self._crear_botones_mic()
         
         for boton in self.botones_mic:
             x, y, w, h = boton["rect"]
@@ -11,6 +11,8 @@ import numpy as np
 import ctypes
 import pyrr
 from render import shaders # Reutilizamos el cargador de shaders
+from render.gl_state import estado
+from render.streaming import StreamingBuffer
 
 class UIRenderer:
     def __init__(self, ctx):
@@ -22,16 +24,26 @@ class UIRenderer:
             raise RuntimeError("Error crítico: No se pudieron cargar los shaders de UI.")
         
         # Obtener la ubicación del uniform de la matriz de proyección
-        self.u_proj_rect_loc = glGetUniformLocation(self.rect_program, "u_proj")
-        self.u_texture_loc = glGetUniformLocation(self.rect_program, "u_texture")
-        self.u_use_texture_loc = glGetUniformLocation(self.rect_program, "u_use_texture")
+        self.u_proj_rect_loc = shaders.get_uniform_location(self.rect_program, "u_proj")
+        self.u_texture_loc = shaders.get_uniform_location(self.rect_program, "u_texture")
+        self.u_use_texture_loc = shaders.get_uniform_location(self.rect_program, "u_use_texture")
         
         # --- Configuración de Buffers (VAO/VBO) ---
         self.rect_vao = glGenVertexArrays(1)
-        glBindVertexArray(self.rect_vao)
+        # Todo lo del frame (planos + texturizados) va a una sola reserva del
+        # buffer de streaming
+        self.stream = StreamingBuffer(8, 4096, self._configurar_vao, "UI")
         
-        self.rect_vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.rect_vbo)
+        # Lista temporal para acumular los vértices de un frame
+        self.rect_vertices = []
+        
+        # Lista para elementos texturizados (texto, iconos)
+        # Cada elemento es una tupla: (texture_id, vertices_list)
+        self.textured_rects = []
+
+    def _configurar_vao(self, vbo):
+        estado.bind_vao(self.rect_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
         
         # Formato de vértice: [x, y, r, g, b, a, u, v] (8 floats)
         # Agregamos u, v para coordenadas de textura
@@ -50,16 +62,7 @@ class UIRenderer:
         glEnableVertexAttribArray(2)
         glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(6 * ctypes.sizeof(GLfloat)))
 
-        # Desvincular para seguridad
-        glBindVertexArray(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
-        
-        # Lista temporal para acumular los vértices de un frame
-        self.rect_vertices = []
-        
-        # Lista para elementos texturizados (texto, iconos)
-        # Cada elemento es una tupla: (texture_id, vertices_list)
-        self.textured_rects = []
 
     def add_rect(self, x, y, w, h, color):
         """
@@ -107,27 +110,34 @@ class UIRenderer:
     def render(self):
         """Dibuja toda la geometría de UI acumulada en el frame."""
         # --- Configuración general de renderizado 2D ---
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glDisable(GL_DEPTH_TEST)
+        estado.enable(GL_BLEND)
+        estado.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        estado.disable(GL_DEPTH_TEST)
         
         proj_matrix = pyrr.matrix44.create_orthogonal_projection(0, self.ctx.W, self.ctx.H, 0, -1, 1, dtype=np.float32)
 
         # Usamos el programa único de UI
-        glUseProgram(self.rect_program)
+        estado.use_program(self.rect_program)
         glUniformMatrix4fv(self.u_proj_rect_loc, 1, GL_FALSE, proj_matrix)
         
+        # --- Subida única: planos primero, luego cada rectángulo texturizado (6 vértices) ---
+        n_planos = len(self.rect_vertices) // 8
+        n_total = n_planos + 6 * len(self.textured_rects)
+        if n_total:
+            datos, primero = self.stream.reservar(n_total)
+            planos = datos[:n_planos].reshape(-1)
+            planos[:] = self.rect_vertices
+            texturizados = datos[n_planos:].reshape(-1)
+            for i, (_, vertices) in enumerate(self.textured_rects):
+                texturizados[i * 48:(i + 1) * 48] = vertices
+            self.stream.confirmar()
+            estado.bind_vao(self.rect_vao)
+
         # --- FASE 1: Dibujar Rectángulos Planos (Sin Textura) ---
-        if self.rect_vertices:
+        if n_planos:
             # Desactivar uso de textura en shader
             glUniform1i(self.u_use_texture_loc, 0)
-            
-            glBindVertexArray(self.rect_vao)
-            glBindBuffer(GL_ARRAY_BUFFER, self.rect_vbo)
-            vertex_data = np.array(self.rect_vertices, dtype=np.float32)
-            glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_DYNAMIC_DRAW)
-            # 8 floats por vértice
-            glDrawArrays(GL_TRIANGLES, 0, len(vertex_data) // 8)
+            glDrawArrays(GL_TRIANGLES, primero, n_planos)
 
         # --- FASE 2: Dibujar Elementos Texturizados (Texto) ---
         if self.textured_rects:
@@ -135,26 +145,19 @@ class UIRenderer:
             glUniform1i(self.u_use_texture_loc, 1)
             # Indicar que usamos la unidad de textura 0
             glUniform1i(self.u_texture_loc, 0)
-            glActiveTexture(GL_TEXTURE0)
-            
-            # Reutilizamos el mismo VAO/VBO porque el formato es idéntico
-            glBindVertexArray(self.rect_vao)
-            glBindBuffer(GL_ARRAY_BUFFER, self.rect_vbo)
             
-            for tex_id, vertices in self.textured_rects:
-                glBindTexture(GL_TEXTURE_2D, tex_id)
-                v_data = np.array(vertices, dtype=np.float32)
-                # Subimos y dibujamos uno por uno (simple batching)
-                glBufferData(GL_ARRAY_BUFFER, v_data.nbytes, v_data, GL_DYNAMIC_DRAW)
-                glDrawArrays(GL_TRIANGLES, 0, len(v_data) // 8)
+            # Mismo VAO/buffer: cada rectángulo es un rango distinto de la reserva
+            inicio = primero + n_planos
+            for i, (tex_id, _) in enumerate(self.textured_rects):
+                estado.bind_texture(0, GL_TEXTURE_2D, tex_id)
+                glDrawArrays(GL_TRIANGLES, inicio + 6 * i, 6)
 
         # --- Limpieza del frame ---
-        glBindVertexArray(0)
         self.rect_vertices = []
         self.textured_rects = []
 
     def cleanup(self):
         """Libera los recursos de OpenGL."""
-        glDeleteProgram(self.rect_program)
+        shaders.release_program(self.rect_program)
         glDeleteVertexArrays(1, [self.rect_vao])
-        glDeleteBuffers(1, [self.rect_vbo])
\ No newline at end of file
+        glDeleteBuffers(1, [self.stream.vbo])
\ No newline at end of file